@@ -1,6 +1,6 @@
 "use client"
 
-import { useEffect, useMemo, useState } from "react"
+import { useEffect, useState } from "react"
 import Link from "next/link"
 import MD3AppLayout from "@/components/layout/MD3AppLayout"
 import { MD3Card, MD3CardContent, MD3CardHeader, MD3CardTitle } from "@/components/md3/MD3Card"
@@ -15,24 +15,7 @@ import {
   MD3TableCell,
 } from "@/components/md3/MD3Table"
 import { md3 } from "@/lib/md3-theme"
-import {
-  inventoryApi,
-  transfersApi,
-  invoicesApi,
-  alertsApi,
-  storesApi,
-  itemsApi,
-  expensesApi,
-  suppliesApi,
-  Arrival,
-  Store,
-  Transfer,
-  Invoice,
-  Item,
-  Inventory,
-  Expense,
-  SupplyTransfer,
-} from "@/lib/api"
+import { analyticsApi, DashboardData } from "@/lib/api"
 import {
   TrendingUp,
   AlertTriangle,
@@ -146,142 +129,45 @@ function getNextInvoiceDate(today = new Date()) {
 }
 
 export default function DashboardPage() {
-  const [arrivals, setArrivals] = useState<Arrival[]>([])
-  const [transfers, setTransfers] = useState<Transfer[]>([])
-  const [invoices, setInvoices] = useState<Invoice[]>([])
-  const [stores, setStores] = useState<Store[]>([])
-  const [items, setItems] = useState<Item[]>([])
-  const [inventory, setInventory] = useState<Inventory[]>([])
-  const [expenses, setExpenses] = useState<Expense[]>([])
-  const [supplyTransfers, setSupplyTransfers] = useState<SupplyTransfer[]>([])
-  const [pendingAlerts, setPendingAlerts] = useState(0)
-  const [longTermAlerts, setLongTermAlerts] = useState<
-    Array<{ item_id: number; item_name: string; days_in_stock: number; quantity: number }>
-  >([])
+  // 集計はバックエンドで（/api/analytics/dashboard、セクション別にキャッシュ）
+  const [data, setData] = useState<DashboardData | null>(null)
 
   useEffect(() => {
-    const load = async () => {
-      const [
-        arrivalsData,
-        transfersData,
-        invoicesData,
-        storesData,
-        itemsData,
-        inventoryData,
-        alertsData,
-        longTermData,
-        expensesData,
-        supplyData,
-      ] = await Promise.all([
-        inventoryApi.getArrivals({ limit: 300 }),
-        transfersApi.getAll({ limit: 300 }),
-        invoicesApi.getAll({ limit: 20 }),
-        storesApi.getAll(),
-        itemsApi.getAll({ limit: 500 }),
-        inventoryApi.getAll(),
-        alertsApi.getAll("pending"),
-        inventoryApi.getLongTermAlerts(),
-        expensesApi.getAll({ year_month: monthKey }),
-        suppliesApi.getTransfers(),
-      ])
-      setArrivals(arrivalsData)
-      setTransfers(transfersData)
-      setInvoices(invoicesData)
-      setStores(storesData)
-      setItems(itemsData)
-      setInventory(inventoryData)
-      setPendingAlerts(alertsData.length)
-      setLongTermAlerts(longTermData)
-      setExpenses(expensesData)
-      setSupplyTransfers(supplyData)
-    }
-    load().catch(console.error)
+    analyticsApi.getDashboard().then(setData).catch(console.error)
   }, [])
 
   const today = new Date()
-  const todayKey = today.toISOString().split("T")[0]
-  const monthKey = `${today.getFullYear()}-${String(today.getMonth() + 1).padStart(2, "0")}`
-  const weekAgo = new Date(today.getTime() - 7 * 24 * 60 * 60 * 1000)
-
-  // Arrivals summary
-  const todayArrivals = arrivals.filter((a) => a.arrived_at.startsWith(todayKey))
-  const monthArrivals = arrivals.filter((a) => a.arrived_at.startsWith(monthKey))
-  const weekArrivals = arrivals.filter((a) => new Date(a.arrived_at) >= weekAgo)
-
-  // Transfers summary
-  const todayTransfers = transfers.filter((t) => t.transferred_at.startsWith(todayKey))
-  const monthTransfers = transfers.filter((t) => t.transferred_at.startsWith(monthKey))
-
-  // Inventory summary
-  const totalStock = inventory.reduce((sum, inv) => sum + inv.quantity, 0)
-  const lowStockCount = inventory.filter((inv) => inv.quantity < 10 && inv.quantity > 0).length
-  const outOfStockCount = inventory.filter((inv) => inv.quantity === 0).length
-
-  // Expenses summary (this month) - already filtered by year_month in API call
-  const monthExpenseTotal = expenses.reduce((sum, e) => sum + Number(e.amount), 0)
-
-  // Supply transfers summary (this month)
-  const monthSupplyTotal = supplyTransfers
-    .filter((t) => t.transferred_at.startsWith(monthKey))
-    .reduce((sum, t) => sum + t.quantity * Number(t.unit_price), 0)
-
-  // Store breakdown
-  const storeBreakdown = useMemo(() => {
-    const totals = new Map<number, { qty: number; amount: number }>()
-    transfers.forEach((t) => {
-      const current = totals.get(t.store_id) || { qty: 0, amount: 0 }
-      current.qty += t.quantity
-      current.amount += t.quantity * Number(t.unit_price || 0)
-      totals.set(t.store_id, current)
-    })
-    return stores
-      .map((s) => ({
-        id: s.id,
-        name: s.name,
-        type: s.operation_type,
-        qty: totals.get(s.id)?.qty || 0,
-        amount: totals.get(s.id)?.amount || 0,
-      }))
-      .filter((s) => s.qty > 0)
-      .sort((a, b) => b.qty - a.qty)
-      .slice(0, 5)
-  }, [transfers, stores])
-
-  // Category breakdown
-  const categoryBreakdown = useMemo(() => {
-    const itemMap = new Map(items.map((i) => [i.id, i]))
-    const totals = new Map<string, { qty: number; count: number }>()
-    inventory.forEach((inv) => {
-      const item = itemMap.get(inv.item_id)
-      const cat = item?.category || "その他"
-      const current = totals.get(cat) || { qty: 0, count: 0 }
-      current.qty += inv.quantity
-      current.count += 1
-      totals.set(cat, current)
-    })
-    return Array.from(totals.entries())
-      .map(([category, data]) => ({ category, ...data }))
-      .sort((a, b) => b.qty - a.qty)
-      .slice(0, 5)
-  }, [inventory, items])
+  const purchases = data?.purchases
+  const transfers = data?.transfers
+  const inventory = data?.inventory
+  const alerts = data?.alerts
+  const costs = data?.costs
+  const storeBreakdown = transfers?.store_ranking.slice(0, 5) ?? []
+  const categoryBreakdown = inventory?.categories.slice(0, 5) ?? []
+  const recentInvoices = data?.invoices.recent ?? []
+  const recentArrivals = purchases?.recent ?? []
+  const longTermAlerts = alerts?.long_term ?? []
+  const stockWarnings = (inventory?.low_stock_count ?? 0) + (inventory?.out_of_stock_count ?? 0)
+  const pendingAlerts = alerts?.pending_count ?? 0
+  const longTermCount = alerts?.long_term_count ?? 0
 
   const nextInvoiceDate = getNextInvoiceDate(today)
-  const itemMap = useMemo(() => new Map(items.map((i) => [i.id, i])), [items])
 
   return (
     <MD3AppLayout title="ダッシュボード" subtitle="すべてのサマリーを一覧">
       {/* Row 1: Key Metrics */}
       <div style={{ display: "grid", gridTemplateColumns: "repeat(6, 1fr)", gap: 12, marginBottom: 20 }}>
         <MetricCard
-          label="今日の入荷"
-          value={`${todayArrivals.length}件`}
-          subValue={`今週 ${weekArrivals.length}件`}
+          label="今日の仕入"
+          value={`¥${(purchases?.today_amount ?? 0).toLocaleString()}`}
+          subValue={`${purchases?.today_count ?? 0}件 / 今週 ${purchases?.week_count ?? 0}件`}
           icon={<TrendingUp size={22} />}
           href="/arrivals"
         />
         <MetricCard
           label="今月の入荷"
-          value={`${monthArrivals.length}件`}
+          value={`${purchases?.month_count ?? 0}件`}
+          subValue={`¥${(purchases?.month_amount ?? 0).toLocaleString()}`}
           icon={<Flower2 size={22} />}
           iconBg={md3.secondaryContainer}
           iconColor={md3.onSecondaryContainer}
@@ -289,27 +175,27 @@ export default function DashboardPage() {
         />
         <MetricCard
           label="今日の持出"
-          value={`${todayTransfers.length}件`}
-          subValue={`今月 ${monthTransfers.length}件`}
+          value={`¥${(transfers?.today_amount ?? 0).toLocaleString()}`}
+          subValue={`${transfers?.today_count ?? 0}件 / 今月 ¥${(transfers?.month_amount ?? 0).toLocaleString()}`}
           icon={<ShoppingCart size={22} />}
           iconBg={md3.tertiaryContainer}
           iconColor={md3.onTertiaryContainer}
           href="/transfer-entry"
         />
         <MetricCard
-          label="在庫合計"
-          value={totalStock.toLocaleString()}
-          subValue={`${inventory.length}品目`}
+          label="倉庫在庫金額"
+          value={`¥${(inventory?.valuation ?? 0).toLocaleString()}`}
+          subValue={`${(inventory?.total_quantity ?? 0).toLocaleString()}本 / ${inventory?.item_count ?? 0}品目`}
           icon={<Package size={22} />}
           href="/inventory"
         />
         <MetricCard
           label="在庫注意"
-          value={`${lowStockCount + outOfStockCount}件`}
-          subValue={outOfStockCount > 0 ? `欠品${outOfStockCount}件` : undefined}
+          value={`${stockWarnings}件`}
+          subValue={inventory?.out_of_stock_count ? `欠品${inventory.out_of_stock_count}件` : undefined}
           icon={<AlertTriangle size={22} />}
-          iconBg={lowStockCount + outOfStockCount > 0 ? md3.errorContainer : md3.surfaceContainerHigh}
-          iconColor={lowStockCount + outOfStockCount > 0 ? md3.onErrorContainer : md3.onSurfaceVariant}
+          iconBg={stockWarnings > 0 ? md3.errorContainer : md3.surfaceContainerHigh}
+          iconColor={stockWarnings > 0 ? md3.onErrorContainer : md3.onSurfaceVariant}
           href="/inventory"
         />
         <MetricCard
@@ -325,8 +211,8 @@ export default function DashboardPage() {
       <div style={{ display: "grid", gridTemplateColumns: "repeat(4, 1fr)", gap: 12, marginBottom: 20 }}>
         <MetricCard
           label="今月の経費"
-          value={`¥${monthExpenseTotal.toLocaleString()}`}
-          subValue={`${expenses.length}件`}
+          value={`¥${(costs?.month_expense_total ?? 0).toLocaleString()}`}
+          subValue={`${costs?.month_expense_count ?? 0}件`}
           icon={<Wallet size={22} />}
           iconBg={md3.surfaceContainerHigh}
           iconColor={md3.onSurface}
@@ -334,7 +220,7 @@ export default function DashboardPage() {
         />
         <MetricCard
           label="資材持出(今月)"
-          value={`¥${monthSupplyTotal.toLocaleString()}`}
+          value={`¥${(costs?.month_supply_total ?? 0).toLocaleString()}`}
           icon={<Boxes size={22} />}
           iconBg={md3.surfaceContainerHigh}
           iconColor={md3.onSurface}
@@ -348,11 +234,11 @@ export default function DashboardPage() {
         />
         <MetricCard
           label="長期在庫"
-          value={`${longTermAlerts.length}件`}
-          subValue={longTermAlerts.length > 0 ? "要確認" : "なし"}
+          value={`${longTermCount}件`}
+          subValue={longTermCount > 0 ? `${(alerts?.long_term_quantity ?? 0).toLocaleString()}本 要確認` : "なし"}
           icon={<Clock size={22} />}
-          iconBg={longTermAlerts.length > 0 ? md3.tertiaryContainer : md3.surfaceContainerHigh}
-          iconColor={longTermAlerts.length > 0 ? md3.onTertiaryContainer : md3.onSurfaceVariant}
+          iconBg={longTermCount > 0 ? md3.tertiaryContainer : md3.surfaceContainerHigh}
+          iconColor={longTermCount > 0 ? md3.onTertiaryContainer : md3.onSurfaceVariant}
           href="/warehouse"
         />
       </div>
@@ -364,7 +250,7 @@ export default function DashboardPage() {
           <MD3CardHeader>
             <MD3CardTitle style={{ display: "flex", alignItems: "center", gap: 8, fontSize: 15 }}>
               <StoreIcon size={18} color={md3.primary} />
-              店舗別持出（上位）
+              店舗別持出（今月上位）
             </MD3CardTitle>
           </MD3CardHeader>
           <MD3CardContent style={{ padding: 0 }}>
@@ -387,12 +273,12 @@ export default function DashboardPage() {
                   </MD3TableRow>
                 ) : (
                   storeBreakdown.map((store) => (
-                    <MD3TableRow key={store.id}>
+                    <MD3TableRow key={store.store_id}>
                       <MD3TableCell>
-                        <span style={{ fontSize: 13 }}>{store.name}</span>
+                        <span style={{ fontSize: 13 }}>{store.store_name}</span>
                       </MD3TableCell>
                       <MD3TableCell align="right">
-                        <span style={{ fontSize: 13 }}>{store.qty.toLocaleString()}</span>
+                        <span style={{ fontSize: 13 }}>{store.quantity.toLocaleString()}</span>
                       </MD3TableCell>
                       <MD3TableCell align="right">
                         <span style={{ fontSize: 13 }}>¥{store.amount.toLocaleString()}</span>
@@ -419,12 +305,12 @@ export default function DashboardPage() {
                 データなし
               </div>
             ) : (
-              categoryBreakdown.map((cat, i) => (
+              categoryBreakdown.map((cat) => (
                 <SummaryItem
                   key={cat.category}
                   label={cat.category}
-                  value={cat.qty.toLocaleString()}
-                  badge={{ label: `${cat.count}品目`, status: "neutral" }}
+                  value={cat.quantity.toLocaleString()}
+                  badge={{ label: `${cat.item_count}品目`, status: "neutral" }}
                 />
               ))
             )}
@@ -440,12 +326,12 @@ export default function DashboardPage() {
             </MD3CardTitle>
           </MD3CardHeader>
           <MD3CardContent style={{ padding: "0 16px 16px" }}>
-            {invoices.length === 0 ? (
+            {recentInvoices.length === 0 ? (
               <div style={{ textAlign: "center", padding: 16, color: md3.onSurfaceVariant, fontSize: 13 }}>
                 請求書なし
               </div>
             ) : (
-              invoices.slice(0, 4).map((inv) => (
+              recentInvoices.slice(0, 4).map((inv) => (
                 <SummaryItem
                   key={inv.id}
                   label={inv.invoice_number}
@@ -488,7 +374,7 @@ export default function DashboardPage() {
                 </MD3TableRow>
               </MD3TableHead>
               <MD3TableBody>
-                {arrivals.length === 0 ? (
+                {recentArrivals.length === 0 ? (
                   <MD3TableRow hoverable={false}>
                     <MD3TableCell colSpan={3}>
                       <div style={{ textAlign: "center", padding: 16, color: md3.onSurfaceVariant, fontSize: 13 }}>
@@ -497,22 +383,19 @@ export default function DashboardPage() {
                     </MD3TableCell>
                   </MD3TableRow>
                 ) : (
-                  arrivals.slice(0, 5).map((arrival) => {
-                    const item = itemMap.get(arrival.item_id)
-                    return (
-                      <MD3TableRow key={arrival.id}>
-                        <MD3TableCell>
-                          <span style={{ fontSize: 13 }}>{arrival.arrived_at.slice(5, 10)}</span>
-                        </MD3TableCell>
-                        <MD3TableCell>
-                          <span style={{ fontSize: 13 }}>{item?.name || `ID:${arrival.item_id}`}</span>
-                        </MD3TableCell>
-                        <MD3TableCell align="right">
-                          <span style={{ fontSize: 13, fontWeight: 500 }}>{arrival.quantity}</span>
-                        </MD3TableCell>
-                      </MD3TableRow>
-                    )
-                  })
+                  recentArrivals.map((arrival) => (
+                    <MD3TableRow key={arrival.arrival_id}>
+                      <MD3TableCell>
+                        <span style={{ fontSize: 13 }}>{arrival.arrived_at.slice(5, 10)}</span>
+                      </MD3TableCell>
+                      <MD3TableCell>
+                        <span style={{ fontSize: 13 }}>{arrival.item_name}</span>
+                      </MD3TableCell>
+                      <MD3TableCell align="right">
+                        <span style={{ fontSize: 13, fontWeight: 500 }}>{arrival.quantity}</span>
+                      </MD3TableCell>
+                    </MD3TableRow>
+                  ))
                 )}
               </MD3TableBody>
             </MD3Table>
@@ -553,8 +436,8 @@ export default function DashboardPage() {
                     </MD3TableCell>
                   </MD3TableRow>
                 ) : (
-                  longTermAlerts.slice(0, 5).map((alert) => (
-                    <MD3TableRow key={alert.item_id}>
+                  longTermAlerts.map((alert) => (
+                    <MD3TableRow key={alert.arrival_id}>
                       <MD3TableCell>
                         <span style={{ fontSize: 13 }}>{alert.item_name}</span>
                       </MD3TableCell>
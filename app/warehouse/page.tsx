@@ -41,7 +41,7 @@ export default function WarehousePage() {
   const [adjustmentAmount, setAdjustmentAmount] = useState("")
   const [reason, setReason] = useState("")
   const [longTermAlerts, setLongTermAlerts] = useState<
-    Array<{ item_id: number; item_name: string; item_code: string; arrived_at: string; quantity: number; days_in_stock: number }>
+    Array<{ item_id: number; item_name: string; item_code: string; arrival_id: number; display_id: string | null; arrived_at: string; quantity: number; days_in_stock: number }>
   >([])
 
   // Supplies state
@@ -373,12 +373,12 @@ export default function WarehousePage() {
                   </p>
                 ) : (
                   longTermAlerts.slice(0, 8).map((alert, i) => (
-                    <div key={alert.item_id}>
+                    <div key={alert.arrival_id}>
                       <div style={{ display: "flex", justifyContent: "space-between", padding: "12px 16px" }}>
                         <div>
                           <p style={{ fontSize: 14, fontWeight: 500, margin: 0, fontFamily: "'Zen Maru Gothic', sans-serif" }}>{alert.item_name}</p>
                           <p style={{ fontSize: 12, color: md3.onSurfaceVariant, margin: "2px 0 0 0", fontFamily: "'Zen Maru Gothic', sans-serif" }}>
-                            {alert.item_code} / 在庫 {alert.quantity}
+                            {alert.display_id ?? alert.item_code} / 残 {alert.quantity}
                           </p>
                         </div>
                         <MD3StatusBadge status="warning" label={`${alert.days_in_stock}日`} />
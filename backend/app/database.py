@@ -33,6 +33,22 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# テーブル変更カウンタ（キャッシュ無効化用）
+from app.services.table_versions import table_versions
+table_versions.install(SessionLocal)
+
+# 在庫イベント配信（commit 後に購読者へ）
+from app.services.events import event_bus
+event_bus.install(SessionLocal)
+
+# 明細の変更検出（店舗別集計の作り直し記録・レポートキャッシュの無効化）
+from app.services import data_changes
+data_changes.install(SessionLocal)
+
+# SQL 計測（スロークエリ・N+1 検出）
+from app.services import sql_instrumentation
+sql_instrumentation.install(engine)
+
 
 def get_db():
     """Dependency to get database session"""
@@ -45,7 +61,7 @@ def get_db():
 
 def init_db():
     """Initialize database tables and default data"""
-    from app.models import stores, items, inventory, transfers, invoices, supplies, users, settings, logs, expenses, payments
+    from app.models import stores, items, inventory, transfers, invoices, supplies, users, settings, logs, expenses, payments, reports
     Base.metadata.create_all(bind=engine)
 
     # Add sort_order columns if they don't exist (migration for existing DBs)
@@ -105,6 +121,18 @@ def init_db():
             conn.commit()
             print("Added arrival_id column to disposals")
 
+    # 後から追加したインデックス（既存 DB 向け）
+    from app.models.expenses import Expense
+    from app.models.inventory import Arrival
+    from app.models.transfers import Transfer
+    for table in (Arrival.__table__, Transfer.__table__, Expense.__table__):
+        for index in table.indexes:
+            if index.name in (
+                "ix_arrivals_open_lots_arrived_at", "ix_arrivals_arrived_at", "ix_transfers_transferred_at",
+                "ix_expenses_year_month_category",
+            ):
+                index.create(bind=engine, checkfirst=True)
+
     # Initialize default data
     db = SessionLocal()
     try:
@@ -126,13 +154,15 @@ def init_db():
             db.commit()
             print(f"Initialized {len(INITIAL_SUPPLIES)} supplies")
 
-        # Initialize settings if empty
+        # Initialize settings (追加された項目も既存 DB に入れる)
         from app.models.settings import Setting, INITIAL_SETTINGS
-        if db.query(Setting).count() == 0:
-            for setting_data in INITIAL_SETTINGS:
+        existing = {key for (key,) in db.query(Setting.key)}
+        missing = [setting_data for setting_data in INITIAL_SETTINGS if setting_data["key"] not in existing]
+        if missing:
+            for setting_data in missing:
                 db.add(Setting(**setting_data))
             db.commit()
-            print(f"Initialized {len(INITIAL_SETTINGS)} settings")
+            print(f"Initialized {len(missing)} settings")
 
         # Initialize tax rates if empty
         from app.models.settings import TaxRate, INITIAL_TAX_RATES
@@ -160,6 +190,34 @@ def init_db():
             db.commit()
             print(f"Initialized {len(INITIAL_USERS)} users")
 
+        # 在庫台帳: 既存の入荷・持ち出し・廃棄・調整から作成（初回のみ）
+        from app.services import stock_ledger
+        backfilled = stock_ledger.backfill(db)
+        if backfilled:
+            db.commit()
+            print(f"Backfilled {backfilled} stock movements")
+
+        # 在庫評価: 台帳を再生して作成（初回のみ）
+        from app.services import valuation
+        valued = valuation.backfill(db)
+        if valued:
+            db.commit()
+            print(f"Backfilled item costs for {valued} items")
+
+        # 経費の月次集計: 明細から作成（初回のみ）
+        from app.services import expense_rollups
+        rolled = expense_rollups.backfill(db)
+        if rolled:
+            db.commit()
+            print(f"Backfilled {rolled} expense rollups")
+
+        # 店舗別の月次・週次集計: 明細から作成（初回のみ）
+        from app.services import summaries
+        summarized = summaries.backfill(db)
+        if summarized:
+            db.commit()
+            print(f"Backfilled store summaries for {summarized} periods")
+
     except Exception as e:
         print(f"Error initializing database: {e}")
         db.rollback()
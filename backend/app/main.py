@@ -8,7 +8,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.database import init_db
-from app.routers import stores, items, inventory, transfers, invoices, supplies, settings, expenses, logs, analytics, payments, csv_import, backup
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.http_cache import HTTPCacheMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.middleware.timing import TimingMiddleware
+from app.services import forecast, invoice_pdf, reconciliation, stock_ledger, summaries
+from app.services.invoice_pdf import pdf_renderer
+from app.services.scheduler import scheduler
+from app.routers import stores, items, inventory, transfers, invoices, supplies, settings, expenses, logs, analytics, payments, csv_import, backup, system, metrics, events
 
 
 @asynccontextmanager
@@ -17,10 +24,34 @@ async def lifespan(app: FastAPI):
     print("[START] 8718 Flower System starting...")
     init_db()
     print("[OK] Database initialized")
+    if invoice_pdf.unavailable_reason():
+        print(f"[WARN] Invoice PDF disabled: {invoice_pdf.unavailable_reason()}")
+    scheduler.start()
     yield
+    await scheduler.stop()
+    pdf_renderer.shutdown()
     print("[END] Shutting down...")
 
 
+# 定期ジョブ
+scheduler.every(
+    "inventory_snapshots", stock_ledger.STOCK_SNAPSHOT_INTERVAL_HOURS * 3600,
+    stock_ledger.run_snapshot_job, initial_delay=60,
+)
+scheduler.every(
+    "inventory_reconciliation", reconciliation.RECONCILE_INTERVAL_HOURS * 3600,
+    reconciliation.run_reconcile_job, initial_delay=300,
+)
+scheduler.every(
+    "demand_forecast", forecast.FORECAST_INTERVAL_HOURS * 3600,
+    forecast.run_forecast_job, initial_delay=600,
+)
+scheduler.every(
+    "store_summaries", summaries.SUMMARY_REFRESH_INTERVAL_MINUTES * 60,
+    summaries.run_refresh_job, initial_delay=120,
+)
+
+
 app = FastAPI(
     title="8718 Flower System API",
     description="入荷・在庫・持ち出し・請求書システム - Phase 1 ローカル運用",
@@ -28,6 +59,11 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# 後に追加したものが外側（CORS を最外周に）
+app.add_middleware(HTTPCacheMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(TimingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -52,6 +88,9 @@ app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"]
 app.include_router(payments.router, prefix="/api/payments", tags=["payments"])
 app.include_router(csv_import.router, prefix="/api/csv-import", tags=["csv-import"])
 app.include_router(backup.router, prefix="/api/backup", tags=["backup"])
+app.include_router(system.router, prefix="/api/system", tags=["system"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
+app.include_router(events.router, prefix="/api/events", tags=["events"])
 
 
 @app.get("/")
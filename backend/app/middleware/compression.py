@@ -0,0 +1,256 @@
+"""
+レスポンス圧縮 (Brotli / gzip)
+- Accept-Encoding に応じて br（brotli が入っていれば）→ gzip の順に選択
+- 閾値未満・対象外 Content-Type・圧縮済みレスポンスはそのまま返す
+- ストリーミング応答は閾値を超えた時点から逐次圧縮（SSE は対象外）
+- ETag 付きレスポンスは圧縮結果を (ETag, 方式) で保持し再圧縮を省く
+- 方式ごとの入出力バイト数・CPU 時間を集計
+"""
+
+import gzip
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+COMPRESSION_CACHE_MAX_ENTRIES = int(os.getenv("COMPRESSION_CACHE_MAX_ENTRIES", "128"))
+# これを超える本文はスレッドで圧縮してイベントループを塞がない
+COMPRESSION_THREAD_THRESHOLD = 256 * 1024
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/csv",
+    "text/plain",
+    "text/html",
+    "application/javascript",
+)
+
+
+class CompressionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.encodings: Dict[str, Dict[str, float]] = {}
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float, cached: bool = False):
+        with self._lock:
+            stats = self.encodings.setdefault(encoding, {
+                "responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0, "cache_hits": 0,
+            })
+            stats["responses"] += 1
+            stats["bytes_in"] += bytes_in
+            stats["bytes_out"] += bytes_out
+            stats["cpu_seconds"] += cpu_seconds
+            if cached:
+                stats["cache_hits"] += 1
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                encoding: {
+                    **stats,
+                    "ratio": round(stats["bytes_out"] / stats["bytes_in"], 4) if stats["bytes_in"] else None,
+                }
+                for encoding, stats in self.encodings.items()
+            }
+
+
+compression_stats = CompressionStats()
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def _compress(encoding: str, body: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _measured(encoding: str, body: bytes) -> Tuple[bytes, float]:
+    """圧縮結果と消費 CPU 時間（呼び出しスレッドの thread_time 差分）"""
+    start = time.thread_time()
+    compressed = _compress(encoding, body)
+    return compressed, time.thread_time() - start
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+            self._compress = self._obj.process
+            self._flush = self._obj.flush
+            self._finish = self._obj.finish
+        else:
+            self._obj = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._compress = self._obj.compress
+            self._flush = lambda: self._obj.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._obj.flush
+
+    def chunk(self, data: bytes, final: bool) -> bytes:
+        out = self._compress(data)
+        return out + (self._finish() if final else self._flush())
+
+
+class CompressionMiddleware:
+    """サイズ閾値・Content-Type 許可リスト付きの圧縮ミドルウェア"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 compressible_types: Tuple[str, ...] = COMPRESSIBLE_TYPES,
+                 cache_max_entries: int = COMPRESSION_CACHE_MAX_ENTRIES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compressible_types = compressible_types
+        self.cache_max_entries = cache_max_entries
+        self._cache_lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def _compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type in self.compressible_types
+
+    def cached(self, etag: Optional[str], encoding: str) -> Optional[bytes]:
+        if not etag:
+            return None
+        with self._cache_lock:
+            body = self._cache.get((etag, encoding))
+            if body is not None:
+                self._cache.move_to_end((etag, encoding))
+            return body
+
+    def store(self, etag: Optional[str], encoding: str, body: bytes):
+        if not etag or self.cache_max_entries <= 0:
+            return
+        with self._cache_lock:
+            self._cache[(etag, encoding)] = body
+            self._cache.move_to_end((etag, encoding))
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message = None
+        self.active = None          # None: 未判定 / True: 圧縮 / False: 素通し
+        self.buffer = b""
+        self.stream: Optional[_StreamCompressor] = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def _set_headers(self, content_length: Optional[int]):
+        headers = MutableHeaders(scope=self.start_message)
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            if not self.middleware._compressible(Headers(raw=message.get("headers", []))):
+                self.active = False
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.active is False:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.active is None:
+            self.buffer += body
+            if more_body and len(self.buffer) < self.middleware.minimum_size:
+                return
+            if not more_body:
+                await self._send_whole(self.buffer)
+                return
+            # ストリーミング: 閾値を超えたので逐次圧縮に切り替える
+            self.active = True
+            self.stream = _StreamCompressor(self.encoding)
+            self._set_headers(None)
+            await self._send(self.start_message)
+            body, self.buffer = self.buffer, b""
+
+        await self._send_chunk(body, final=not more_body)
+
+    async def _send_whole(self, body: bytes):
+        if len(body) < self.middleware.minimum_size:
+            self.active = False
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        etag = Headers(raw=self.start_message.get("headers", [])).get("etag")
+        compressed = self.middleware.cached(etag, self.encoding)
+        if compressed is not None:
+            compression_stats.record(self.encoding, len(body), len(compressed), 0.0, cached=True)
+        else:
+            if len(body) >= COMPRESSION_THREAD_THRESHOLD:
+                compressed, cpu = await anyio.to_thread.run_sync(_measured, self.encoding, body)
+            else:
+                compressed, cpu = _measured(self.encoding, body)
+            compression_stats.record(self.encoding, len(body), len(compressed), cpu)
+            self.middleware.store(etag, self.encoding, compressed)
+
+        self.active = True
+        self._set_headers(len(compressed))
+        await self._send(self.start_message)
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    async def _send_chunk(self, body: bytes, final: bool):
+        start = time.thread_time()
+        out = self.stream.chunk(body, final)
+        self.cpu_seconds += time.thread_time() - start
+        self.bytes_in += len(body)
+        self.bytes_out += len(out)
+        if final:
+            compression_stats.record(self.encoding, self.bytes_in, self.bytes_out, self.cpu_seconds)
+        await self._send({"type": "http.response.body", "body": out, "more_body": not final})
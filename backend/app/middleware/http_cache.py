@@ -0,0 +1,168 @@
+"""
+HTTP 条件付き GET / レスポンスキャッシュ
+- 対象エンドポイントの ETag / Last-Modified をテーブル変更カウンタから算出
+- If-None-Match / If-Modified-Since が一致すれば 304 Not Modified
+- 200 応答はクエリ文字列ごとに短時間サーバー側でも保持（ETag が変わるまで再利用）
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.services.table_versions import table_versions
+
+# パス -> 依存テーブル（パスは FastAPI のルート定義どおり末尾スラッシュ込み）
+CACHEABLE_ROUTES: Dict[str, Tuple[str, ...]] = {
+    "/api/stores/": ("stores",),
+    "/api/items/": ("items",),
+    "/api/items/search": ("items",),
+    "/api/supplies/": ("supplies",),
+    "/api/settings/": ("settings",),
+    "/api/settings/tax-rates": ("tax_rates",),
+    "/api/settings/suppliers": ("suppliers",),
+    "/api/inventory/": ("inventory", "items"),
+    "/api/inventory/arrivals": ("arrivals", "items", "suppliers"),
+}
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "10"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+
+# プロセス再起動でカウンタが巻き戻っても ETag が衝突しないように
+_BOOT_ID = uuid.uuid4().hex[:8]
+
+
+class _CachedResponse:
+    __slots__ = ("etag", "expires_at", "status", "headers", "body")
+
+    def __init__(self, etag: str, expires_at: float, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.etag = etag
+        self.expires_at = expires_at
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class HTTPCacheStats:
+    def __init__(self):
+        self.not_modified = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "not_modified": self.not_modified,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+
+http_cache_stats = HTTPCacheStats()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _not_modified_since(if_modified_since: str, last_modified: float) -> bool:
+    try:
+        return int(last_modified) <= int(parsedate_to_datetime(if_modified_since).timestamp())
+    except (TypeError, ValueError):
+        return False
+
+
+class HTTPCacheMiddleware:
+    """参照系エンドポイントの ETag / 304 / 短期レスポンスキャッシュ"""
+
+    def __init__(self, app, routes: Optional[Dict[str, Tuple[str, ...]]] = None,
+                 ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.app = app
+        self.routes = routes if routes is not None else CACHEABLE_ROUTES
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], _CachedResponse]" = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        tables = self.routes.get(scope["path"])
+        if tables is None:
+            await self.app(scope, receive, send)
+            return
+
+        query = scope.get("query_string", b"").decode("latin-1")
+        versions = table_versions.snapshot(tables)
+        digest = hashlib.sha1(f"{scope['path']}?{query}|{versions}".encode()).hexdigest()[:16]
+        etag = f'W/"{_BOOT_ID}-{digest}"'
+        last_modified = table_versions.modified_at(tables)
+        validators = [
+            (b"etag", etag.encode()),
+            (b"last-modified", formatdate(last_modified, usegmt=True).encode()),
+            (b"cache-control", b"no-cache"),
+        ]
+
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        if_modified_since = request_headers.get("if-modified-since")
+        if (if_none_match and _etag_matches(if_none_match, etag)) or (
+            not if_none_match and if_modified_since and _not_modified_since(if_modified_since, last_modified)
+        ):
+            http_cache_stats.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        key = (scope["path"], query)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and (cached.etag != etag or cached.expires_at <= now):
+                del self._entries[key]
+                cached = None
+            elif cached is not None:
+                self._entries.move_to_end(key)
+        if cached is not None:
+            http_cache_stats.cache_hits += 1
+            await send({"type": "http.response.start", "status": cached.status, "headers": cached.headers})
+            await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else cached.body})
+            return
+
+        http_cache_stats.cache_misses += 1
+        captured = {"status": None, "headers": None, "chunks": []}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                if message["status"] == 200:
+                    headers = MutableHeaders(scope=message)
+                    for name, value in validators:
+                        headers[name.decode()] = value.decode()
+                captured["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                captured["chunks"].append(message.get("body", b""))
+                if not message.get("more_body", False) and captured["status"] == 200 and scope["method"] == "GET":
+                    self._store(key, _CachedResponse(
+                        etag, time.monotonic() + self.ttl, 200,
+                        captured["headers"], b"".join(captured["chunks"]),
+                    ))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _store(self, key: Tuple[str, str], entry: _CachedResponse):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
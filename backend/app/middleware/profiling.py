@@ -0,0 +1,60 @@
+"""
+プロファイリングモード
+- X-Profile ヘッダー / ?profile= のトークンが一致したリクエストだけサンプリング
+- ハンドラー側の変更は不要（どのルーターにも効く）
+- 応答に X-Profile-Id と結果の取得先 X-Profile-Url を付ける
+"""
+
+import threading
+import time
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.middleware.timing import route_template
+from app.services.profiler import Profile, Sampler, profile_store, profiling_enabled, token_matches
+from app.services.sql_instrumentation import current_request
+
+
+def _requested_token(scope):
+    token = Headers(scope=scope).get("x-profile")
+    if token:
+        return token
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile")
+    return values[0] if values else None
+
+
+class ProfilingMiddleware:
+    """トークン付きリクエストをサンプリングプロファイラー下で実行"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiling_enabled() or not token_matches(_requested_token(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1"))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Profile-Id"] = profile.id
+                headers["X-Profile-Url"] = f"/api/system/profiles/{profile.id}"
+            await send(message)
+
+        sampler = Sampler(profile, scope, threading.get_ident())
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            profile.duration_ms = (time.perf_counter() - start) * 1000
+            stats = current_request.get()
+            if stats is not None:
+                profile.attach_sql(stats)
+            profile.route = route_template(scope, profile.status or 500)
+            profile_store.add(profile)
@@ -0,0 +1,74 @@
+"""
+リクエスト計測
+- ルート（パステンプレート）単位のレイテンシ・リクエスト数・クエリ数を記録
+- リクエスト中の SQL 集計（sql_instrumentation）の範囲を決める
+"""
+
+import time
+
+from app.services.metrics import registry
+from app.services.sql_instrumentation import RequestStats, current_request, finish_request
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"],
+)
+request_queries = registry.histogram(
+    "http_request_queries", "SQL statements per request", ["method", "route"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+
+def route_template(scope, status: int) -> str:
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is not None:
+        # include_router 配下では route がルーター内の相対パスしか持たないため、
+        # パラメータを埋め戻した相対パスと実パスの差分をプレフィックスとして補う
+        params = scope.get("path_params", {})
+        convertors = getattr(route, "param_convertors", {})
+        try:
+            rendered = path_format.format(**{
+                name: convertors[name].to_string(value) if name in convertors else value
+                for name, value in params.items()
+            })
+        except (KeyError, ValueError, AssertionError):
+            return path_format
+        path = scope["path"]
+        if rendered and path.endswith(rendered):
+            return path[: len(path) - len(rendered)] + path_format
+        return path_format
+    # HTTP キャッシュの 304 などルーティング前に返した応答は固定パスのまま
+    return "unmatched" if status == 404 else scope["path"]
+
+
+class TimingMiddleware:
+    """ルート別レイテンシとクエリ数"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope["method"], scope["path"])
+        token = current_request.set(stats)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                stats.route = route_template(scope, status["code"])
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            stats.route = route_template(scope, status["code"])
+            request_duration.observe(elapsed, scope["method"], stats.route, str(status["code"]))
+            request_queries.observe(stats.query_count, scope["method"], stats.route)
+            finish_request(stats)
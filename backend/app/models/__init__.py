@@ -1,24 +1,33 @@
 # 8718 Flower System - Database Models
-from app.models.stores import Store
+from app.models.stores import Store, StorePeriodSummary, SummaryDirtyPeriod
 from app.models.items import Item
-from app.models.inventory import Inventory, Arrival, Disposal, InventoryAdjustment
-from app.models.transfers import Transfer, PriceChange
+from app.models.inventory import Inventory, Arrival, Disposal, InventoryAdjustment, StockMovement, InventorySnapshot, ItemCost, ItemCostPeriod
+from app.models.transfers import Transfer, PriceChange, DemandDaily, DemandForecast
 from app.models.invoices import Invoice, InvoiceItem
 from app.models.supplies import Supply, SupplyTransfer, SupplyPriceChange
 from app.models.users import User
 from app.models.settings import Setting, TaxRate, Supplier
-from app.models.logs import OperationLog, ErrorAlert
-from app.models.expenses import Expense
+from app.models.logs import OperationLog, ErrorAlert, ReconciliationRun, ForecastRun
+from app.models.expenses import Expense, ExpenseRollup
+from app.models.reports import ReportCache
 
 __all__ = [
     "Store",
+    "StorePeriodSummary",
+    "SummaryDirtyPeriod",
     "Item",
     "Inventory",
     "Arrival",
     "Disposal",
     "InventoryAdjustment",
+    "StockMovement",
+    "InventorySnapshot",
+    "ItemCost",
+    "ItemCostPeriod",
     "Transfer",
     "PriceChange",
+    "DemandDaily",
+    "DemandForecast",
     "Invoice",
     "InvoiceItem",
     "Supply",
@@ -30,5 +39,9 @@ __all__ = [
     "Supplier",
     "OperationLog",
     "ErrorAlert",
+    "ReconciliationRun",
+    "ForecastRun",
     "Expense",
+    "ExpenseRollup",
+    "ReportCache",
 ]
@@ -1,8 +1,10 @@
 """
 経費
+- expenses: 経費明細
+- expense_rollups: 月 × 店舗 × 区分の合計（services/expense_rollups が登録時に加算）
 """
 
-from sqlalchemy import Column, Integer, String, Numeric, Date, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Numeric, Date, DateTime, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -21,5 +23,34 @@ class Expense(Base):
     created_by = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # 月の明細（運賃明細など区分での絞り込み）
+        Index("ix_expenses_year_month_category", "year_month", "category"),
+    )
+
     def __repr__(self):
         return f"<Expense {self.category} {self.amount}>"
+
+
+class ExpenseRollup(Base):
+    """月 × 店舗 × 区分の経費合計"""
+    __tablename__ = "expense_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    year_month = Column(String(7), nullable=False)  # YYYY-MM
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    category = Column(String(50), nullable=False)
+    amount = Column(Numeric(14, 2), nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # 月の読み出しは先頭の year_month で
+        UniqueConstraint("year_month", "store_id", "category", name="uq_expense_rollups_month_store_category"),
+    )
+
+    def __repr__(self):
+        return f"<ExpenseRollup {self.year_month} store={self.store_id} {self.category} {self.amount}>"
+
+
+# 運賃として扱う区分（運賃明細・P&L の内訳で共通）
+FREIGHT_CATEGORIES = ("freight", "freight_brandia", "freight_ota", "shipping")
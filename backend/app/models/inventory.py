@@ -4,11 +4,15 @@
 - arrivals: 入荷記録
 - disposals: 廃棄・ロス
 - inventory_adjustments: 在庫調整
+- stock_movements: 在庫の入出庫台帳（追記のみ）
+- inventory_snapshots: 品目別の在庫スナップショット
+- item_costs: 品目別の移動平均単価・評価額
+- item_cost_periods: 品目 × 月 × 増減種別の数量・金額（評価額・売上原価の集計用）
 """
 
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Text, Index, UniqueConstraint, literal_column
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.database import Base
 
 
@@ -50,6 +54,17 @@ class Arrival(Base):
     created_by = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # 日・月単位の集計（ダッシュボード・分析）
+        Index("ix_arrivals_arrived_at", "arrived_at"),
+        # 残数のあるロットを入荷順に（長期在庫アラート用の部分インデックス）
+        Index(
+            "ix_arrivals_open_lots_arrived_at", "arrived_at",
+            sqlite_where=text("remaining_quantity > 0"),
+            postgresql_where=text("remaining_quantity > 0"),
+        ),
+    )
+
     item = relationship("Item", back_populates="arrivals")
     supplier = relationship("Supplier", back_populates="arrivals")
 
@@ -57,6 +72,10 @@ class Arrival(Base):
         return f"<Arrival item_id={self.item_id} qty={self.quantity}>"
 
 
+# 残数のあるロット（部分インデックスと同じ条件。定数のまま渡さないとインデックスが使われない）
+OPEN_LOT = Arrival.remaining_quantity > literal_column("0")
+
+
 class Disposal(Base):
     """廃棄・ロス"""
     __tablename__ = "disposals"
@@ -89,3 +108,80 @@ class InventoryAdjustment(Base):
 
     def __repr__(self):
         return f"<InventoryAdjustment item_id={self.item_id} type={self.adjustment_type} qty={self.quantity}>"
+
+
+class StockMovement(Base):
+    """在庫の入出庫台帳（追記のみ。quantity は符号付きの増減）"""
+    __tablename__ = "stock_movements"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    movement_type = Column(String(20), nullable=False)  # arrival/import/transfer/disposal/adjustment
+    quantity = Column(Integer, nullable=False)  # +入庫 / -出庫
+    arrival_id = Column(Integer, ForeignKey("arrivals.id"), nullable=True, index=True)  # 入荷ロットID
+    store_id = Column(Integer)  # 持ち出し先（店舗削除後も履歴として残す）
+    source_id = Column(Integer)  # 元レコードの ID（transfers/disposals/inventory_adjustments。入荷は arrival_id）
+    occurred_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_stock_movements_item_occurred", "item_id", "occurred_at"),
+    )
+
+    arrival = relationship("Arrival")
+
+    def __repr__(self):
+        return f"<StockMovement item_id={self.item_id} {self.movement_type} {self.quantity:+d}>"
+
+
+class InventorySnapshot(Base):
+    """品目別の在庫スナップショット（as_of 時点までの台帳合計）"""
+    __tablename__ = "inventory_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    as_of = Column(DateTime(timezone=True), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("item_id", "as_of", name="uq_inventory_snapshots_item_as_of"),
+    )
+
+    def __repr__(self):
+        return f"<InventorySnapshot item_id={self.item_id} as_of={self.as_of} qty={self.quantity}>"
+
+
+class ItemCost(Base):
+    """品目別の在庫評価（移動平均法。増減のたびに更新）"""
+    __tablename__ = "item_costs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False, unique=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    avg_cost = Column(Numeric(14, 4), nullable=False, default=0)  # 移動平均単価
+    value = Column(Numeric(16, 4), nullable=False, default=0)  # 評価額
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ItemCost item_id={self.item_id} qty={self.quantity} avg={self.avg_cost}>"
+
+
+class ItemCostPeriod(Base):
+    """品目 × 月 × 増減種別の数量・金額（入庫は受入額、出庫は移動平均での原価。符号付き）"""
+    __tablename__ = "item_cost_periods"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    period = Column(String(7), nullable=False)  # YYYY-MM（発生月）
+    movement_type = Column(String(20), nullable=False)  # arrival/import/transfer/disposal/adjustment
+    quantity = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(16, 4), nullable=False, default=0)
+
+    __table_args__ = (
+        # 期間での範囲検索にも使う（period 先頭）
+        UniqueConstraint("period", "item_id", "movement_type", name="uq_item_cost_periods_period_item_type"),
+    )
+
+    def __repr__(self):
+        return f"<ItemCostPeriod item_id={self.item_id} {self.period} {self.movement_type} {self.amount}>"
@@ -2,9 +2,11 @@
 ログ/アラート
 - operation_logs: 操作ログ
 - error_alerts: エラーアラート
+- reconciliation_runs: 在庫照合の実行記録
+- forecast_runs: 需要予測バッチの実行記録
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, JSON, Boolean
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -41,3 +43,40 @@ class ErrorAlert(Base):
 
     def __repr__(self):
         return f"<ErrorAlert {self.type} status={self.status}>"
+
+
+class ReconciliationRun(Base):
+    """在庫照合の実行記録（watermark = 照合済みの stock_movements.id）"""
+    __tablename__ = "reconciliation_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mode = Column(String(20), nullable=False)  # incremental/full
+    watermark = Column(Integer, nullable=False, default=0)
+    items_checked = Column(Integer, default=0)
+    lots_checked = Column(Integer, default=0)
+    drift_count = Column(Integer, default=0)
+    fixed = Column(Boolean, default=False)
+    drift = Column(JSON)  # 不整合の明細（先頭のみ）
+    duration_ms = Column(Integer)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ReconciliationRun {self.mode} watermark={self.watermark} drift={self.drift_count}>"
+
+
+class ForecastRun(Base):
+    """需要予測バッチの実行記録（watermark = 系列に集計済みの transfers.id）"""
+    __tablename__ = "forecast_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mode = Column(String(20), nullable=False)  # incremental/full
+    watermark = Column(Integer, nullable=False, default=0)
+    transfers_added = Column(Integer, default=0)
+    series_count = Column(Integer, default=0)
+    forecast_from = Column(Date)
+    forecast_to = Column(Date)
+    duration_ms = Column(Integer)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ForecastRun {self.mode} watermark={self.watermark} series={self.series_count}>"
@@ -0,0 +1,31 @@
+"""
+レポート結果のキャッシュ
+- report_cache: 締めた期間のレポート結果（services/report_cache）
+"""
+
+from sqlalchemy import Column, Integer, String, Date, DateTime, JSON, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ReportCache(Base):
+    """レポート × パラメータの計算結果（対象期間・依存テーブルへの書き込みで削除）"""
+    __tablename__ = "report_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    report = Column(String(50), nullable=False)  # store-summary/supplier-summary/monthly-pl/shipping-costs
+    params = Column(String(200), nullable=False)  # パラメータの JSON（キー順固定）
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False)  # この日を含まない
+    dependencies = Column(JSON, nullable=False)  # テーブル名 -> 絞り込み（{"store_id": 1}）または null（全体）
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("report", "params", name="uq_report_cache_report_params"),
+        # 書き込まれた日を含むエントリの検索
+        Index("ix_report_cache_period", "period_start", "period_end"),
+    )
+
+    def __repr__(self):
+        return f"<ReportCache {self.report} {self.params}>"
@@ -70,6 +70,8 @@ INITIAL_SETTINGS = [
     {"key": "backup_retention_days", "value": "30", "description": "バックアップ保持日数"},
     {"key": "invoice_number_format", "value": "{year}-{month:02d}-{day:02d}-{seq:03d}", "description": "請求書番号形式"},
     {"key": "fiscal_year_start", "value": "4", "description": "会計年度開始月"},
+    {"key": "company_name", "value": "8718 Flower", "description": "請求書の発行元名"},
+    {"key": "invoice_registration_number", "value": "", "description": "適格請求書発行事業者の登録番号（T+13桁）"},
 ]
 
 INITIAL_TAX_RATES = [
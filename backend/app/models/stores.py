@@ -3,7 +3,7 @@
 11店舗: 本部直営4店 + 業務委託7店
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Numeric, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -29,6 +29,41 @@ class Store(Base):
         return f"<Store {self.name}>"
 
 
+class StorePeriodSummary(Base):
+    """店舗 × 月（週）の持ち出し・資材・経費の集計（services/summaries が変更のあった期間だけ作り直す）"""
+    __tablename__ = "store_period_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    grain = Column(String(10), nullable=False)  # month / week
+    period = Column(Date, nullable=False)  # 月初日 / 週の月曜日
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    transfer_count = Column(Integer, nullable=False, default=0)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(16, 2), nullable=False, default=0)  # 納品金額
+    cost = Column(Numeric(16, 2), nullable=False, default=0)  # 仕入金額（仕切値）
+    supply_cost = Column(Numeric(16, 2), nullable=False, default=0)
+    expense = Column(Numeric(16, 2), nullable=False, default=0)  # 月のみ
+
+    __table_args__ = (
+        UniqueConstraint("grain", "period", "store_id", name="uq_store_period_summaries_grain_period_store"),
+    )
+
+    def __repr__(self):
+        return f"<StorePeriodSummary {self.grain} {self.period} store={self.store_id} {self.revenue}>"
+
+
+class SummaryDirtyPeriod(Base):
+    """集計の作り直しが必要な期間（変更と同じトランザクションで記録。grain=all は全期間）"""
+    __tablename__ = "summary_dirty_periods"
+
+    id = Column(Integer, primary_key=True, index=True)
+    grain = Column(String(10), nullable=False)  # month / week / all
+    period = Column(Date)
+
+    def __repr__(self):
+        return f"<SummaryDirtyPeriod {self.grain} {self.period}>"
+
+
 # 店舗順: 豊平→月寒→新琴似→山の手→手稲→ことに→澄川→大曲→北野→通信販売→委託
 INITIAL_STORES = [
     {"id": 1, "name": "豊平", "operation_type": "franchise", "store_type": "store", "email": "toyohira@8718.jp", "sort_order": 1, "color": "#E53935"},
@@ -2,9 +2,11 @@
 持ち出し/単価変更
 - transfers: 持ち出し記録
 - price_changes: 単価変更履歴
+- demand_daily: 品目 × 店舗 × 日の持ち出し数（需要予測の系列。transfers から増分で集計）
+- demand_forecasts: 品目 × 店舗 × 日の予測持ち出し数（夜間バッチで作成）
 """
 
-from sqlalchemy import Column, Integer, Numeric, DateTime, Date, ForeignKey, Text
+from sqlalchemy import Column, Integer, Float, Numeric, DateTime, Date, ForeignKey, Text, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -26,6 +28,11 @@ class Transfer(Base):
     input_by = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # 日・月単位の集計（ダッシュボード・分析）
+        Index("ix_transfers_transferred_at", "transferred_at"),
+    )
+
     store = relationship("Store", back_populates="transfers")
     item = relationship("Item", back_populates="transfers")
 
@@ -55,3 +62,41 @@ class PriceChange(Base):
 
     def __repr__(self):
         return f"<PriceChange item={self.item_id} {self.old_price} -> {self.new_price}>"
+
+
+class DemandDaily(Base):
+    """品目 × 店舗 × 日の持ち出し数"""
+    __tablename__ = "demand_daily"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    quantity = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # 期間で読み出すので日付を先頭に
+        UniqueConstraint("day", "item_id", "store_id", name="uq_demand_daily_day_item_store"),
+    )
+
+    def __repr__(self):
+        return f"<DemandDaily {self.day} item={self.item_id} store={self.store_id} qty={self.quantity}>"
+
+
+class DemandForecast(Base):
+    """品目 × 店舗 × 日の予測持ち出し数"""
+    __tablename__ = "demand_forecasts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    target_date = Column(Date, nullable=False)
+    quantity = Column(Float, nullable=False)
+    peak = Column(Text)  # 繁忙期の名前（母の日・お盆など）
+
+    __table_args__ = (
+        Index("ix_demand_forecasts_item_target", "item_id", "target_date"),
+    )
+
+    def __repr__(self):
+        return f"<DemandForecast {self.target_date} item={self.item_id} store={self.store_id} qty={self.quantity:.1f}>"
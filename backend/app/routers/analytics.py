@@ -3,308 +3,169 @@
 - 仕入先別集計
 - 店舗別集計
 - 仕入・納品 金額比較
+  （この 3 つと P&L の売上集計は analytics_engine で配列演算。months で複数月・複数年）
 - 月間報告書 (P&L)
 - 運賃明細
+- ダッシュボード（セクション別キャッシュ）
+- 売上原価（移動平均法）と粗利
+- 需要予測と仕入先別の発注提案
+- 汎用集計（任意の期間・軸・指標。olap）
+- 店舗別の月次・週次推移と前年比（集計テーブル。summaries）
+- 先月以前の店舗別・仕入先別・P&L・運賃明細は結果を保存して再利用（report_cache）
 """
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract, case, and_
-from typing import Optional
+from sqlalchemy import func
+from typing import List, Optional
 from datetime import date, datetime
-from decimal import Decimal
 
 from app.database import get_db
-from app.models.inventory import Arrival
 from app.models.transfers import Transfer
 from app.models.invoices import Invoice
-from app.models.expenses import Expense
+from app.models.expenses import FREIGHT_CATEGORIES, Expense
 from app.models.supplies import SupplyTransfer, Supply
 from app.models.stores import Store
 from app.models.items import Item
-from app.models.settings import Supplier
+from app.models.logs import ForecastRun
+from app.schemas.analytics import AnalyticsQueryRequest
+from app.schemas.logs import ForecastRunResponse
+from app.services import analytics_engine, expense_rollups, forecast, olap, report_cache, summaries, valuation
+from app.services.dashboard import dashboard_cache
 
 router = APIRouter()
 
 
+@router.get("/dashboard")
+def get_dashboard(db: Session = Depends(get_db)):
+    """ダッシュボード集計（本日の仕入・在庫金額・持ち出し・店舗別ランキング・アラート）"""
+    return dashboard_cache.get(db)
+
+
+def _month_range(year: int, month: int, months: int):
+    if not 1 <= months <= analytics_engine.MAX_MONTHS:
+        raise HTTPException(status_code=400, detail=f"months must be between 1 and {analytics_engine.MAX_MONTHS}")
+    return analytics_engine.month_range(year, month, months)
+
+
+@router.post("/query")
+def run_analytics_query(request: AnalyticsQueryRequest, db: Session = Depends(get_db)):
+    """汎用集計（仕入・持ち出し・資材・経費を期間・店舗・花・分類・仕入先の任意の組み合わせで）"""
+    try:
+        query = olap.build_query(db, **request.model_dump())
+        return olap.run(db, query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/trend")
+def get_trend(
+    year: int = Query(...),
+    month: int = Query(..., ge=1, le=12),
+    months: int = 12,
+    grain: str = "month",
+    store_id: Optional[int] = None,
+    compare: bool = True,
+    db: Session = Depends(get_db)
+):
+    """店舗別の月次（週次）推移: 納品・仕入・差額・資材・経費（compare で前年同期と前年比）"""
+    start, end = _month_range(year, month, months)
+    try:
+        trend = summaries.trend(db, grain, start, end, store_id=store_id, compare=compare)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"year": year, "month": month, "months": months, **trend}
+
+
 @router.get("/supplier-summary")
 def get_supplier_summary(
     year: int = Query(...),
-    month: int = Query(...),
+    month: int = Query(..., ge=1, le=12),
+    months: int = 1,
     db: Session = Depends(get_db)
 ):
-    """仕入先別 仕入金額集計"""
-    results = (
-        db.query(
-            Supplier.id,
-            Supplier.name,
-            func.count(Arrival.id).label("arrival_count"),
-            func.sum(Arrival.quantity).label("total_quantity"),
-            func.sum(Arrival.quantity * Arrival.wholesale_price).label("total_amount"),
-        )
-        .outerjoin(Arrival, and_(
-            Arrival.supplier_id == Supplier.id,
-            extract("year", Arrival.arrived_at) == year,
-            extract("month", Arrival.arrived_at) == month,
-        ))
-        .group_by(Supplier.id, Supplier.name)
-        .order_by(func.sum(Arrival.quantity * Arrival.wholesale_price).desc().nullslast())
-        .all()
+    """仕入先別 仕入金額集計（months で複数月）"""
+    start, end = _month_range(year, month, months)
+    params = {"year": year, "month": month, "months": months}
+    return report_cache.cached(
+        db, "supplier-summary", params, start, end,
+        lambda: {**params, **analytics_engine.supplier_summary(db, start, end)},
     )
 
-    suppliers = []
-    grand_total = Decimal(0)
-    for row in results:
-        amount = Decimal(str(row.total_amount or 0))
-        grand_total += amount
-        suppliers.append({
-            "supplier_id": row.id,
-            "supplier_name": row.name,
-            "arrival_count": row.arrival_count or 0,
-            "total_quantity": row.total_quantity or 0,
-            "total_amount": float(amount),
-        })
-
-    return {
-        "year": year,
-        "month": month,
-        "suppliers": suppliers,
-        "grand_total": float(grand_total),
-    }
-
 
 @router.get("/store-summary")
 def get_store_summary(
     year: int = Query(...),
-    month: int = Query(...),
+    month: int = Query(..., ge=1, le=12),
+    months: int = 1,
     db: Session = Depends(get_db)
 ):
-    """店舗別 納品金額集計"""
-    results = (
-        db.query(
-            Store.id,
-            Store.name,
-            Store.operation_type,
-            func.count(Transfer.id).label("transfer_count"),
-            func.sum(Transfer.quantity).label("total_quantity"),
-            func.sum(Transfer.quantity * Transfer.unit_price).label("delivery_amount"),
-            func.sum(Transfer.quantity * Transfer.wholesale_price).label("purchase_amount"),
-        )
-        .outerjoin(Transfer, and_(
-            Transfer.store_id == Store.id,
-            extract("year", Transfer.transferred_at) == year,
-            extract("month", Transfer.transferred_at) == month,
-        ))
-        .filter(Store.is_active == True)
-        .group_by(Store.id, Store.name, Store.operation_type)
-        .order_by(Store.sort_order)
-        .all()
+    """店舗別 納品金額集計（months で複数月）"""
+    start, end = _month_range(year, month, months)
+    params = {"year": year, "month": month, "months": months}
+    return report_cache.cached(
+        db, "store-summary", params, start, end,
+        lambda: {**params, **analytics_engine.store_summary(db, start, end)},
     )
 
-    stores = []
-    total_delivery = Decimal(0)
-    total_purchase = Decimal(0)
-    for row in results:
-        d_amount = Decimal(str(row.delivery_amount or 0))
-        p_amount = Decimal(str(row.purchase_amount or 0))
-        total_delivery += d_amount
-        total_purchase += p_amount
-        stores.append({
-            "store_id": row.id,
-            "store_name": row.name,
-            "operation_type": row.operation_type,
-            "transfer_count": row.transfer_count or 0,
-            "total_quantity": row.total_quantity or 0,
-            "delivery_amount": float(d_amount),
-            "purchase_amount": float(p_amount),
-            "margin": float(d_amount - p_amount),
-        })
-
-    return {
-        "year": year,
-        "month": month,
-        "stores": stores,
-        "total_delivery": float(total_delivery),
-        "total_purchase": float(total_purchase),
-        "total_margin": float(total_delivery - total_purchase),
-    }
-
 
 @router.get("/purchase-delivery-comparison")
 def get_purchase_delivery_comparison(
     year: int = Query(...),
-    month: int = Query(...),
+    month: int = Query(..., ge=1, le=12),
+    months: int = 1,
     db: Session = Depends(get_db)
 ):
-    """仕入・納品 金額比較 (日別)"""
-    # 日別仕入金額
-    arrivals_by_day = (
-        db.query(
-            func.date(Arrival.arrived_at).label("day"),
-            func.sum(Arrival.quantity * Arrival.wholesale_price).label("amount"),
-            func.sum(Arrival.quantity).label("quantity"),
-        )
-        .filter(
-            extract("year", Arrival.arrived_at) == year,
-            extract("month", Arrival.arrived_at) == month,
-        )
-        .group_by(func.date(Arrival.arrived_at))
-        .all()
-    )
-
-    # 日別納品金額
-    transfers_by_day = (
-        db.query(
-            Transfer.transferred_at.label("day"),
-            func.sum(Transfer.quantity * Transfer.unit_price).label("amount"),
-            func.sum(Transfer.quantity).label("quantity"),
-        )
-        .filter(
-            extract("year", Transfer.transferred_at) == year,
-            extract("month", Transfer.transferred_at) == month,
-        )
-        .group_by(Transfer.transferred_at)
-        .all()
-    )
-
-    arrival_map = {str(r.day): {"amount": float(r.amount or 0), "quantity": int(r.quantity or 0)} for r in arrivals_by_day}
-    transfer_map = {str(r.day): {"amount": float(r.amount or 0), "quantity": int(r.quantity or 0)} for r in transfers_by_day}
-
-    all_days = sorted(set(list(arrival_map.keys()) + list(transfer_map.keys())))
-
-    daily = []
-    period_totals = {"1-10": {"purchase": 0, "delivery": 0}, "11-20": {"purchase": 0, "delivery": 0}, "21-end": {"purchase": 0, "delivery": 0}}
-    for day_str in all_days:
-        day_num = int(day_str.split("-")[2])
-        purchase = arrival_map.get(day_str, {"amount": 0, "quantity": 0})
-        delivery = transfer_map.get(day_str, {"amount": 0, "quantity": 0})
-
-        if day_num <= 10:
-            period = "1-10"
-        elif day_num <= 20:
-            period = "11-20"
-        else:
-            period = "21-end"
-
-        period_totals[period]["purchase"] += purchase["amount"]
-        period_totals[period]["delivery"] += delivery["amount"]
-
-        daily.append({
-            "date": day_str,
-            "purchase_amount": purchase["amount"],
-            "purchase_quantity": purchase["quantity"],
-            "delivery_amount": delivery["amount"],
-            "delivery_quantity": delivery["quantity"],
-            "difference": delivery["amount"] - purchase["amount"],
-        })
-
-    total_purchase = sum(d["purchase_amount"] for d in daily)
-    total_delivery = sum(d["delivery_amount"] for d in daily)
-
-    return {
-        "year": year,
-        "month": month,
-        "daily": daily,
-        "period_totals": period_totals,
-        "total_purchase": total_purchase,
-        "total_delivery": total_delivery,
-        "total_difference": total_delivery - total_purchase,
-    }
+    """仕入・納品 金額比較 (日別。上中下旬の合計は months か月分をまとめて)"""
+    start, end = _month_range(year, month, months)
+    return {"year": year, "month": month, "months": months, **analytics_engine.purchase_delivery(db, start, end)}
 
 
 @router.get("/monthly-pl")
 def get_monthly_pl(
     year: int = Query(...),
-    month: int = Query(...),
+    month: int = Query(..., ge=1, le=12),
     store_id: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
     """月間報告書 (P&L)"""
-    # 仕入金額
-    arrival_query = db.query(
-        func.sum(Arrival.quantity * Arrival.wholesale_price).label("total")
-    ).filter(
-        extract("year", Arrival.arrived_at) == year,
-        extract("month", Arrival.arrived_at) == month,
+    start, end = analytics_engine.month_range(year, month)
+    return report_cache.cached(
+        db, "monthly-pl", {"year": year, "month": month, "store_id": store_id}, start, end,
+        lambda: _monthly_pl(db, year, month, store_id, start, end),
     )
 
-    # 納品金額 (売上)
-    transfer_query = db.query(
-        func.sum(Transfer.quantity * Transfer.unit_price).label("revenue"),
-        func.sum(Transfer.quantity * Transfer.wholesale_price).label("cost"),
-        func.sum(Transfer.quantity).label("quantity"),
-    ).filter(
-        extract("year", Transfer.transferred_at) == year,
-        extract("month", Transfer.transferred_at) == month,
-    )
 
-    # 経費
-    expense_query = db.query(
-        Expense.category,
-        func.sum(Expense.amount).label("total"),
-    ).filter(
-        Expense.target_month == f"{year}-{month:02d}",
-    )
+def _monthly_pl(db: Session, year: int, month: int, store_id: Optional[int], start: date, end: date) -> dict:
+    sales = analytics_engine.sales_totals(db, start, end, store_id)
+
+    # 経費（月 × 店舗 × 区分の集計から）
+    expenses_by_category = expense_rollups.by_category(db, f"{year}-{month:02d}", store_id)
 
     # 資材持出
     supply_query = db.query(
         func.sum(SupplyTransfer.quantity * SupplyTransfer.unit_price).label("total")
     ).filter(
-        extract("year", SupplyTransfer.transferred_at) == year,
-        extract("month", SupplyTransfer.transferred_at) == month,
+        SupplyTransfer.transferred_at >= start,
+        SupplyTransfer.transferred_at < end,
     )
-
     if store_id:
-        transfer_query = transfer_query.filter(Transfer.store_id == store_id)
-        expense_query = expense_query.filter(Expense.store_id == store_id)
         supply_query = supply_query.filter(SupplyTransfer.store_id == store_id)
-
-    arrival_result = arrival_query.first()
-    transfer_result = transfer_query.first()
-    expense_results = expense_query.group_by(Expense.category).all()
     supply_result = supply_query.first()
 
-    total_purchase = float(arrival_result.total or 0)
-    total_revenue = float(transfer_result.revenue or 0)
-    total_cost = float(transfer_result.cost or 0)
-    total_quantity = int(transfer_result.quantity or 0)
+    total_purchase = sales["total_purchase"]
+    total_revenue = sales["total_revenue"]
+    total_cost = sales["total_cost"]
+    total_quantity = sales["total_quantity"]
     total_supply = float(supply_result.total or 0)
 
-    expenses_by_category = {r.category: float(r.total) for r in expense_results}
     total_expenses = sum(expenses_by_category.values())
+    total_freight = sum(v for k, v in expenses_by_category.items() if k in FREIGHT_CATEGORIES)
 
     gross_profit = total_revenue - total_cost
     gross_margin = (gross_profit / total_revenue * 100) if total_revenue > 0 else 0
     operating_profit = gross_profit - total_expenses - total_supply
 
-    # 店舗別売上
-    store_breakdown = (
-        db.query(
-            Store.id,
-            Store.name,
-            func.sum(Transfer.quantity * Transfer.unit_price).label("revenue"),
-            func.sum(Transfer.quantity).label("quantity"),
-        )
-        .join(Transfer, Transfer.store_id == Store.id)
-        .filter(
-            extract("year", Transfer.transferred_at) == year,
-            extract("month", Transfer.transferred_at) == month,
-        )
-        .group_by(Store.id, Store.name)
-        .order_by(func.sum(Transfer.quantity * Transfer.unit_price).desc())
-        .all()
-    )
-
-    stores = [
-        {
-            "store_id": r.id,
-            "store_name": r.name,
-            "revenue": float(r.revenue or 0),
-            "quantity": int(r.quantity or 0),
-        }
-        for r in store_breakdown
-    ]
-
     return {
         "year": year,
         "month": month,
@@ -316,40 +177,100 @@ def get_monthly_pl(
             "gross_profit": gross_profit,
             "gross_margin": round(gross_margin, 1),
             "total_expenses": total_expenses,
+            "total_freight": total_freight,
             "total_supply_cost": total_supply,
             "operating_profit": operating_profit,
             "total_quantity": total_quantity,
         },
         "expenses_by_category": expenses_by_category,
-        "store_breakdown": stores,
+        "store_breakdown": sales["store_breakdown"],
+    }
+
+
+@router.get("/cost-of-goods")
+def get_cost_of_goods(
+    year: int = Query(...),
+    month: int = Query(..., ge=1, le=12),
+    db: Session = Depends(get_db)
+):
+    """売上原価（移動平均法。在庫評価の月次集計から）と、持ち出し売上に対する粗利"""
+    result = valuation.cost_of_goods(db, f"{year}-{month:02d}", f"{year}-{month:02d}")
+    revenue = (
+        db.query(func.sum(Transfer.quantity * Transfer.unit_price))
+        .filter(
+            Transfer.transferred_at >= date(year, month, 1),
+            Transfer.transferred_at < (date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)),
+        )
+        .scalar()
+    )
+    total_revenue = float(revenue or 0)
+    gross_profit = total_revenue - result["total_cogs"]
+    return {
+        "year": year,
+        "month": month,
+        **result,
+        "total_revenue": total_revenue,
+        "gross_profit": round(gross_profit, 2),
+        "gross_margin": round(gross_profit / total_revenue * 100, 1) if total_revenue > 0 else 0,
     }
 
 
+@router.get("/forecast")
+def get_forecast(supplier_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """次の市場日の仕入先別発注提案（夜間バッチの需要予測から。市場日は MARKET_WEEKDAYS）"""
+    return forecast.suggestions(db, supplier_id=supplier_id)
+
+
+@router.post("/forecast/run", response_model=ForecastRunResponse)
+def run_forecast(full: bool = False, db: Session = Depends(get_db)):
+    """需要予測バッチを実行（既定は前回以降の持ち出しのみ系列に加算。full=true で系列を作り直す）"""
+    forecast_run = forecast.run(db, full=full)
+    db.commit()
+    db.refresh(forecast_run)
+    return forecast_run
+
+
+@router.get("/forecast/runs", response_model=List[ForecastRunResponse])
+def get_forecast_runs(limit: int = 20, db: Session = Depends(get_db)):
+    """需要予測バッチの実行履歴"""
+    return db.query(ForecastRun).order_by(ForecastRun.id.desc()).limit(limit).all()
+
+
 @router.get("/shipping-costs")
 def get_shipping_costs(
     year: int = Query(...),
-    month: int = Query(...),
+    month: int = Query(..., ge=1, le=12),
     db: Session = Depends(get_db)
 ):
     """運賃明細 (経費の運賃カテゴリ)"""
+    start, end = analytics_engine.month_range(year, month)
+    return report_cache.cached(
+        db, "shipping-costs", {"year": year, "month": month}, start, end,
+        lambda: _shipping_costs(db, year, month),
+    )
+
+
+def _shipping_costs(db: Session, year: int, month: int) -> dict:
+    year_month = f"{year}-{month:02d}"
+    # 明細は (year_month, category) のインデックスで、合計は月次集計から
     results = (
         db.query(
             Expense.store_id,
             Store.name.label("store_name"),
             Expense.category,
             Expense.amount,
-            Expense.target_month,
             Expense.note,
             Expense.created_at,
         )
         .join(Store, Store.id == Expense.store_id)
         .filter(
-            Expense.target_month == f"{year}-{month:02d}",
-            Expense.category.in_(["freight_brandia", "freight_ota", "freight", "shipping"]),
+            Expense.year_month == year_month,
+            Expense.category.in_(FREIGHT_CATEGORIES),
         )
         .order_by(Expense.created_at)
         .all()
     )
+    by_store = expense_rollups.by_store(db, year_month, FREIGHT_CATEGORIES)
 
     items = [
         {
@@ -362,11 +283,10 @@ def get_shipping_costs(
         for r in results
     ]
 
-    total = sum(item["amount"] for item in items)
-
     return {
         "year": year,
         "month": month,
         "items": items,
-        "total": total,
+        "by_store": [{"store_id": store_id, "amount": amount} for store_id, amount in sorted(by_store.items())],
+        "total": sum(by_store.values()),
     }
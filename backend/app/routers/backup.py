@@ -11,7 +11,7 @@ import shutil
 from fastapi import APIRouter, Depends
 from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import inspect
+from sqlalchemy import inspect, text
 
 from app.database import get_db, engine
 
@@ -41,10 +41,11 @@ async def export_csv(db: Session = Depends(get_db)):
     buffer = io.BytesIO()
     with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
         for table_name in table_names:
-            rows = db.execute(f"SELECT * FROM {table_name}").fetchall()
+            result = db.execute(text(f'SELECT * FROM "{table_name}"'))
+            columns = list(result.keys())
+            rows = result.fetchall()
             if not rows:
                 continue
-            columns = db.execute(f"SELECT * FROM {table_name} LIMIT 0").keys()
 
             csv_buffer = io.StringIO()
             writer = csv.writer(csv_buffer)
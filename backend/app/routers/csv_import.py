@@ -9,14 +9,18 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
+from collections import defaultdict
 from pydantic import BaseModel
 import csv
 import io
 
 from app.database import get_db
 from app.models.items import Item, generate_item_code
-from app.models.inventory import Inventory, Arrival
+from app.models.inventory import Arrival
 from app.models.settings import Supplier
+from app.services import stock_ledger, stock_updates, valuation
+from app.services.events import emit
+from app.services.master_cache import master_cache
 
 router = APIRouter()
 
@@ -57,7 +61,7 @@ async def preview_csv(
     db: Session = Depends(get_db),
 ):
     """CSVファイルをプレビュー（最初の20行）"""
-    supplier = db.query(Supplier).filter(Supplier.id == supplier_id).first()
+    supplier = master_cache.get(db, Supplier, supplier_id)
     if not supplier:
         raise HTTPException(status_code=404, detail="仕入先が見つかりません")
 
@@ -107,7 +111,7 @@ async def execute_csv_import(
     db: Session = Depends(get_db),
 ):
     """CSVファイルをインポートして入荷レコードを生成"""
-    supplier = db.query(Supplier).filter(Supplier.id == supplier_id).first()
+    supplier = master_cache.get(db, Supplier, supplier_id)
     if not supplier:
         raise HTTPException(status_code=404, detail="仕入先が見つかりません")
 
@@ -130,6 +134,9 @@ async def execute_csv_import(
     imported = 0
     skipped = 0
     errors = []
+    imported_item_ids = set()
+    # 在庫評価は品目ごとにまとめて反映: item_id -> [単価ありの数量, 単価ありの金額, 単価なしの数量]
+    received = defaultdict(lambda: [0, 0.0, 0])
     new_items = 0
 
     for i, row in enumerate(reader):
@@ -194,22 +201,23 @@ async def execute_csv_import(
                 item_id=item.id,
                 supplier_id=supplier_id,
                 quantity=quantity,
+                remaining_quantity=quantity,
                 wholesale_price=unit_price,
                 source_type="csv_import",
                 arrived_at=arrive_dt,
             )
             db.add(arrival)
 
-            inv = db.query(Inventory).filter(Inventory.item_id == item.id).first()
-            if inv:
-                inv.quantity += quantity
+            on_hand = stock_updates.add_to_inventory(db, item.id, quantity, unit_price or item.default_unit_price)
+            stock_ledger.record(db, item.id, "import", quantity, occurred_at=arrive_dt, arrival=arrival,
+                                invalidate=False, valuate=False)
+            imported_item_ids.add(item.id)
+            if unit_price is not None:
+                received[item.id][0] += quantity
+                received[item.id][1] += quantity * unit_price
             else:
-                inv = Inventory(
-                    item_id=item.id,
-                    quantity=quantity,
-                    unit_price=unit_price or item.default_unit_price,
-                )
-                db.add(inv)
+                received[item.id][2] += quantity
+            emit(db, "inventory", item_id=item.id, quantity=on_hand, delta=quantity)
 
             imported += 1
 
@@ -217,6 +225,13 @@ async def execute_csv_import(
             errors.append(f"行 {i + 1}: {str(e)}")
             skipped += 1
 
+    stock_ledger.invalidate_snapshots(db, imported_item_ids, arrive_dt)
+    # 入庫どうしなので、まとめて受け入れても移動平均は行ごとの場合と同じ（単価なしは最後に平均単価で）
+    for item_id, (priced_quantity, priced_amount, unpriced_quantity) in received.items():
+        if priced_quantity:
+            valuation.apply(db, item_id, "import", priced_quantity, arrive_dt, priced_amount / priced_quantity)
+        if unpriced_quantity:
+            valuation.apply(db, item_id, "import", unpriced_quantity, arrive_dt)
     db.commit()
 
     return CSVImportResult(
@@ -0,0 +1,79 @@
+"""
+在庫イベント配信 API (Server-Sent Events)
+- GET /stream?stores=1,2&items=10 で店舗 / 品目を絞って購読（指定なしは全件）
+- 1 メッセージ = 合算済みの変更リスト {"events": [...]}
+- 再接続時は Last-Event-ID 以降を再送。履歴切れなら resync を送るので REST で取り直す
+"""
+
+import json
+import os
+from typing import Optional, Set
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.services.events import event_bus
+
+router = APIRouter()
+
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+
+def _parse_ids(value: Optional[str], name: str) -> Optional[Set[int]]:
+    if not value:
+        return None
+    try:
+        return {int(v) for v in value.split(",") if v.strip()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be comma-separated integers")
+
+
+def _message(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, default=str))
+    return "\n".join(lines) + "\n\n"
+
+
+@router.get("/stream")
+async def stream_events(
+    stores: Optional[str] = None,
+    items: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+):
+    """在庫・ロット・持ち出しの変更をプッシュ"""
+    store_ids = _parse_ids(stores, "stores")
+    item_ids = _parse_ids(items, "items")
+    resume_from = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    subscription = event_bus.subscribe(store_ids, item_ids, resume_from)
+
+    async def body():
+        try:
+            yield "retry: 3000\n\n"
+            if subscription.resync:
+                yield _message("resync", {}, subscription.start_id)
+            else:
+                # 再送分があるときは、その配信で ID を進める
+                yield _message("ready", {}, subscription.start_id if resume_from is None else None)
+            while True:
+                event_id, events = await subscription.next_batch(EVENTS_HEARTBEAT_SECONDS)
+                if events:
+                    yield _message("changes", {"events": events}, event_id)
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats")
+def get_event_stats():
+    """購読者数・配信済みイベント数"""
+    return event_bus.stats()
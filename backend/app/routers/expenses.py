@@ -1,5 +1,6 @@
 """
 経費 API
+- 登録時に月 × 店舗 × 区分の集計（expense_rollups）へ加算
 """
 
 from fastapi import APIRouter, Depends, HTTPException
@@ -9,6 +10,7 @@ from typing import List, Optional
 from app.database import get_db
 from app.models.expenses import Expense
 from app.schemas.expenses import ExpenseCreate, ExpenseResponse
+from app.services import expense_rollups
 
 router = APIRouter()
 
@@ -38,6 +40,7 @@ def create_expense(expense: ExpenseCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Amount must be positive")
     db_expense = Expense(**expense.model_dump())
     db.add(db_expense)
+    expense_rollups.apply(db, expense.year_month, expense.store_id, expense.category, expense.amount)
     db.commit()
     db.refresh(db_expense)
     return db_expense
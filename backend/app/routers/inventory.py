@@ -4,22 +4,60 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from typing import List, Optional
 from datetime import datetime, timedelta, date, time
 
 from app.database import get_db
-from app.models.inventory import Inventory, Arrival, InventoryAdjustment, Disposal
+from app.models.inventory import Inventory, Arrival, InventoryAdjustment, Disposal, StockMovement, OPEN_LOT
 from app.models.items import Item
-from app.models.settings import Setting
+from app.models.logs import ReconciliationRun
+from app.models.settings import Supplier
+from app.services import reconciliation, stock_ledger, stock_updates, valuation
+from app.services.events import emit
+from app.services.fast_json import RowSerializer
+from app.services.master_cache import master_cache
+from app.services.settings_service import settings_service
 from app.schemas.inventory import (
     InventoryResponse, ArrivalCreate, ArrivalResponse,
     InventoryAdjustmentCreate, InventoryAdjustmentResponse,
-    LongTermAlertResponse, DisposalCreate, DisposalResponse
+    LongTermAlertResponse, DisposalCreate, DisposalResponse,
+    StockMovementResponse, StockLevelResponse, SnapshotResult, InventoryValuationResponse
 )
+from app.schemas.logs import ReconciliationRunResponse
 
 router = APIRouter()
 
+# InventoryResponse と同じキー
+INVENTORY_ROWS = RowSerializer([
+    ("id", Inventory.id),
+    ("item_id", Inventory.item_id),
+    ("quantity", Inventory.quantity),
+    ("unit_price", Inventory.unit_price),
+    ("updated_at", Inventory.updated_at),
+])
+
+# ArrivalResponse と同じキー（花名・仕入先名は JOIN で取得）
+ARRIVAL_ROWS = RowSerializer([
+    ("id", Arrival.id),
+    ("display_id", Arrival.display_id),
+    ("item_id", Arrival.item_id),
+    ("supplier_id", Arrival.supplier_id),
+    ("quantity", Arrival.quantity),
+    ("remaining_quantity", Arrival.remaining_quantity),
+    ("wholesale_price", Arrival.wholesale_price),
+    ("color", Arrival.color),
+    ("grade", Arrival.grade),
+    ("grade_class", Arrival.grade_class),
+    ("stem_length", Arrival.stem_length),
+    ("bloom_count", Arrival.bloom_count),
+    ("arrived_at", Arrival.arrived_at),
+    ("source_type", Arrival.source_type),
+    ("created_at", Arrival.created_at),
+    ("item_name", Item.name),
+    ("item_variety", Item.variety),
+    ("supplier_name", Supplier.name),
+])
+
 
 @router.get("/", response_model=List[InventoryResponse])
 def get_inventory(
@@ -29,12 +67,18 @@ def get_inventory(
     db: Session = Depends(get_db)
 ):
     """倉庫在庫一覧"""
-    query = db.query(Inventory).join(Item).filter(Item.is_active == True)
+    query = (
+        db.query(*INVENTORY_ROWS.columns)
+        .join(Item, Inventory.item_id == Item.id)
+        .filter(Item.is_active == True)
+    )
 
     if low_stock:
         query = query.filter(Inventory.quantity < 10)
 
-    return query.order_by(Inventory.quantity.desc()).offset(skip).limit(limit).all()
+    return INVENTORY_ROWS.response(
+        query.order_by(Inventory.quantity.desc()).offset(skip).limit(limit).all()
+    )
 
 
 @router.get("/item/{item_id}", response_model=InventoryResponse)
@@ -56,8 +100,11 @@ def get_arrivals(
     db: Session = Depends(get_db)
 ):
     """入荷履歴一覧"""
-    from app.models.settings import Supplier
-    query = db.query(Arrival)
+    query = (
+        db.query(*ARRIVAL_ROWS.columns)
+        .outerjoin(Item, Arrival.item_id == Item.id)
+        .outerjoin(Supplier, Arrival.supplier_id == Supplier.id)
+    )
     if item_id:
         query = query.filter(Arrival.item_id == item_id)
     if supplier_id:
@@ -67,24 +114,9 @@ def get_arrivals(
     if date_to:
         query = query.filter(Arrival.arrived_at <= datetime.combine(date_to, time.max))
 
-    rows = query.order_by(Arrival.arrived_at.desc()).offset(skip).limit(limit).all()
-
-    # Enrich with item/supplier names
-    item_ids = {r.item_id for r in rows}
-    supplier_ids = {r.supplier_id for r in rows if r.supplier_id}
-    item_map = {i.id: i for i in db.query(Item).filter(Item.id.in_(item_ids)).all()} if item_ids else {}
-    supplier_map = {s.id: s.name for s in db.query(Supplier).filter(Supplier.id.in_(supplier_ids)).all()} if supplier_ids else {}
-
-    result = []
-    for r in rows:
-        data = ArrivalResponse.model_validate(r)
-        item = item_map.get(r.item_id)
-        if item:
-            data.item_name = item.name
-            data.item_variety = item.variety
-        data.supplier_name = supplier_map.get(r.supplier_id)
-        result.append(data)
-    return result
+    return ARRIVAL_ROWS.response(
+        query.order_by(Arrival.arrived_at.desc()).offset(skip).limit(limit).all()
+    )
 
 
 def _generate_display_id(db: Session, arrival_date: datetime = None) -> str:
@@ -110,7 +142,7 @@ def _generate_display_id(db: Session, arrival_date: datetime = None) -> str:
 @router.post("/arrivals", response_model=ArrivalResponse)
 def create_arrival(arrival: ArrivalCreate, db: Session = Depends(get_db)):
     """入荷登録"""
-    item = db.query(Item).filter(Item.id == arrival.item_id).first()
+    item = master_cache.get(db, Item, arrival.item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if arrival.quantity <= 0:
@@ -134,17 +166,15 @@ def create_arrival(arrival: ArrivalCreate, db: Session = Depends(get_db)):
         arrived_at=arrival.arrived_at or None,
     )
     db.add(db_arrival)
+    quantity = stock_updates.add_to_inventory(db, arrival.item_id, arrival.quantity, item.default_unit_price)
 
-    inventory = db.query(Inventory).filter(Inventory.item_id == arrival.item_id).first()
-    if inventory:
-        inventory.quantity += arrival.quantity
-    else:
-        inventory = Inventory(
-            item_id=arrival.item_id,
-            quantity=arrival.quantity,
-            unit_price=item.default_unit_price,
-        )
-        db.add(inventory)
+    db.flush()
+    stock_ledger.record(db, arrival.item_id, "arrival", arrival.quantity,
+                        occurred_at=arrival.arrived_at, arrival_id=db_arrival.id,
+                        unit_cost=arrival.wholesale_price)
+    emit(db, "arrival", arrival_id=db_arrival.id, item_id=arrival.item_id,
+         quantity=arrival.quantity, remaining_quantity=arrival.quantity)
+    emit(db, "inventory", item_id=arrival.item_id, quantity=quantity, delta=arrival.quantity)
 
     db.commit()
     db.refresh(db_arrival)
@@ -171,7 +201,7 @@ def create_adjustment(
     db: Session = Depends(get_db)
 ):
     """在庫調整登録"""
-    item = db.query(Item).filter(Item.id == adjustment.item_id).first()
+    item = master_cache.get(db, Item, adjustment.item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if adjustment.quantity == 0:
@@ -187,9 +217,14 @@ def create_adjustment(
     )
     db.add(db_adjustment)
 
-    inventory = db.query(Inventory).filter(Inventory.item_id == adjustment.item_id).first()
-    if inventory:
-        inventory.quantity += adjustment.quantity
+    quantity = stock_updates.change_inventory(db, adjustment.item_id, adjustment.quantity)
+    if quantity is None:
+        quantity = stock_ledger.stock_at(db, adjustment.item_id) + adjustment.quantity
+        db.add(Inventory(item_id=adjustment.item_id, quantity=quantity, unit_price=item.default_unit_price))
+
+    db.flush()
+    stock_ledger.record(db, adjustment.item_id, "adjustment", adjustment.quantity, source_id=db_adjustment.id)
+    emit(db, "inventory", item_id=adjustment.item_id, quantity=quantity, delta=adjustment.quantity)
 
     db.commit()
     db.refresh(db_adjustment)
@@ -213,15 +248,16 @@ def get_disposals(
 @router.post("/disposals", response_model=DisposalResponse)
 def create_disposal(disposal: DisposalCreate, db: Session = Depends(get_db)):
     """廃棄・ロス登録"""
-    item = db.query(Item).filter(Item.id == disposal.item_id).first()
+    item = master_cache.get(db, Item, disposal.item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if disposal.quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be positive")
 
-    inventory = db.query(Inventory).filter(Inventory.item_id == disposal.item_id).first()
-    if not inventory or inventory.quantity < disposal.quantity:
-        raise HTTPException(status_code=400, detail="Insufficient inventory")
+    # 在庫チェックと減算を同じ UPDATE 文で
+    quantity = stock_updates.change_inventory(db, disposal.item_id, -disposal.quantity, require_stock=True)
+    if quantity is None:
+        raise HTTPException(status_code=409, detail="Insufficient inventory")
 
     db_disposal = Disposal(
         item_id=disposal.item_id,
@@ -232,58 +268,142 @@ def create_disposal(disposal: DisposalCreate, db: Session = Depends(get_db)):
         disposed_by=disposal.disposed_by,
     )
     db.add(db_disposal)
-    inventory.quantity -= disposal.quantity
+    db.flush()
+    stock_ledger.record(db, disposal.item_id, "disposal", -disposal.quantity,
+                        arrival_id=disposal.arrival_id, source_id=db_disposal.id)
 
     # 入荷ロットの残数も減らす
     if disposal.arrival_id:
-        arrival = db.query(Arrival).filter(Arrival.id == disposal.arrival_id).first()
-        if arrival and arrival.remaining_quantity is not None:
-            arrival.remaining_quantity = max(0, arrival.remaining_quantity - disposal.quantity)
+        remaining = stock_updates.take_from_lot(db, disposal.arrival_id, disposal.quantity, clamp=True)
+        if remaining is not None:
+            emit(db, "lot", arrival_id=disposal.arrival_id, item_id=disposal.item_id,
+                 remaining_quantity=remaining)
+    emit(db, "inventory", item_id=disposal.item_id, quantity=quantity, delta=-disposal.quantity)
 
     db.commit()
     db.refresh(db_disposal)
     return db_disposal
 
 
+@router.get("/movements", response_model=List[StockMovementResponse])
+def get_stock_movements(
+    item_id: Optional[int] = None,
+    movement_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """在庫台帳（入出庫履歴）"""
+    query = db.query(StockMovement)
+    if item_id:
+        query = query.filter(StockMovement.item_id == item_id)
+    if movement_type:
+        query = query.filter(StockMovement.movement_type == movement_type)
+    if date_from:
+        query = query.filter(StockMovement.occurred_at >= date_from)
+    if date_to:
+        query = query.filter(StockMovement.occurred_at <= date_to)
+    return (
+        query.order_by(StockMovement.occurred_at.desc(), StockMovement.id.desc())
+        .offset(skip).limit(limit).all()
+    )
+
+
+@router.get("/stock-at", response_model=List[StockLevelResponse])
+def get_stock_at(
+    at: Optional[datetime] = None,
+    item_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """指定時点の品目別在庫（直近スナップショット + 台帳の差分。at 省略時は現在）"""
+    quantities = stock_ledger.quantities_at(db, at, [item_id] if item_id else None)
+    if item_id and item_id not in quantities:
+        quantities[item_id] = 0
+    return [
+        {"item_id": i, "quantity": quantity}
+        for i, quantity in sorted(quantities.items())
+    ]
+
+
+@router.get("/valuation", response_model=InventoryValuationResponse)
+def get_valuation(year: Optional[int] = None, month: Optional[int] = None, db: Session = Depends(get_db)):
+    """在庫評価額（移動平均法。year/month 指定でその月末時点、省略時は現在で FIFO（ロット残数 × 入荷単価）も返す）"""
+    if (year is None) != (month is None):
+        raise HTTPException(status_code=400, detail="year and month must be given together")
+    if month is not None and not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="month must be 1-12")
+    return valuation.valuation(db, f"{year}-{month:02d}" if year is not None else None)
+
+
+@router.post("/snapshots", response_model=SnapshotResult)
+def create_snapshots(as_of: Optional[datetime] = None, db: Session = Depends(get_db)):
+    """在庫スナップショットを作成（as_of 省略時は当日 0 時。未来の時点は不可）"""
+    if as_of is not None and as_of > stock_ledger.db_now(db):
+        raise HTTPException(status_code=400, detail="as_of must not be in the future")
+    created = stock_ledger.take_snapshots(db, as_of)
+    db.commit()
+    return {"created": created}
+
+
+@router.post("/reconcile", response_model=ReconciliationRunResponse)
+def run_reconciliation(full: bool = False, fix: bool = False, db: Session = Depends(get_db)):
+    """在庫照合（既定は前回以降に動いた品目・ロットのみ。fix=true で在庫・ロット残数を台帳に合わせる）"""
+    run = reconciliation.reconcile(db, full=full, fix=fix)
+    db.commit()
+    db.refresh(run)
+    return run
+
+
+@router.get("/reconcile/runs", response_model=List[ReconciliationRunResponse])
+def get_reconciliation_runs(limit: int = 20, db: Session = Depends(get_db)):
+    """在庫照合の実行履歴"""
+    return db.query(ReconciliationRun).order_by(ReconciliationRun.id.desc()).limit(limit).all()
+
+
 @router.get("/long-term-alerts", response_model=List[LongTermAlertResponse])
 def get_long_term_alerts(days: Optional[int] = None, db: Session = Depends(get_db)):
-    """長期在庫アラート"""
-    setting = db.query(Setting).filter(Setting.key == "inventory_alert_days").first()
-    alert_days = days if days is not None else int(setting.value) if setting else 5
+    """長期在庫アラート（残数のあるロットのうち、入荷から days 日以上経ったもの。古い順）"""
+    alert_days = days if days is not None else settings_service.current(db).inventory_alert_days
 
-    threshold_date = datetime.now() - timedelta(days=alert_days)
+    # arrived_at の server_default（UTC の CURRENT_TIMESTAMP）と同じ時計で経過日数を数える
+    now = stock_ledger.db_now(db).replace(tzinfo=None)
+    threshold_date = now - timedelta(days=alert_days)
 
-    alerts = (
+    # ix_arrivals_open_lots_arrived_at（残数 > 0 の部分インデックス）を入荷順に走査
+    lots = (
         db.query(
+            Arrival.id,
+            Arrival.display_id,
             Arrival.item_id,
             Item.name,
             Item.item_code,
             Arrival.arrived_at,
-            Inventory.quantity,
-            func.julianday(func.now()) - func.julianday(Arrival.arrived_at)
+            Arrival.remaining_quantity,
         )
         .join(Item, Arrival.item_id == Item.id)
-        .join(Inventory, Inventory.item_id == Item.id)
-        .filter(Arrival.arrived_at < threshold_date)
-        .filter(Inventory.quantity > 0)
-        .group_by(Arrival.item_id)
+        .filter(OPEN_LOT, Arrival.arrived_at < threshold_date)
+        .order_by(Arrival.arrived_at)
         .all()
     )
 
     return [
         {
-            "item_id": a[0],
-            "item_name": a[1],
-            "item_code": a[2],
-            "arrived_at": a[3],
-            "quantity": a[4],
-            "days_in_stock": int(a[5]) if a[5] else 0,
+            "item_id": lot[2],
+            "item_name": lot[3],
+            "item_code": lot[4],
+            "arrival_id": lot[0],
+            "display_id": lot[1],
+            "arrived_at": lot[5],
+            "quantity": lot[6],
+            "days_in_stock": (now - lot[5].replace(tzinfo=None)).days,
         }
-        for a in alerts
+        for lot in lots
     ]
 
 
 # Backward compatible path
 @router.get("/alerts/long-term", response_model=List[LongTermAlertResponse])
 def get_long_term_alerts_compat(db: Session = Depends(get_db)):
-    return get_long_term_alerts(db)
+    return get_long_term_alerts(db=db)
@@ -1,45 +1,89 @@
 """
 請求書 API（インボイス対応）
+- 生成時（月次一括・個別）に PDF をバックグラウンドで作っておく
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+import calendar
+from concurrent.futures import wait
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import update
+from typing import Iterable, List, Optional
 from datetime import date, datetime
-import math
 
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.models.invoices import Invoice, InvoiceItem
 from app.models.transfers import Transfer
 from app.models.supplies import SupplyTransfer, Supply
 from app.models.stores import Store
-from app.models.settings import Setting
+from app.models.items import Item
+from app.services import invoice_pdf
+from app.services.invoice_pdf import pdf_renderer
+from app.services.master_cache import master_cache
+from app.services.settings_service import settings_service
 from app.schemas.invoices import (
     InvoiceResponse, InvoiceDetailResponse,
-    InvoiceGenerateRequest
+    InvoiceGenerateRequest, InvoiceMonthGenerateRequest, InvoiceMonthGenerateResponse
 )
 
 router = APIRouter()
 
 
 def generate_invoice_number(store_id: int, period_end: date, db: Session) -> str:
-    """請求書番号を生成"""
-    setting = db.query(Setting).filter(Setting.key == "invoice_number_format").first()
-    format_str = setting.value if setting else "{year}-{month:02d}-{day:02d}-{seq:03d}"
-
+    """請求書番号を生成（書式に店舗が入らず他店舗の番号と重なるときは、空いている次の連番）"""
     count = db.query(Invoice).filter(
         Invoice.period_end == period_end,
         Invoice.store_id == store_id
     ).count()
 
-    return format_str.format(
-        year=period_end.year,
-        month=period_end.month,
-        day=period_end.day,
-        seq=count + 1
+    settings = settings_service.current(db)
+    taken = {n for (n,) in db.query(Invoice.invoice_number).filter(Invoice.period_end == period_end)}
+    seq = count + 1
+    number = settings.format_invoice_number(period_end, seq)
+    while number in taken or db.query(Invoice.id).filter(Invoice.invoice_number == number).first():
+        seq += 1
+        number = settings.format_invoice_number(period_end, seq)
+    return number
+
+
+def _store_name(db: Session, store_id: int) -> str:
+    store = master_cache.get(db, Store, store_id)
+    return store.name if store else ""
+
+
+def _save_pdf_path(db: Session, invoice_id: int, path: str):
+    # PDF の保存は請求書の更新ではないので updated_at は変えない
+    db.execute(
+        update(Invoice)
+        .where(Invoice.id == invoice_id)
+        .values(pdf_path=path, updated_at=Invoice.updated_at)
     )
 
 
+def prerender_invoice_pdfs(invoice_ids: Iterable[int]):
+    """請求書 PDF をまとめて作成（生成直後のバックグラウンド処理）"""
+    if not invoice_pdf.available():
+        return
+    db = SessionLocal()
+    try:
+        raw = settings_service.current(db).raw
+        pending = {}
+        for invoice in db.query(Invoice).filter(Invoice.id.in_(list(invoice_ids))).all():
+            data = invoice_pdf.payload(invoice, _store_name(db, invoice.store_id), raw)
+            path = invoice_pdf.cache_path(invoice.id, data)
+            pending[pdf_renderer.submit(path, data)] = (invoice.id, path)
+        done, _ = wait(pending, timeout=invoice_pdf.INVOICE_PDF_TIMEOUT)
+        for future in done:
+            if future.exception() is None:
+                _save_pdf_path(db, *pending[future])
+            else:
+                print(f"[WARN] invoice PDF failed: {pending[future][0]}: {future.exception()}")
+        db.commit()
+    finally:
+        db.close()
+
+
 @router.get("/", response_model=List[InvoiceResponse])
 def get_invoices(
     store_id: Optional[int] = None,
@@ -71,22 +115,13 @@ def get_invoice(invoice_id: int, db: Session = Depends(get_db)):
     return invoice
 
 
-@router.post("/generate", response_model=InvoiceResponse)
-def generate_invoice(request: InvoiceGenerateRequest, db: Session = Depends(get_db)):
-    """請求書生成（花/備品）"""
-    store = db.query(Store).filter(Store.id == request.store_id).first()
+def _create_invoice(request: InvoiceGenerateRequest, db: Session) -> Invoice:
+    """請求書と明細を作成（commit は呼び出し側）"""
+    store = master_cache.get(db, Store, request.store_id)
     if not store:
         raise HTTPException(status_code=404, detail="Store not found")
 
-    rounding_setting = db.query(Setting).filter(Setting.key == "tax_rounding").first()
-    rounding = rounding_setting.value if rounding_setting else "floor"
-
-    def apply_rounding(value: float) -> float:
-        if rounding == "floor":
-            return math.floor(value)
-        if rounding == "ceil":
-            return math.ceil(value)
-        return round(value)
+    apply_rounding = settings_service.current(db).round_tax
 
     invoice_number = generate_invoice_number(request.store_id, request.period_end, db)
 
@@ -124,7 +159,7 @@ def generate_invoice(request: InvoiceGenerateRequest, db: Session = Depends(get_
             subtotal = float(transfer.unit_price) * transfer.quantity
             tax_rate = 0.10
             subtotal_10 += subtotal
-            supply = db.query(Supply).filter(Supply.id == transfer.supply_id).first()
+            supply = master_cache.get(db, Supply, transfer.supply_id)
             item_line = InvoiceItem(
                 invoice_id=invoice.id,
                 item_id=None,
@@ -147,9 +182,11 @@ def generate_invoice(request: InvoiceGenerateRequest, db: Session = Depends(get_
         if not transfers:
             raise HTTPException(status_code=400, detail="No transfers found for this period")
 
+        items = master_cache.get_many(db, Item, {t.item_id for t in transfers})
         for transfer in transfers:
             subtotal = float(transfer.unit_price) * transfer.quantity
-            tax_rate = float(transfer.item.tax_rate) if transfer.item else 0.10
+            item = items.get(transfer.item_id)
+            tax_rate = float(item.tax_rate) if item else 0.10
             if tax_rate == 0.10:
                 subtotal_10 += subtotal
             else:
@@ -158,7 +195,7 @@ def generate_invoice(request: InvoiceGenerateRequest, db: Session = Depends(get_
             item_line = InvoiceItem(
                 invoice_id=invoice.id,
                 item_id=transfer.item_id,
-                item_name=transfer.item.name if transfer.item else "花",
+                item_name=item.name if item else "花",
                 quantity=transfer.quantity,
                 unit_price=transfer.unit_price,
                 subtotal=subtotal,
@@ -179,12 +216,87 @@ def generate_invoice(request: InvoiceGenerateRequest, db: Session = Depends(get_
         subtotal_08 + tax_amount_08 +
         float(invoice.carryover_amount or 0)
     )
+    return invoice
+
 
+@router.post("/generate", response_model=InvoiceResponse)
+def generate_invoice(
+    request: InvoiceGenerateRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    """請求書生成（花/備品）"""
+    invoice = _create_invoice(request, db)
     db.commit()
     db.refresh(invoice)
+    background_tasks.add_task(prerender_invoice_pdfs, [invoice.id])
     return invoice
 
 
+@router.post("/generate-month", response_model=InvoiceMonthGenerateResponse)
+def generate_month_invoices(
+    request: InvoiceMonthGenerateRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    """月末締め: 全店舗の請求書を一括生成し、PDF も作っておく（同じ期間・種別の請求書がある店舗は飛ばす）"""
+    if not 1 <= request.month <= 12:
+        raise HTTPException(status_code=400, detail="month must be 1-12")
+    period_start = date(request.year, request.month, 1)
+    period_end = date(request.year, request.month, calendar.monthrange(request.year, request.month)[1])
+    existing = {
+        store_id for (store_id,) in db.query(Invoice.store_id).filter(
+            Invoice.period_start == period_start,
+            Invoice.period_end == period_end,
+            Invoice.invoice_type == request.invoice_type,
+        )
+    }
+
+    generated, skipped = [], []
+    for store in master_cache.all(db, Store):
+        if not store.is_active or store.id in existing:
+            skipped.append(store.id)
+            continue
+        try:
+            with db.begin_nested():
+                invoice = _create_invoice(InvoiceGenerateRequest(
+                    store_id=store.id,
+                    invoice_type=request.invoice_type,
+                    period_start=period_start,
+                    period_end=period_end,
+                    created_by=request.created_by,
+                ), db)
+        except HTTPException as e:
+            if e.status_code != 400:  # 対象期間の持ち出しなし
+                raise
+            skipped.append(store.id)
+            continue
+        generated.append(invoice)
+
+    db.commit()
+    for invoice in generated:
+        db.refresh(invoice)
+    background_tasks.add_task(prerender_invoice_pdfs, [invoice.id for invoice in generated])
+    return {"generated": generated, "skipped_store_ids": skipped}
+
+
+@router.get("/{invoice_id}/pdf")
+def get_invoice_pdf(invoice_id: int, db: Session = Depends(get_db)):
+    """請求書 PDF（作成済みならキャッシュを返す。描画はプロセスプールで実行）"""
+    reason = invoice_pdf.unavailable_reason()
+    if reason:
+        raise HTTPException(status_code=503, detail=f"PDF rendering is not available: {reason}")
+    invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+
+    path = pdf_renderer.ensure(invoice, _store_name(db, invoice.store_id), settings_service.current(db).raw)
+    if invoice.pdf_path != path:
+        _save_pdf_path(db, invoice.id, path)
+        db.commit()
+    return FileResponse(path, media_type="application/pdf", filename=f"invoice-{invoice.invoice_number}.pdf")
+
+
 @router.patch("/{invoice_id}/status")
 def update_invoice_status(
     invoice_id: int,
@@ -8,9 +8,11 @@ from typing import List, Optional
 
 from app.database import get_db
 from app.models.items import Item, generate_item_code
-from app.models.inventory import Inventory, Arrival, Disposal, InventoryAdjustment
-from app.models.transfers import Transfer, PriceChange
+from app.models.inventory import Inventory, Arrival, Disposal, InventoryAdjustment, StockMovement, InventorySnapshot, ItemCost, ItemCostPeriod
+from app.models.transfers import Transfer, PriceChange, DemandDaily, DemandForecast
 from app.schemas.items import ItemResponse, ItemCreate, ItemUpdate, ItemReorderRequest
+from app.services.item_search import item_search_index
+from app.services import reorder
 
 router = APIRouter()
 
@@ -29,18 +31,38 @@ def get_items(
     if is_active is not None:
         query = query.filter(Item.is_active == is_active)
 
+    if search:
+        # 検索時はインデックスのランク順
+        ranked_ids = item_search_index.search(db, search, limit=None, category=category, is_active=is_active)
+        return _fetch_ranked(db, ranked_ids[skip:skip + limit])
+
     if category:
         query = query.filter(Item.category == category)
 
-    if search:
-        query = query.filter(
-            (Item.name.contains(search)) |
-            (Item.item_code.contains(search))
-        )
-
     return query.order_by(Item.sort_order.asc(), Item.id.asc()).offset(skip).limit(limit).all()
 
 
+@router.get("/search", response_model=List[ItemResponse])
+def search_items(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=200),
+    category: Optional[str] = None,
+    is_active: Optional[bool] = True,
+    db: Session = Depends(get_db)
+):
+    """花を検索（入力補完用: コード/花名/品種、かな・カナ同一視、ランク順）"""
+    ranked_ids = item_search_index.search(db, q, limit=limit, category=category, is_active=is_active)
+    return _fetch_ranked(db, ranked_ids)
+
+
+def _fetch_ranked(db: Session, ids: List[int]) -> List[Item]:
+    """item_id リストの順序を保ったまま花を取得"""
+    if not ids:
+        return []
+    items = {i.id: i for i in db.query(Item).filter(Item.id.in_(ids)).all()}
+    return [items[i] for i in ids if i in items]
+
+
 @router.get("/{item_id}", response_model=ItemResponse)
 def get_item(item_id: int, db: Session = Depends(get_db)):
     """花詳細を取得"""
@@ -103,13 +125,10 @@ def update_item(item_id: int, item: ItemUpdate, db: Session = Depends(get_db)):
 
 @router.post("/reorder")
 def reorder_items(request: ItemReorderRequest, db: Session = Depends(get_db)):
-    """花の表示順を一括更新"""
-    for item in request.items:
-        db_item = db.query(Item).filter(Item.id == item.id).first()
-        if db_item:
-            db_item.sort_order = item.sort_order
+    """花の表示順を一括更新（1 文の UPDATE）"""
+    result = reorder.apply_sort_order(db, Item, request.items)
     db.commit()
-    return {"status": "ok", "updated": len(request.items)}
+    return {"status": "ok", **result}
 
 
 @router.delete("/{item_id}")
@@ -121,8 +140,14 @@ def delete_item(item_id: int, db: Session = Depends(get_db)):
 
     db.query(PriceChange).filter(PriceChange.item_id == item_id).delete()
     db.query(Transfer).filter(Transfer.item_id == item_id).delete()
+    db.query(DemandDaily).filter(DemandDaily.item_id == item_id).delete()
+    db.query(DemandForecast).filter(DemandForecast.item_id == item_id).delete()
     db.query(Disposal).filter(Disposal.item_id == item_id).delete()
     db.query(InventoryAdjustment).filter(InventoryAdjustment.item_id == item_id).delete()
+    db.query(StockMovement).filter(StockMovement.item_id == item_id).delete()
+    db.query(InventorySnapshot).filter(InventorySnapshot.item_id == item_id).delete()
+    db.query(ItemCost).filter(ItemCost.item_id == item_id).delete()
+    db.query(ItemCostPeriod).filter(ItemCostPeriod.item_id == item_id).delete()
     db.query(Arrival).filter(Arrival.item_id == item_id).delete()
     db.query(Inventory).filter(Inventory.item_id == item_id).delete()
     db.delete(db_item)
@@ -0,0 +1,58 @@
+"""
+メトリクス API (Prometheus テキスト形式)
+- ルート別レイテンシ / リクエスト数 / リクエストあたりクエリ数
+- SQL 実行時間 / スロークエリ / N+1 の疑い
+- マスタキャッシュ / HTTP キャッシュ / 圧縮
+- 在庫イベント配信
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.middleware.compression import compression_stats
+from app.middleware.http_cache import http_cache_stats
+from app.services.events import event_bus
+from app.services.master_cache import master_cache
+from app.services.metrics import registry
+
+router = APIRouter()
+
+
+def _cache_metrics():
+    stats = master_cache.stats()
+    yield ("master_cache_hits_total", "counter", "Master data cache hits",
+           [({"table": t}, s["hits"]) for t, s in stats.items()])
+    yield ("master_cache_misses_total", "counter", "Master data cache misses",
+           [({"table": t}, s["misses"]) for t, s in stats.items()])
+    http = http_cache_stats.as_dict()
+    yield ("http_cache_responses_total", "counter", "Conditional GET / response cache outcomes",
+           [({"outcome": k}, v) for k, v in http.items()])
+
+
+def _compression_metrics():
+    stats = compression_stats.as_dict()
+    for key, name, documentation in [
+        ("responses", "http_compression_responses_total", "Compressed responses"),
+        ("bytes_in", "http_compression_bytes_in_total", "Bytes before compression"),
+        ("bytes_out", "http_compression_bytes_out_total", "Bytes after compression"),
+        ("cpu_seconds", "http_compression_cpu_seconds_total", "CPU time spent compressing"),
+        ("cache_hits", "http_compression_cache_hits_total", "Responses served from the pre-compressed cache"),
+    ]:
+        yield (name, "counter", documentation, [({"encoding": e}, s[key]) for e, s in stats.items()])
+
+
+def _event_metrics():
+    stats = event_bus.stats()
+    yield ("events_subscribers", "gauge", "Open event stream connections", [({}, stats["subscribers"])])
+    yield ("events_published_total", "counter", "Inventory events published after commit", [({}, stats["published"])])
+
+
+registry.add_collector(_cache_metrics)
+registry.add_collector(_compression_metrics)
+registry.add_collector(_event_metrics)
+
+
+@router.get("", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus スクレイプ用"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
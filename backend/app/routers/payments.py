@@ -14,6 +14,7 @@ from app.database import get_db
 from app.models.payments import Payment
 from app.models.invoices import Invoice
 from app.models.stores import Store
+from app.services.master_cache import master_cache
 
 router = APIRouter()
 
@@ -91,7 +92,7 @@ def get_payment_confirmation(
 
     rows = []
     for inv in invoices:
-        store = db.query(Store).filter(Store.id == inv.store_id).first()
+        store = master_cache.get(db, Store, inv.store_id)
         paid_total = (
             db.query(func.sum(Payment.amount))
             .filter(Payment.invoice_id == inv.id)
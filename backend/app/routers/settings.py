@@ -8,6 +8,8 @@ from typing import List
 
 from app.database import get_db
 from app.models.settings import Setting, TaxRate, Supplier
+from app.services.settings_service import settings_service, validate_setting
+from app.services import reorder
 from app.schemas.settings import (
     SettingResponse, SettingUpdate,
     TaxRateResponse, TaxRateCreate,
@@ -28,9 +30,14 @@ def update_setting(key: str, setting: SettingUpdate, db: Session = Depends(get_d
     db_setting = db.query(Setting).filter(Setting.key == key).first()
     if not db_setting:
         raise HTTPException(status_code=404, detail="Setting not found")
+    try:
+        validate_setting(key, setting.value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     db_setting.value = setting.value
     db.commit()
     db.refresh(db_setting)
+    settings_service.reload(db)
     return db_setting
 
 
@@ -77,13 +84,10 @@ def update_supplier(supplier_id: int, supplier: SupplierUpdate, db: Session = De
 
 @router.post("/suppliers/reorder")
 def reorder_suppliers(request: SupplierReorderRequest, db: Session = Depends(get_db)):
-    """卸売業者の表示順を一括更新"""
-    for item in request.items:
-        db_supplier = db.query(Supplier).filter(Supplier.id == item.id).first()
-        if db_supplier:
-            db_supplier.sort_order = item.sort_order
+    """卸売業者の表示順を一括更新（1 文の UPDATE）"""
+    result = reorder.apply_sort_order(db, Supplier, request.items)
     db.commit()
-    return {"status": "ok", "updated": len(request.items)}
+    return {"status": "ok", **result}
 
 
 @router.delete("/suppliers/{supplier_id}")
@@ -7,9 +7,10 @@ from sqlalchemy.orm import Session
 from typing import List
 
 from app.database import get_db
-from app.models.stores import Store, INITIAL_STORES
-from app.models.transfers import Transfer
+from app.models.stores import Store, StorePeriodSummary, INITIAL_STORES
+from app.models.transfers import Transfer, DemandDaily, DemandForecast
 from app.models.supplies import SupplyTransfer
+from app.services import reorder
 from app.schemas.stores import StoreResponse, StoreCreate, StoreUpdate, ReorderRequest
 
 router = APIRouter()
@@ -52,13 +53,10 @@ def update_store(store_id: int, store: StoreUpdate, db: Session = Depends(get_db
 
 @router.post("/reorder")
 def reorder_stores(request: ReorderRequest, db: Session = Depends(get_db)):
-    """店舗の表示順を一括更新"""
-    for item in request.items:
-        db_store = db.query(Store).filter(Store.id == item.id).first()
-        if db_store:
-            db_store.sort_order = item.sort_order
+    """店舗の表示順を一括更新（1 文の UPDATE）"""
+    result = reorder.apply_sort_order(db, Store, request.items)
     db.commit()
-    return {"status": "ok", "updated": len(request.items)}
+    return {"status": "ok", **result}
 
 
 @router.delete("/{store_id}")
@@ -70,6 +68,9 @@ def delete_store(store_id: int, db: Session = Depends(get_db)):
 
     db.query(Transfer).filter(Transfer.store_id == store_id).delete()
     db.query(SupplyTransfer).filter(SupplyTransfer.store_id == store_id).delete()
+    db.query(StorePeriodSummary).filter(StorePeriodSummary.store_id == store_id).delete()
+    db.query(DemandDaily).filter(DemandDaily.store_id == store_id).delete()
+    db.query(DemandForecast).filter(DemandForecast.store_id == store_id).delete()
     db.delete(db_store)
     db.commit()
     return {"status": "ok", "deleted_id": store_id}
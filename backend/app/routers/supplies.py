@@ -9,6 +9,7 @@ from datetime import date
 
 from app.database import get_db
 from app.models.supplies import Supply, SupplyTransfer
+from app.services import reorder, stock_updates
 from app.schemas.supplies import (
     SupplyResponse, SupplyCreate, SupplyUpdate,
     SupplyTransferCreate, SupplyTransferResponse,
@@ -74,13 +75,10 @@ def delete_supply(supply_id: int, db: Session = Depends(get_db)):
 
 @router.post("/reorder")
 def reorder_supplies(request: SupplyReorderRequest, db: Session = Depends(get_db)):
-    """資材の表示順を一括更新"""
-    for item in request.items:
-        db_supply = db.query(Supply).filter(Supply.id == item.id).first()
-        if db_supply:
-            db_supply.sort_order = item.sort_order
+    """資材の表示順を一括更新（1 文の UPDATE）"""
+    result = reorder.apply_sort_order(db, Supply, request.items)
     db.commit()
-    return {"status": "ok", "updated": len(request.items)}
+    return {"status": "ok", **result}
 
 
 @router.get("/transfers", response_model=List[SupplyTransferResponse])
@@ -115,17 +113,14 @@ def create_supply_transfer(transfer: SupplyTransferCreate, db: Session = Depends
     if transfer.unit_price < 0:
         raise HTTPException(status_code=400, detail="Unit price must be non-negative")
 
-    # 在庫チェック
-    current_stock = supply.stock_quantity or 0
-    if transfer.quantity > current_stock:
+    # 在庫チェックと減算を同じ UPDATE 文で
+    if stock_updates.change_supply_stock(db, supply.id, -transfer.quantity, require_stock=True) is None:
+        current_stock = db.query(Supply.stock_quantity).filter(Supply.id == supply.id).scalar() or 0
         raise HTTPException(
-            status_code=400,
+            status_code=409,
             detail=f"在庫不足: {supply.name}の在庫は{current_stock}個です（要求: {transfer.quantity}個）"
         )
 
-    # 在庫を減らす
-    supply.stock_quantity = current_stock - transfer.quantity
-
     db_transfer = SupplyTransfer(**transfer.model_dump())
     db.add(db_transfer)
     db.commit()
@@ -142,8 +137,6 @@ def add_supply_stock(supply_id: int, quantity: int, db: Session = Depends(get_db
     if quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be positive")
 
-    current_stock = supply.stock_quantity or 0
-    supply.stock_quantity = current_stock + quantity
+    stock_quantity = stock_updates.change_supply_stock(db, supply.id, quantity)
     db.commit()
-    db.refresh(supply)
-    return {"id": supply.id, "name": supply.name, "stock_quantity": supply.stock_quantity}
+    return {"id": supply.id, "name": supply.name, "stock_quantity": stock_quantity}
@@ -0,0 +1,99 @@
+"""
+システム状態 API
+- キャッシュ統計・レポートキャッシュの削除
+- 圧縮統計
+- リクエストプロファイル（PROFILING_TOKEN 設定時のみ）
+- 定期ジョブの実行状況
+- 請求書 PDF の描画状況
+"""
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.middleware.compression import compression_stats
+from app.middleware.http_cache import http_cache_stats
+from app.services.dashboard import dashboard_cache
+from app.services.invoice_pdf import pdf_renderer
+from app.models.reports import ReportCache
+from app.services import report_cache
+from app.services.master_cache import master_cache
+from app.services.olap import olap_cache
+from app.services.profiler import profile_store, require_profiling_token
+from app.services.scheduler import scheduler
+
+router = APIRouter()
+
+
+@router.get("/cache-stats")
+def get_cache_stats(db: Session = Depends(get_db)):
+    """マスタキャッシュ / HTTP キャッシュ / ダッシュボード集計 / 汎用集計 / レポートキャッシュのヒット/ミス数"""
+    stats = master_cache.stats()
+    hits = sum(s["hits"] for s in stats.values())
+    misses = sum(s["misses"] for s in stats.values())
+    return {
+        "master": stats,
+        "total_hits": hits,
+        "total_misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+        "http": http_cache_stats.as_dict(),
+        "dashboard": dashboard_cache.stats(),
+        "olap": olap_cache.stats(),
+        "reports": {
+            **report_cache.report_cache_stats.as_dict(),
+            "entries": db.query(func.count(ReportCache.id)).scalar(),
+        },
+    }
+
+
+@router.delete("/report-cache")
+def clear_report_cache(db: Session = Depends(get_db)):
+    """保存済みのレポート結果をすべて削除（次回の表示で再集計）"""
+    deleted = report_cache.clear(db)
+    db.commit()
+    return {"deleted": deleted}
+
+
+@router.get("/compression-stats")
+def get_compression_stats():
+    """圧縮方式ごとの入出力バイト数・圧縮率・CPU 時間"""
+    return compression_stats.as_dict()
+
+
+@router.get("/jobs")
+def get_jobs():
+    """定期ジョブの実行回数・直近の結果"""
+    return scheduler.status()
+
+
+@router.get("/invoice-pdf-stats")
+def get_invoice_pdf_stats():
+    """請求書 PDF の描画件数・キャッシュヒット数"""
+    return pdf_renderer.stats()
+
+
+@router.get("/profiles", dependencies=[Depends(require_profiling_token)])
+def list_profiles():
+    """直近のプロファイル一覧"""
+    return [profile.summary() for profile in profile_store.list()]
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_profiling_token)])
+def get_profile(profile_id: str, top: int = 30):
+    """プロファイル詳細（自己時間の多い関数・発行 SQL）"""
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.as_dict(top)
+
+
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse,
+            dependencies=[Depends(require_profiling_token)])
+def get_profile_folded(profile_id: str):
+    """flamegraph.pl / speedscope 用の folded スタック"""
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile.folded())
@@ -12,10 +12,29 @@ from app.database import get_db
 from app.models.transfers import Transfer, PriceChange
 from app.models.inventory import Inventory, Arrival
 from app.models.items import Item
+from app.services import stock_ledger, stock_updates
+from app.services.events import emit
+from app.services.fast_json import RowSerializer
+from app.services.master_cache import master_cache
 from app.schemas.transfers import TransferCreate, TransferResponse, PriceChangeCreate, PriceChangeResponse
 
 router = APIRouter()
 
+# TransferResponse と同じキー
+TRANSFER_ROWS = RowSerializer([
+    ("id", Transfer.id),
+    ("store_id", Transfer.store_id),
+    ("item_id", Transfer.item_id),
+    ("arrival_id", Transfer.arrival_id),
+    ("quantity", Transfer.quantity),
+    ("unit_price", Transfer.unit_price),
+    ("wholesale_price", Transfer.wholesale_price),
+    ("margin", Transfer.margin),
+    ("transferred_at", Transfer.transferred_at),
+    ("input_by", Transfer.input_by),
+    ("created_at", Transfer.created_at),
+])
+
 
 @router.get("/", response_model=List[TransferResponse])
 def get_transfers(
@@ -28,7 +47,7 @@ def get_transfers(
     db: Session = Depends(get_db)
 ):
     """持ち出し一覧"""
-    query = db.query(Transfer)
+    query = db.query(*TRANSFER_ROWS.columns)
 
     if store_id:
         query = query.filter(Transfer.store_id == store_id)
@@ -39,13 +58,15 @@ def get_transfers(
     if date_to:
         query = query.filter(Transfer.transferred_at <= date_to)
 
-    return query.order_by(Transfer.transferred_at.desc()).offset(skip).limit(limit).all()
+    return TRANSFER_ROWS.response(
+        query.order_by(Transfer.transferred_at.desc()).offset(skip).limit(limit).all()
+    )
 
 
 @router.post("/", response_model=TransferResponse)
 def create_transfer(transfer: TransferCreate, db: Session = Depends(get_db)):
     """持ち出し登録"""
-    item = db.query(Item).filter(Item.id == transfer.item_id).first()
+    item = master_cache.get(db, Item, transfer.item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if transfer.quantity <= 0:
@@ -55,32 +76,30 @@ def create_transfer(transfer: TransferCreate, db: Session = Depends(get_db)):
     if transfer.wholesale_price is not None and transfer.wholesale_price < 0:
         raise HTTPException(status_code=400, detail="Wholesale price must be non-negative")
 
-    # 入荷ロット単位の在庫チェック
+    # 入荷ロットの残数を減らす（残数チェックと同じ UPDATE 文で）
+    lot_remaining = None
     if transfer.arrival_id:
-        arrival = db.query(Arrival).filter(Arrival.id == transfer.arrival_id).first()
-        if not arrival:
-            raise HTTPException(status_code=404, detail="Arrival not found")
-        remaining = arrival.remaining_quantity if arrival.remaining_quantity is not None else arrival.quantity
-        if remaining < transfer.quantity:
-            raise HTTPException(status_code=400, detail=f"ロット残数不足 (残: {remaining}, 要求: {transfer.quantity})")
-
-    # アイテム全体の在庫も更新（集計用）
-    inventory = db.query(Inventory).filter(Inventory.item_id == transfer.item_id).first()
-    if not inventory:
-        total_arrived = db.query(func.coalesce(func.sum(Arrival.quantity), 0)).filter(
-            Arrival.item_id == transfer.item_id
-        ).scalar()
-        total_transferred = db.query(func.coalesce(func.sum(Transfer.quantity), 0)).filter(
-            Transfer.item_id == transfer.item_id
-        ).scalar()
-        available = int(total_arrived) - int(total_transferred)
-        inventory = Inventory(
-            item_id=transfer.item_id,
-            quantity=max(0, available),
-            unit_price=transfer.unit_price,
-        )
-        db.add(inventory)
-        db.flush()
+        lot_remaining = stock_updates.take_from_lot(db, transfer.arrival_id, transfer.quantity)
+        if lot_remaining is None:
+            remaining = db.query(func.coalesce(Arrival.remaining_quantity, Arrival.quantity)).filter(
+                Arrival.id == transfer.arrival_id
+            ).scalar()
+            if remaining is None:
+                raise HTTPException(status_code=404, detail="Arrival not found")
+            raise HTTPException(status_code=409, detail=f"ロット残数不足 (残: {remaining}, 要求: {transfer.quantity})")
+
+    # アイテム全体の在庫も減らす（集計用）
+    quantity = stock_updates.change_inventory(db, transfer.item_id, -transfer.quantity, require_stock=True)
+    if quantity is None:
+        current = db.query(Inventory.quantity).filter(Inventory.item_id == transfer.item_id).scalar()
+        if current is not None:
+            raise HTTPException(status_code=409, detail=f"在庫不足 (残: {current}, 要求: {transfer.quantity})")
+        # 在庫行がなければ台帳から作る
+        available = max(0, stock_ledger.stock_at(db, transfer.item_id))
+        if available < transfer.quantity:
+            raise HTTPException(status_code=409, detail=f"在庫不足 (残: {available}, 要求: {transfer.quantity})")
+        quantity = available - transfer.quantity
+        db.add(Inventory(item_id=transfer.item_id, quantity=quantity, unit_price=transfer.unit_price))
 
     margin = None
     if transfer.unit_price and transfer.wholesale_price:
@@ -98,16 +117,17 @@ def create_transfer(transfer: TransferCreate, db: Session = Depends(get_db)):
         input_by=transfer.input_by,
     )
     db.add(db_transfer)
-
-    # 入荷ロットの残数を減らす
-    if transfer.arrival_id and arrival:
-        if arrival.remaining_quantity is not None:
-            arrival.remaining_quantity -= transfer.quantity
-        else:
-            arrival.remaining_quantity = arrival.quantity - transfer.quantity
-
-    # アイテム全体の在庫も減らす
-    inventory.quantity -= transfer.quantity
+    db.flush()
+    stock_ledger.record(db, transfer.item_id, "transfer", -transfer.quantity,
+                        occurred_at=stock_ledger.transfer_occurred_at(transfer.transferred_at),
+                        arrival_id=transfer.arrival_id, store_id=transfer.store_id, source_id=db_transfer.id)
+
+    emit(db, "transfer", store_id=transfer.store_id, item_id=transfer.item_id,
+         delta=transfer.quantity, count=1, transferred_at=transfer.transferred_at.isoformat())
+    emit(db, "inventory", item_id=transfer.item_id, quantity=quantity, delta=-transfer.quantity)
+    if transfer.arrival_id:
+        emit(db, "lot", arrival_id=transfer.arrival_id, item_id=transfer.item_id,
+             remaining_quantity=lot_remaining)
 
     db.commit()
     db.refresh(db_transfer)
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date
+
+
+class AnalyticsQueryRequest(BaseModel):
+    """汎用集計の条件（start/end か period のどちらかを指定）"""
+    measures: List[str]
+    dimensions: List[str] = []  # date/store/item/category/supplier
+    grain: str = "month"  # date 軸の粒度: day/week/month/quarter/year/fiscal_year
+    start: Optional[date] = None
+    end: Optional[date] = None
+    period: Optional[str] = None  # mtd/qtd/ytd/fytd（end 省略時は今日まで）
+    store_ids: Optional[List[int]] = None
+    item_ids: Optional[List[int]] = None
+    supplier_ids: Optional[List[int]] = None
+    categories: Optional[List[str]] = None
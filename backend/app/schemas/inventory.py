@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
 
@@ -104,6 +104,50 @@ class LongTermAlertResponse(BaseModel):
     item_id: int
     item_name: str
     item_code: str
+    arrival_id: int
+    display_id: Optional[str] = None
     arrived_at: datetime
-    quantity: int
+    quantity: int  # ロット残数
     days_in_stock: int
+
+
+class StockMovementResponse(BaseModel):
+    id: int
+    item_id: int
+    movement_type: str
+    quantity: int
+    arrival_id: Optional[int] = None
+    store_id: Optional[int] = None
+    source_id: Optional[int] = None
+    occurred_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class StockLevelResponse(BaseModel):
+    item_id: int
+    quantity: int
+
+
+class SnapshotResult(BaseModel):
+    created: int
+
+
+class ItemValuationResponse(BaseModel):
+    item_id: int
+    item_name: Optional[str] = None
+    quantity: int
+    avg_cost: float
+    value: float
+    fifo_quantity: Optional[int] = None  # 現在のみ（残数のあるロットの合計）
+    fifo_value: Optional[float] = None
+
+
+class InventoryValuationResponse(BaseModel):
+    period: Optional[str] = None  # YYYY-MM（月末時点）。None は現在
+    method: str
+    total_quantity: int
+    total_value: float
+    total_fifo_value: Optional[float] = None
+    items: List[ItemValuationResponse]
@@ -68,3 +68,15 @@ class InvoiceDetailResponse(InvoiceResponse):
 
     class Config:
         from_attributes = True
+
+
+class InvoiceMonthGenerateRequest(BaseModel):
+    year: int
+    month: int
+    invoice_type: str = "flower"  # flower/supply
+    created_by: Optional[int] = None
+
+
+class InvoiceMonthGenerateResponse(BaseModel):
+    generated: List[InvoiceResponse] = []
+    skipped_store_ids: List[int] = []
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
-from datetime import datetime
+from typing import Optional, Dict, Any, List
+from datetime import date, datetime
 
 
 class ErrorAlertCreate(BaseModel):
@@ -25,3 +25,34 @@ class ErrorAlertResponse(BaseModel):
 
 class ErrorAlertResolve(BaseModel):
     resolved_by: Optional[int] = None
+
+
+class ReconciliationRunResponse(BaseModel):
+    id: int
+    mode: str
+    watermark: int
+    items_checked: int
+    lots_checked: int
+    drift_count: int
+    fixed: bool
+    drift: Optional[List[Dict[str, Any]]] = None
+    duration_ms: Optional[int] = None
+    started_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ForecastRunResponse(BaseModel):
+    id: int
+    mode: str
+    watermark: int
+    transfers_added: int
+    series_count: int
+    forecast_from: Optional[date] = None
+    forecast_to: Optional[date] = None
+    duration_ms: Optional[int] = None
+    started_at: datetime
+
+    class Config:
+        from_attributes = True
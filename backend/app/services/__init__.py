@@ -0,0 +1 @@
+# 8718 Flower System - Services
@@ -0,0 +1,258 @@
+"""
+集計エンジン（numpy）
+- 明細は 1 回のクエリで「日 × キー（店舗・仕入先）」まで SQL で集約し、列ごとの配列で受け取る
+- グループ化・上中下旬の区分・差額・期間合計は配列演算（bincount / searchsorted）で行う
+- 期間は日付の範囲指定（arrived_at / transferred_at のインデックスを使う）。複数月・複数年も同じ経路
+"""
+
+from datetime import date, datetime, time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.inventory import Arrival
+from app.models.settings import Supplier
+from app.models.stores import Store
+from app.models.supplies import SupplyTransfer
+from app.models.transfers import Transfer
+
+PERIODS = ("1-10", "11-20", "21-end")
+MAX_MONTHS = 120
+
+
+def month_range(year: int, month: int, months: int = 1) -> Tuple[date, date]:
+    """year/month から months か月の [開始日, 終了日の翌日)"""
+    index = year * 12 + month - 1 + months
+    return date(year, month, 1), date(index // 12, index % 12 + 1, 1)
+
+
+# ========== 列の取得 ==========
+
+def fetch_columns(db: Session, stmt, dates: Sequence[str] = ("day",)) -> Dict[str, np.ndarray]:
+    """クエリ結果を列名 -> 配列に（dates の列は datetime64[D]、それ以外は数値で NULL は 0）"""
+    result = db.execute(stmt)
+    names = list(result.keys())
+    rows = result.all()
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    arrays = {}
+    for name, values in zip(names, columns):
+        if name in dates:
+            arrays[name] = np.array([str(v)[:10] for v in values], dtype="datetime64[D]")
+        else:
+            arrays[name] = np.fromiter((v or 0 for v in values), dtype=float, count=len(values))
+    return arrays
+
+
+def group_index(keys: np.ndarray, labels: Iterable) -> Tuple[np.ndarray, np.ndarray]:
+    """keys を labels の並びの添字に（labels にないものは -1）。（添字, labels の配列）を返す"""
+    labels = np.asarray(list(labels), dtype=float)
+    if not len(labels):
+        return np.full(len(keys), -1), labels
+    order = np.argsort(labels, kind="stable")
+    position = np.searchsorted(labels[order], keys).clip(0, len(labels) - 1)
+    index = order[position]
+    return np.where(labels[index] == keys, index, -1), labels
+
+
+def group_sum(index: np.ndarray, size: int, values: np.ndarray) -> np.ndarray:
+    """添字ごとの合計（-1 は除く）"""
+    valid = index >= 0
+    return np.bincount(index[valid], weights=values[valid], minlength=size)
+
+
+def period_bins(days: np.ndarray) -> np.ndarray:
+    """日付を上旬 0 / 中旬 1 / 下旬 2 に"""
+    day_of_month = (days - days.astype("datetime64[M]")).astype(int) + 1
+    return np.digitize(day_of_month, [11, 21])
+
+
+def _money(value) -> float:
+    return round(float(value), 2)
+
+
+# ========== 元データ（日 × キーの集約） ==========
+
+def arrivals_by_day(db: Session, start: date, end: date) -> Dict[str, np.ndarray]:
+    """日 × 仕入先の仕入件数・数量・金額"""
+    day = func.date(Arrival.arrived_at)
+    return fetch_columns(db, (
+        select(
+            day.label("day"),
+            Arrival.supplier_id.label("supplier_id"),
+            func.count(Arrival.id).label("count"),
+            func.sum(Arrival.quantity).label("quantity"),
+            func.sum(Arrival.quantity * Arrival.wholesale_price).label("amount"),
+        )
+        .where(Arrival.arrived_at >= datetime.combine(start, time()), Arrival.arrived_at < datetime.combine(end, time()))
+        .group_by(day, Arrival.supplier_id)
+    ))
+
+
+def transfers_by_day(db: Session, start: date, end: date) -> Dict[str, np.ndarray]:
+    """日 × 店舗の持ち出し件数・数量・納品金額・仕入金額"""
+    return fetch_columns(db, (
+        select(
+            Transfer.transferred_at.label("day"),
+            Transfer.store_id.label("store_id"),
+            func.count(Transfer.id).label("count"),
+            func.sum(Transfer.quantity).label("quantity"),
+            func.sum(Transfer.quantity * Transfer.unit_price).label("amount"),
+            func.sum(Transfer.quantity * Transfer.wholesale_price).label("cost"),
+        )
+        .where(Transfer.transferred_at >= start, Transfer.transferred_at < end)
+        .group_by(Transfer.transferred_at, Transfer.store_id)
+    ))
+
+
+def supply_by_day(db: Session, start: date, end: date) -> Dict[str, np.ndarray]:
+    """日 × 店舗の資材持ち出し金額"""
+    return fetch_columns(db, (
+        select(
+            SupplyTransfer.transferred_at.label("day"),
+            SupplyTransfer.store_id.label("store_id"),
+            func.sum(SupplyTransfer.quantity * SupplyTransfer.unit_price).label("amount"),
+        )
+        .where(SupplyTransfer.transferred_at >= start, SupplyTransfer.transferred_at < end)
+        .group_by(SupplyTransfer.transferred_at, SupplyTransfer.store_id)
+    ))
+
+
+# ========== レポート ==========
+
+def supplier_summary(db: Session, start: date, end: date) -> dict:
+    """仕入先別の仕入件数・数量・金額（金額の多い順、仕入のない仕入先は最後）"""
+    suppliers = db.execute(select(Supplier.id, Supplier.name).order_by(Supplier.id)).all()
+    arrivals = arrivals_by_day(db, start, end)
+    index, _ = group_index(arrivals["supplier_id"], [s.id for s in suppliers])
+    size = len(suppliers)
+    counts = group_sum(index, size, arrivals["count"])
+    quantities = group_sum(index, size, arrivals["quantity"])
+    amounts = group_sum(index, size, arrivals["amount"])
+
+    order = np.lexsort((-amounts, counts == 0))
+    return {
+        "suppliers": [
+            {
+                "supplier_id": suppliers[i].id,
+                "supplier_name": suppliers[i].name,
+                "arrival_count": int(counts[i]),
+                "total_quantity": int(quantities[i]),
+                "total_amount": _money(amounts[i]),
+            }
+            for i in order.tolist()
+        ],
+        "grand_total": _money(amounts.sum()),
+    }
+
+
+def store_summary(db: Session, start: date, end: date) -> dict:
+    """有効な店舗別の納品金額・仕入金額・差額（店舗の表示順）"""
+    stores = db.execute(
+        select(Store.id, Store.name, Store.operation_type).where(Store.is_active == True).order_by(Store.sort_order)
+    ).all()
+    transfers = transfers_by_day(db, start, end)
+    index, _ = group_index(transfers["store_id"], [s.id for s in stores])
+    size = len(stores)
+    counts = group_sum(index, size, transfers["count"])
+    quantities = group_sum(index, size, transfers["quantity"])
+    delivery = group_sum(index, size, transfers["amount"])
+    purchase = group_sum(index, size, transfers["cost"])
+    margin = delivery - purchase
+
+    return {
+        "stores": [
+            {
+                "store_id": store.id,
+                "store_name": store.name,
+                "operation_type": store.operation_type,
+                "transfer_count": int(counts[i]),
+                "total_quantity": int(quantities[i]),
+                "delivery_amount": _money(delivery[i]),
+                "purchase_amount": _money(purchase[i]),
+                "margin": _money(margin[i]),
+            }
+            for i, store in enumerate(stores)
+        ],
+        "total_delivery": _money(delivery.sum()),
+        "total_purchase": _money(purchase.sum()),
+        "total_margin": _money(margin.sum()),
+    }
+
+
+def purchase_delivery(db: Session, start: date, end: date) -> dict:
+    """日別の仕入・納品金額と差額、上中下旬の合計"""
+    arrivals = arrivals_by_day(db, start, end)
+    transfers = transfers_by_day(db, start, end)
+    origin = np.datetime64(start, "D")
+    size = (end - start).days
+    arrival_days = (arrivals["day"] - origin).astype(int)
+    transfer_days = (transfers["day"] - origin).astype(int)
+
+    purchase = np.bincount(arrival_days, weights=arrivals["amount"], minlength=size)
+    purchase_quantity = np.bincount(arrival_days, weights=arrivals["quantity"], minlength=size)
+    delivery = np.bincount(transfer_days, weights=transfers["amount"], minlength=size)
+    delivery_quantity = np.bincount(transfer_days, weights=transfers["quantity"], minlength=size)
+    difference = delivery - purchase
+
+    # データのある日だけ返す
+    present = np.zeros(size, dtype=bool)
+    present[arrival_days] = True
+    present[transfer_days] = True
+    days = origin + np.arange(size)
+    bins = period_bins(days)
+    period_purchase = np.bincount(bins, weights=purchase, minlength=len(PERIODS))
+    period_delivery = np.bincount(bins, weights=delivery, minlength=len(PERIODS))
+
+    total_purchase = purchase.sum()
+    total_delivery = delivery.sum()
+    return {
+        "daily": [
+            {
+                "date": str(days[i]),
+                "purchase_amount": _money(purchase[i]),
+                "purchase_quantity": int(purchase_quantity[i]),
+                "delivery_amount": _money(delivery[i]),
+                "delivery_quantity": int(delivery_quantity[i]),
+                "difference": _money(difference[i]),
+            }
+            for i in np.flatnonzero(present).tolist()
+        ],
+        "period_totals": {
+            name: {"purchase": _money(period_purchase[i]), "delivery": _money(period_delivery[i])}
+            for i, name in enumerate(PERIODS)
+        },
+        "total_purchase": _money(total_purchase),
+        "total_delivery": _money(total_delivery),
+        "total_difference": _money(total_delivery - total_purchase),
+    }
+
+
+def sales_totals(db: Session, start: date, end: date, store_id: Optional[int] = None) -> dict:
+    """仕入金額・売上・原価・数量の合計（store_id 指定時は売上・原価・数量をその店舗に）と全店舗の売上（多い順）"""
+    arrivals = arrivals_by_day(db, start, end)
+    transfers = transfers_by_day(db, start, end)
+    mine = transfers["store_id"] == store_id if store_id else np.ones(len(transfers["store_id"]), dtype=bool)
+    store_ids, index = np.unique(transfers["store_id"].astype(np.int64), return_inverse=True)
+    revenue = np.bincount(index, weights=transfers["amount"], minlength=len(store_ids))
+    quantity = np.bincount(index, weights=transfers["quantity"], minlength=len(store_ids))
+    names = dict(db.execute(select(Store.id, Store.name).where(Store.id.in_(store_ids.tolist()))).all()) if len(store_ids) else {}
+
+    stores: List[dict] = [
+        {
+            "store_id": int(store_ids[i]),
+            "store_name": names.get(int(store_ids[i])),
+            "revenue": _money(revenue[i]),
+            "quantity": int(quantity[i]),
+        }
+        for i in np.argsort(-revenue, kind="stable").tolist()
+        if int(store_ids[i]) in names
+    ]
+    return {
+        "total_purchase": _money(arrivals["amount"].sum()),
+        "total_revenue": _money(transfers["amount"][mine].sum()),
+        "total_cost": _money(transfers["cost"][mine].sum()),
+        "total_quantity": int(transfers["quantity"][mine].sum()),
+        "store_breakdown": stores,
+    }
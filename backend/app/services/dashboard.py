@@ -0,0 +1,305 @@
+"""
+ダッシュボード集計
+- 1 リクエストで本日の仕入・在庫金額・持ち出し・店舗別ランキング・在庫アラート等を返す
+- セクションごとに「依存テーブルのバージョン + 日付」をキーにキャッシュし、変更のあったセクションだけ再集計
+- 期間条件は範囲指定（arrived_at / transferred_at のインデックスを使う）
+- 時計: 入荷（arrived_at は server_default で DB の時計）の日の区切りは、業務日の 0 時を DB の時計に直したもの。
+  長期在庫は一覧 API と同じく DB の現在時刻から数える（分単位でキャッシュ）。持ち出し・経費は業務日（日付列）
+"""
+
+import threading
+import time as _time
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.models.expenses import Expense
+from app.models.inventory import OPEN_LOT, Arrival, Inventory
+from app.models.invoices import Invoice
+from app.models.items import Item
+from app.models.logs import ErrorAlert
+from app.models.stores import Store
+from app.models.supplies import SupplyTransfer
+from app.models.transfers import Transfer
+from app.services import stock_ledger
+from app.services.settings_service import settings_service
+from app.services.table_versions import table_versions
+
+LOW_STOCK_THRESHOLD = 10
+TOP_N = 5
+
+# today: 業務日 / day_start: 業務日の 0 時（DB の時計） / now: DB の現在時刻（分単位）
+Clock = namedtuple("Clock", "today day_start now")
+
+
+def _clock(db: Session, today: Optional[date] = None) -> Clock:
+    """DB の時計とアプリの時計の差（15 分単位に丸める）から、業務日の区切りを DB の時計で求める"""
+    db_now = stock_ledger.db_now(db).replace(tzinfo=None)
+    offset = timedelta(minutes=round((db_now - datetime.now()).total_seconds() / 900) * 15)
+    now = db_now.replace(second=0, microsecond=0)
+    if today is None:
+        today = (db_now - offset).date()
+    day_start = datetime.combine(today, time()) + offset
+    if today != (db_now - offset).date():
+        now = day_start  # 指定日の集計（ベンチマーク等）は 0 時時点
+    return Clock(today, day_start, now)
+
+
+def _month_start(today: date) -> date:
+    return today.replace(day=1)
+
+
+def _purchases(db: Session, clock: Clock) -> dict:
+    day_start = clock.day_start
+    month_start = day_start - timedelta(days=clock.today.day - 1)
+    week_start = day_start - timedelta(days=6)
+    amount = func.sum(Arrival.quantity * Arrival.wholesale_price)
+    in_today = Arrival.arrived_at >= day_start
+    in_week = Arrival.arrived_at >= week_start
+
+    month = (
+        db.query(
+            func.count(Arrival.id),
+            func.coalesce(amount, 0),
+            func.sum(case((in_today, 1), else_=0)),
+            func.sum(case((in_today, Arrival.quantity * Arrival.wholesale_price), else_=0)),
+        )
+        .filter(Arrival.arrived_at >= month_start, Arrival.arrived_at < day_start + timedelta(days=1))
+        .one()
+    )
+    week_count = (
+        db.query(func.count(Arrival.id))
+        .filter(in_week, Arrival.arrived_at < day_start + timedelta(days=1))
+        .scalar()
+    )
+    recent = (
+        db.query(Arrival.id, Arrival.display_id, Arrival.item_id, Item.name, Arrival.quantity, Arrival.arrived_at)
+        .join(Item, Item.id == Arrival.item_id)
+        .order_by(Arrival.arrived_at.desc(), Arrival.id.desc())
+        .limit(TOP_N)
+        .all()
+    )
+    return {
+        "today_count": int(month[2] or 0),
+        "today_amount": float(month[3] or 0),
+        "week_count": int(week_count or 0),
+        "month_count": int(month[0] or 0),
+        "month_amount": float(month[1] or 0),
+        "recent": [
+            {
+                "arrival_id": r.id,
+                "display_id": r.display_id,
+                "item_id": r.item_id,
+                "item_name": r.name,
+                "quantity": r.quantity,
+                "arrived_at": r.arrived_at.isoformat() if r.arrived_at else None,
+            }
+            for r in recent
+        ],
+    }
+
+
+def _transfers(db: Session, clock: Clock) -> dict:
+    today = clock.today
+    amount = Transfer.quantity * Transfer.unit_price
+    rows = (
+        db.query(
+            Transfer.store_id,
+            func.count(Transfer.id),
+            func.sum(Transfer.quantity),
+            func.sum(amount),
+            func.sum(case((Transfer.transferred_at == today, 1), else_=0)),
+            func.sum(case((Transfer.transferred_at == today, amount), else_=0)),
+        )
+        .filter(Transfer.transferred_at >= _month_start(today), Transfer.transferred_at <= today)
+        .group_by(Transfer.store_id)
+        .all()
+    )
+    stores = {s.id: s for s in db.query(Store.id, Store.name, Store.operation_type).all()}
+    ranking = sorted(
+        (
+            {
+                "store_id": store_id,
+                "store_name": stores[store_id].name if store_id in stores else None,
+                "operation_type": stores[store_id].operation_type if store_id in stores else None,
+                "transfer_count": int(count),
+                "quantity": int(quantity or 0),
+                "amount": float(total or 0),
+            }
+            for store_id, count, quantity, total, _, _ in rows
+        ),
+        key=lambda r: r["amount"],
+        reverse=True,
+    )
+    return {
+        "today_count": sum(int(r[4] or 0) for r in rows),
+        "today_amount": sum(float(r[5] or 0) for r in rows),
+        "month_count": sum(r["transfer_count"] for r in ranking),
+        "month_quantity": sum(r["quantity"] for r in ranking),
+        "month_amount": sum(r["amount"] for r in ranking),
+        "store_ranking": ranking,
+    }
+
+
+def _inventory(db: Session, clock: Clock) -> dict:
+    rows = (
+        db.query(
+            func.coalesce(Item.category, "その他"),
+            func.count(Inventory.id),
+            func.sum(Inventory.quantity),
+            func.sum(Inventory.quantity * func.coalesce(Inventory.unit_price, 0)),
+            func.sum(case((Inventory.quantity <= 0, 1), else_=0)),
+            func.sum(case(((Inventory.quantity > 0) & (Inventory.quantity < LOW_STOCK_THRESHOLD), 1), else_=0)),
+        )
+        .outerjoin(Item, Item.id == Inventory.item_id)
+        .group_by(func.coalesce(Item.category, "その他"))
+        .all()
+    )
+    categories = sorted(
+        (
+            {"category": category, "item_count": int(count), "quantity": int(quantity or 0), "valuation": float(value or 0)}
+            for category, count, quantity, value, _, _ in rows
+        ),
+        key=lambda r: r["quantity"],
+        reverse=True,
+    )
+    return {
+        "item_count": sum(r["item_count"] for r in categories),
+        "total_quantity": sum(r["quantity"] for r in categories),
+        "valuation": sum(r["valuation"] for r in categories),
+        "out_of_stock_count": sum(int(r[4] or 0) for r in rows),
+        "low_stock_count": sum(int(r[5] or 0) for r in rows),
+        "categories": categories,
+    }
+
+
+def _alerts(db: Session, clock: Clock) -> dict:
+    # 長期在庫は一覧 API と同じ時計・同じ部分インデックス
+    threshold = clock.now - timedelta(days=settings_service.current(db).inventory_alert_days)
+    lots = (
+        db.query(Arrival.id, Arrival.display_id, Arrival.item_id, Item.name, Arrival.remaining_quantity, Arrival.arrived_at)
+        .join(Item, Item.id == Arrival.item_id)
+        .filter(OPEN_LOT, Arrival.arrived_at < threshold)
+        .order_by(Arrival.arrived_at)
+        .all()
+    )
+    pending = db.query(func.count(ErrorAlert.id)).filter(ErrorAlert.status == "pending").scalar()
+    return {
+        "pending_count": int(pending or 0),
+        "long_term_count": len(lots),
+        "long_term_quantity": sum(lot.remaining_quantity for lot in lots),
+        "long_term": [
+            {
+                "arrival_id": lot.id,
+                "display_id": lot.display_id,
+                "item_id": lot.item_id,
+                "item_name": lot.name,
+                "quantity": lot.remaining_quantity,
+                "days_in_stock": (clock.now - lot.arrived_at.replace(tzinfo=None)).days,
+            }
+            for lot in lots[:TOP_N]
+        ],
+    }
+
+
+def _costs(db: Session, clock: Clock) -> dict:
+    today = clock.today
+    expenses = (
+        db.query(func.count(Expense.id), func.sum(Expense.amount))
+        .filter(Expense.year_month == today.strftime("%Y-%m"))
+        .one()
+    )
+    supply = (
+        db.query(func.sum(SupplyTransfer.quantity * SupplyTransfer.unit_price))
+        .filter(SupplyTransfer.transferred_at >= _month_start(today), SupplyTransfer.transferred_at <= today)
+        .scalar()
+    )
+    return {
+        "month_expense_count": int(expenses[0] or 0),
+        "month_expense_total": float(expenses[1] or 0),
+        "month_supply_total": float(supply or 0),
+    }
+
+
+def _invoices(db: Session, clock: Clock) -> dict:
+    recent = db.query(Invoice).order_by(Invoice.created_at.desc(), Invoice.id.desc()).limit(TOP_N).all()
+    unpaid = (
+        db.query(func.count(Invoice.id), func.sum(Invoice.total_amount))
+        .filter(Invoice.status != "paid")
+        .one()
+    )
+    return {
+        "unpaid_count": int(unpaid[0] or 0),
+        "unpaid_total": float(unpaid[1] or 0),
+        "recent": [
+            {
+                "id": inv.id,
+                "invoice_number": inv.invoice_number,
+                "store_id": inv.store_id,
+                "invoice_type": inv.invoice_type,
+                "period_start": inv.period_start.isoformat(),
+                "period_end": inv.period_end.isoformat(),
+                "total_amount": float(inv.total_amount or 0),
+                "status": inv.status,
+            }
+            for inv in recent
+        ],
+    }
+
+
+# セクション名 -> (依存テーブル, 集計関数)
+SECTIONS: Dict[str, Tuple[Tuple[str, ...], Callable[[Session, Clock], dict]]] = {
+    "purchases": (("arrivals", "items"), _purchases),
+    "transfers": (("transfers", "stores"), _transfers),
+    "inventory": (("inventory", "items"), _inventory),
+    "alerts": (("error_alerts", "arrivals", "items", "settings"), _alerts),
+    "costs": (("expenses", "supply_transfers"), _costs),
+    "invoices": (("invoices",), _invoices),
+}
+
+
+class DashboardCache:
+    """セクション別の集計結果を依存テーブルのバージョンと日付で保持"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[tuple, dict]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, today: Optional[date] = None) -> dict:
+        started = _time.perf_counter()
+        clock = _clock(db, today)
+        result = {"date": clock.today.isoformat()}
+        recomputed = []
+        for name, (tables, compute) in SECTIONS.items():
+            # 長期在庫は時刻で変わるので分単位、ほかは業務日単位
+            stamp = clock.now if name == "alerts" else clock.today
+            key = (stamp, table_versions.snapshot(tables))
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                result[name] = entry[1]
+                continue
+            self.misses += 1
+            value = compute(db, clock)
+            with self._lock:
+                self._entries[name] = (key, value)
+            result[name] = value
+            recomputed.append(name)
+        result["recomputed"] = recomputed
+        result["elapsed_ms"] = round((_time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "sections": len(self._entries)}
+
+
+dashboard_cache = DashboardCache()
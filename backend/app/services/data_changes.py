@@ -0,0 +1,115 @@
+"""
+明細の変更検出（日付・店舗・仕入先の単位）
+- before_flush で対象テーブルの追加・変更・削除から Change（テーブル, 日付, 店舗, 仕入先）を集め、
+  同じトランザクションの接続と一緒に処理へ渡す（集計の作り直し記録・レポートキャッシュの無効化）
+- 集計に関係しない列だけの更新（ロット残数など）は除く
+- 追加で日付が未設定（server_default で入る）のものは DB の現在日付（server_default と同じ時計）
+- 一括 UPDATE / DELETE は対象行が分からないので日付・店舗・仕入先とも None（全範囲）
+- モデルを import しない（database.py から install するため）。処理は最初の変更時に読み込む
+"""
+
+from collections import namedtuple
+from datetime import date, datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import object_mapper
+
+Change = namedtuple("Change", "table day store_id supplier_id")
+
+# テーブル名 -> (日付の列, 店舗の列, 仕入先の列, 集計に関係する列)
+SOURCES = {
+    "transfers": ("transferred_at", "store_id", None, ("store_id", "quantity", "unit_price", "wholesale_price", "transferred_at")),
+    "arrivals": ("arrived_at", None, "supplier_id", ("supplier_id", "item_id", "quantity", "wholesale_price", "arrived_at")),
+    "expenses": ("year_month", "store_id", None, ("store_id", "category", "amount", "year_month", "note")),
+    "supply_transfers": ("transferred_at", "store_id", None, ("store_id", "quantity", "unit_price", "transferred_at")),
+    "stores": (None, "id", None, ("name", "operation_type", "sort_order", "is_active")),
+    "suppliers": (None, None, "id", ("name",)),
+}
+
+
+def as_date(value) -> Optional[date]:
+    """日付・日時・YYYY-MM（月初日に）を date に"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and len(value) >= 7:
+        try:
+            return date(int(value[:4]), int(value[5:7]), 1)
+        except ValueError:
+            return None
+    return None
+
+
+def _handlers() -> List[Callable]:
+    from app.services import report_cache, summaries
+
+    return [summaries.record_changes, report_cache.record_changes]
+
+
+def _values(state, column: Optional[str]) -> list:
+    """列の変更前後の値（未読み込みなら読み込む）"""
+    if column is None:
+        return [None]
+    return list(state.attrs[column].history.sum()) or [getattr(state.obj(), column)]
+
+
+def _object_changes(obj, is_dirty: bool, db_today: Optional[Callable[[], date]] = None) -> List[Change]:
+    table = object_mapper(obj).persist_selectable.name
+    source = SOURCES.get(table)
+    if source is None:
+        return []
+    date_column, store_column, supplier_column, relevant = source
+    state = inspect(obj)
+    if is_dirty and not any(state.attrs[name].history.has_changes() for name in relevant):
+        return []
+    days = {as_date(value) for value in _values(state, date_column)} if date_column else {None}
+    if db_today is not None and days == {None} and date_column:
+        days = {db_today()}
+    stores = set(_values(state, store_column))
+    suppliers = set(_values(state, supplier_column))
+    return [Change(table, day, store_id, supplier_id) for day in days for store_id in stores for supplier_id in suppliers]
+
+
+def install(session_factory):
+    """sessionmaker にイベントフックを登録"""
+
+    def dispatch(session, changes):
+        if changes:
+            connection = session.connection()
+            for handler in _handlers():
+                handler(connection, changes)
+
+    @event.listens_for(session_factory, "before_flush")
+    def _before_flush(session, flush_context, instances):
+        today = []
+
+        def db_today() -> date:
+            if not today:
+                today.append(as_date(session.connection().scalar(select(func.now()))))
+            return today[0]
+
+        changes = set()
+        for obj in session.new:
+            changes.update(_object_changes(obj, False, db_today))
+        for obj in session.deleted:
+            changes.update(_object_changes(obj, False))
+        for obj in session.dirty:
+            changes.update(_object_changes(obj, True))
+        dispatch(session, changes)
+
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _do_orm_execute(orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        table = mapper.persist_selectable.name if mapper is not None else None
+        if table not in SOURCES:
+            return
+        if orm_execute_state.is_update:
+            # SET する列が分かれば、関係する列を含むときだけ
+            values = getattr(orm_execute_state.statement, "_values", None)
+            if values and not {getattr(key, "key", key) for key in values} & set(SOURCES[table][3]):
+                return
+        dispatch(orm_execute_state.session, {Change(table, None, None, None)})
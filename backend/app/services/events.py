@@ -0,0 +1,176 @@
+"""
+在庫イベントバス
+- ハンドラーは emit(db, ...) でセッションにイベントを積み、commit 成功時に配信（rollback 時は破棄）
+- 同じ対象（品目の在庫・ロット・店舗×品目の持ち出し）のイベントは差分を合算して 1 件にまとめる
+- 購読者ごとに店舗 / 品目のトピックで絞り込み、短い間隔でまとめて送る
+- 直近のイベントを保持し、再接続時（Last-Event-ID）に取りこぼし分を再送
+"""
+
+import asyncio
+import itertools
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+
+EVENTS_COALESCE_MS = int(os.getenv("EVENTS_COALESCE_MS", "200"))
+EVENTS_HISTORY = int(os.getenv("EVENTS_HISTORY", "1000"))
+
+_SESSION_KEY = "pending_events"
+
+# 種類ごとの合算キー
+EVENT_KEYS = {
+    "inventory": ("item_id",),
+    "lot": ("arrival_id",),
+    "arrival": ("arrival_id",),
+    "transfer": ("store_id", "item_id"),
+}
+# 合算する差分フィールド（それ以外は最新値で上書き）
+DELTA_FIELDS = ("delta", "count")
+
+EventKey = Tuple
+
+
+def _key(data: dict) -> EventKey:
+    return (data["type"],) + tuple(data.get(name) for name in EVENT_KEYS.get(data["type"], ("id",)))
+
+
+def merge(pending: "OrderedDict[EventKey, dict]", data: dict):
+    """同じ対象のイベントを 1 件に合算"""
+    key = _key(data)
+    current = pending.get(key)
+    if current is None:
+        pending[key] = dict(data)
+        return
+    for name, value in data.items():
+        if name in DELTA_FIELDS:
+            current[name] = current.get(name, 0) + value
+        else:
+            current[name] = value
+    pending.move_to_end(key)
+
+
+def emit(db, type: str, **fields):
+    """セッションにイベントを積む（commit 後に配信）"""
+    merge(db.info.setdefault(_SESSION_KEY, OrderedDict()), {"type": type, **fields})
+
+
+class Subscription:
+    """1 接続分の購読（トピック絞り込み + 未送信分の合算）"""
+
+    def __init__(self, bus: "EventBus", loop: asyncio.AbstractEventLoop,
+                 stores: Optional[Set[int]], items: Optional[Set[int]]):
+        self.bus = bus
+        self.loop = loop
+        self.stores = stores
+        self.items = items
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[EventKey, dict]" = OrderedDict()
+        self._last_id = 0
+        self._ready = asyncio.Event()
+        self.resync = False  # 再送できない（履歴切れ）ので REST で取り直しが必要
+        self.start_id = 0
+
+    def matches(self, data: dict) -> bool:
+        if self.stores is None and self.items is None:
+            return True
+        if self.stores is not None and data.get("store_id") in self.stores:
+            return True
+        if self.items is not None and data.get("item_id") in self.items:
+            return True
+        # 店舗を持たない在庫イベントは品目指定がなければ店舗購読者にも届ける
+        return self.items is None and data.get("store_id") is None
+
+    def offer(self, event_id: int, events: List[dict]):
+        matched = [data for data in events if self.matches(data)]
+        if not matched:
+            return
+        with self._lock:
+            for data in matched:
+                merge(self._pending, data)
+            self._last_id = event_id
+        self.loop.call_soon_threadsafe(self._ready.set)
+
+    async def next_batch(self, timeout: float) -> Tuple[int, List[dict]]:
+        """次の配信分（timeout 秒で空を返す）"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return 0, []
+        # 続けて届く更新をまとめる
+        await asyncio.sleep(EVENTS_COALESCE_MS / 1000)
+        with self._lock:
+            self._ready.clear()
+            events = list(self._pending.values())
+            self._pending.clear()
+            return self._last_id, events
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    def __init__(self, history: int = EVENTS_HISTORY):
+        self._lock = threading.Lock()
+        self._subscriptions: List[Subscription] = []
+        self._ids = itertools.count(1)
+        self._history: Deque[Tuple[int, List[dict]]] = deque(maxlen=history)
+        self.published = 0
+
+    def subscribe(self, stores: Optional[Iterable[int]] = None, items: Optional[Iterable[int]] = None,
+                  last_event_id: Optional[int] = None) -> Subscription:
+        """購読を開始。last_event_id があればそれ以降の分を最初の配信に含める"""
+        subscription = Subscription(
+            self, asyncio.get_running_loop(),
+            set(stores) if stores else None, set(items) if items else None,
+        )
+        with self._lock:
+            # 履歴の再送と購読登録を同じロック内で行い、重複・取りこぼしを防ぐ
+            if last_event_id is not None:
+                if self._history and self._history[0][0] > last_event_id + 1:
+                    subscription.resync = True
+                else:
+                    for event_id, events in self._history:
+                        if event_id > last_event_id:
+                            subscription.offer(event_id, events)
+            subscription.start_id = self._history[-1][0] if self._history else 0
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, events: List[dict]):
+        if not events:
+            return
+        with self._lock:
+            event_id = next(self._ids)
+            self._history.append((event_id, events))
+            self.published += len(events)
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(event_id, events)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"subscribers": len(self._subscriptions), "published": self.published}
+
+    def install(self, session_factory):
+        """sessionmaker にイベントフックを登録"""
+
+        @event.listens_for(session_factory, "after_commit")
+        def _after_commit(session):
+            pending = session.info.pop(_SESSION_KEY, None)
+            if pending:
+                self.publish(list(pending.values()))
+
+        @event.listens_for(session_factory, "after_rollback")
+        def _after_rollback(session):
+            session.info.pop(_SESSION_KEY, None)
+
+
+event_bus = EventBus()
@@ -0,0 +1,81 @@
+"""
+経費の月次集計
+- expense_rollups に月 × 店舗 × 区分の合計・件数を持ち、経費の登録時に 1 文の UPDATE で加算（なければ作成）
+- P&L・運賃明細の合計はここから読む（月 + 店舗の一意インデックスの範囲読み。明細は走査しない）
+- 区分のまとまり（運賃など）は models/expenses の定数で定義
+"""
+
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.expenses import Expense, ExpenseRollup
+
+# 読み込み済みのオブジェクトは同期しない
+_NO_SYNC = {"synchronize_session": False}
+
+
+def apply(db: Session, year_month: str, store_id: int, category: str, amount, count: int = 1):
+    """経費 count 件・amount を集計に加算（commit は呼び出し側。取り消しは負の値で）"""
+    updated = db.execute(
+        update(ExpenseRollup)
+        .where(
+            ExpenseRollup.year_month == year_month,
+            ExpenseRollup.store_id == store_id,
+            ExpenseRollup.category == category,
+        )
+        .values(amount=ExpenseRollup.amount + amount, expense_count=ExpenseRollup.expense_count + count)
+        .execution_options(**_NO_SYNC)
+    ).rowcount
+    if not updated:
+        db.add(ExpenseRollup(
+            year_month=year_month, store_id=store_id, category=category, amount=amount, expense_count=count,
+        ))
+        db.flush()  # 同じセッション内の次の加算が UPDATE で当たるように
+
+
+def by_category(
+    db: Session, year_month: str, store_id: Optional[int] = None, categories: Optional[Iterable[str]] = None,
+) -> Dict[str, float]:
+    """月（店舗指定時はその店舗）の区分別合計"""
+    stmt = (
+        select(ExpenseRollup.category, func.sum(ExpenseRollup.amount))
+        .where(ExpenseRollup.year_month == year_month)
+        .group_by(ExpenseRollup.category)
+    )
+    if store_id:
+        stmt = stmt.where(ExpenseRollup.store_id == store_id)
+    if categories is not None:
+        stmt = stmt.where(ExpenseRollup.category.in_(list(categories)))
+    return {category: float(total or 0) for category, total in db.execute(stmt)}
+
+
+def by_store(db: Session, year_month: str, categories: Optional[Iterable[str]] = None) -> Dict[int, float]:
+    """月の店舗別合計（categories 指定時はその区分のみ）"""
+    stmt = (
+        select(ExpenseRollup.store_id, func.sum(ExpenseRollup.amount))
+        .where(ExpenseRollup.year_month == year_month)
+        .group_by(ExpenseRollup.store_id)
+    )
+    if categories is not None:
+        stmt = stmt.where(ExpenseRollup.category.in_(list(categories)))
+    return {store_id: float(total or 0) for store_id, total in db.execute(stmt)}
+
+
+def backfill(db: Session) -> int:
+    """集計が空なら経費明細から作成（commit は呼び出し側）。作成した行数を返す"""
+    if db.scalar(select(ExpenseRollup.id).limit(1)) is not None:
+        return 0
+    totals = (
+        select(
+            Expense.year_month, Expense.store_id, Expense.category,
+            func.sum(Expense.amount), func.count(Expense.id),
+        )
+        .group_by(Expense.year_month, Expense.store_id, Expense.category)
+    )
+    return db.execute(
+        ExpenseRollup.__table__.insert().from_select(
+            ["year_month", "store_id", "category", "amount", "expense_count"], totals,
+        )
+    ).rowcount
@@ -0,0 +1,76 @@
+"""
+大量行レスポンスの高速シリアライズ
+- 必要な列だけをタプルで取得し、行ごとの Pydantic モデル生成を省く
+- Numeric 列は float で受け取り、桁数固定の書式で文字列化（Pydantic の Decimal 出力と同じ形）
+- orjson があれば使い、なければ標準 json にフォールバック
+- エンドポイント単位で opt-in（response_model はドキュメント用に残す）
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, Iterable, List, Sequence, Tuple
+
+from fastapi.responses import Response
+from sqlalchemy import Float, Numeric, type_coerce
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """シリアライズ済み bytes をそのまま返す JSON レスポンス"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+class RowSerializer:
+    """(キー, 列) の定義から SELECT 列と JSON 変換を組み立てる"""
+
+    def __init__(self, fields: Sequence[Tuple[str, Any]]):
+        self.keys: List[str] = [key for key, _ in fields]
+        self.columns: List[Any] = []
+        self._decimal_fields: List[Tuple[str, str]] = []
+        for key, column in fields:
+            column_type = getattr(column, "type", None)
+            if isinstance(column_type, Numeric) and not isinstance(column_type, Float):
+                # Decimal 変換を省き、書式は事前に決めておく
+                self.columns.append(type_coerce(column, Float).label(key))
+                self._decimal_fields.append((key, f"%.{column_type.scale or 0}f"))
+            else:
+                self.columns.append(column.label(key) if hasattr(column, "label") else column)
+
+    def to_dicts(self, rows: Iterable[Sequence[Any]]) -> List[dict]:
+        keys = self.keys
+        decimal_fields = self._decimal_fields
+        result = [dict(zip(keys, row)) for row in rows]
+        if decimal_fields:
+            for data in result:
+                for key, fmt in decimal_fields:
+                    value = data[key]
+                    if value is not None:
+                        data[key] = fmt % value
+        return result
+
+    def serialize(self, rows: Iterable[Sequence[Any]]) -> bytes:
+        return dumps(self.to_dicts(rows))
+
+    def response(self, rows: Iterable[Sequence[Any]]) -> FastJSONResponse:
+        return FastJSONResponse(self.serialize(rows))
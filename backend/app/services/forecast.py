@@ -0,0 +1,369 @@
+"""
+需要予測と発注提案
+- demand_daily に品目 × 店舗 × 日の持ち出し数を持つ。バッチは前回の watermark（transfers.id）より後の持ち出しだけを加算
+- 予測は直近 HISTORY_DAYS 日の系列を numpy の行列（系列 × 日）にして全系列まとめて計算
+  - 水準: 直近 8 週の 1 日平均（繁忙期の日は除く）
+  - 曜日係数: 曜日ごとの平均 / 水準（日数の少ない分は 1 に寄せる）
+  - 繁忙期（母の日・彼岸・お盆・年末）: 前年の同じ期間の平均 / その直前 4 週の平均を品目ごと（店舗合算）に掛ける。
+    直近の水準が 0 の系列（その時期にしか出ない品目）は前年の同じ期間の平均をそのまま使う
+- 予測は demand_forecasts に保存し、API は保存済みの予測と現在の在庫から発注提案を組み立てる
+- 発注提案: 次の市場日からその次の市場日の前日までの予測需要 − 市場日時点の見込み在庫を、仕入先ごとに
+  （仕入先は直近 90 日で入荷数の最も多い仕入先）
+"""
+
+import math
+import os
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, delete, func, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.inventory import Arrival, Inventory
+from app.models.items import Item
+from app.models.logs import ForecastRun
+from app.models.settings import Supplier
+from app.models.stores import Store
+from app.models.transfers import DemandDaily, DemandForecast, Transfer
+
+FORECAST_INTERVAL_HOURS = float(os.getenv("FORECAST_INTERVAL_HOURS", "24"))
+FORECAST_HORIZON_DAYS = int(os.getenv("FORECAST_HORIZON_DAYS", "14"))
+# 市場日（0=月 … 6=日）
+MARKET_WEEKDAYS = tuple(sorted(int(d) for d in os.getenv("MARKET_WEEKDAYS", "0,2,4").split(",")))
+FORECAST_SAFETY_RATIO = float(os.getenv("FORECAST_SAFETY_RATIO", "0.1"))
+
+HISTORY_DAYS = 420  # 前年の繁忙期とその直前 4 週を含む
+LEVEL_DAYS = 56
+BASELINE_DAYS = 28
+WEEKDAY_PRIOR = 2.0  # 曜日係数を 1 に寄せる強さ（日数換算）
+PEAK_LIFT_MAX = 5.0
+PEAK_PRIOR = 5.0  # 品目の倍率を全体の倍率に寄せる強さ（1 日あたりの数量換算）
+SUPPLIER_LOOKBACK_DAYS = 90
+
+_BATCH_SIZE = 5000
+
+
+# ========== 繁忙期 ==========
+
+def _equinox(year: int, spring: bool) -> date:
+    """春分・秋分の日（1980〜2099 年の近似式）"""
+    base = 20.8431 if spring else 23.2488
+    return date(year, 3 if spring else 9, int(base + 0.242194 * (year - 1980) - (year - 1980) // 4))
+
+
+def peak_periods(year: int) -> Dict[str, Tuple[date, date]]:
+    """繁忙期の期間（需要が当日より前に出るので前倒しで取る）"""
+    may1 = date(year, 5, 1)
+    mothers_day = may1 + timedelta(days=(6 - may1.weekday()) % 7 + 7)  # 5 月の第 2 日曜
+    spring, autumn = _equinox(year, True), _equinox(year, False)
+    return {
+        "母の日": (mothers_day - timedelta(days=5), mothers_day),
+        "春彼岸": (spring - timedelta(days=4), spring + timedelta(days=3)),
+        "お盆": (date(year, 8, 8), date(year, 8, 15)),
+        "秋彼岸": (autumn - timedelta(days=4), autumn + timedelta(days=3)),
+        "年末": (date(year, 12, 25), date(year, 12, 31)),
+    }
+
+
+@lru_cache(maxsize=16)
+def _peak_days(year: int) -> Dict[date, str]:
+    days = {}
+    for name, (start, end) in peak_periods(year).items():
+        for offset in range((end - start).days + 1):
+            days[start + timedelta(days=offset)] = name
+    return days
+
+
+def peak_of(day: date) -> Optional[str]:
+    return _peak_days(day.year).get(day)
+
+
+def next_market_day(day: date) -> date:
+    """day より後の最初の市場日"""
+    for offset in range(1, 8):
+        candidate = day + timedelta(days=offset)
+        if candidate.weekday() in MARKET_WEEKDAYS:
+            return candidate
+    return day + timedelta(days=1)
+
+
+# ========== 系列（demand_daily）の増分更新 ==========
+
+def last_watermark(db: Session) -> int:
+    return db.scalar(select(func.max(ForecastRun.watermark))) or 0
+
+
+def update_series(db: Session, full: bool = False) -> Tuple[str, int, int]:
+    """未集計の持ち出しを系列に加算し（mode, watermark, 加算した持ち出し件数）を返す"""
+    watermark = db.scalar(select(func.max(Transfer.id))) or 0
+    last = last_watermark(db)
+    if last > watermark:
+        full = True  # 復元などで持ち出しが減った
+    if full:
+        db.execute(delete(DemandDaily))
+        last = 0
+    mode = "full" if full else "incremental"
+
+    totals = {
+        (day, item_id, store_id): int(quantity or 0)
+        for day, item_id, store_id, quantity in db.execute(
+            select(Transfer.transferred_at, Transfer.item_id, Transfer.store_id, func.sum(Transfer.quantity))
+            .where(Transfer.id > last, Transfer.id <= watermark)
+            .group_by(Transfer.transferred_at, Transfer.item_id, Transfer.store_id)
+        )
+    }
+    if not totals:
+        return mode, watermark, 0
+    added = db.scalar(select(func.count(Transfer.id)).where(Transfer.id > last, Transfer.id <= watermark))
+
+    existing: Dict[Tuple[date, int, int], int] = {}
+    if not full:
+        days = sorted({day for day, _, _ in totals})
+        for i in range(0, len(days), 500):
+            for row_id, day, item_id, store_id in db.execute(
+                select(DemandDaily.id, DemandDaily.day, DemandDaily.item_id, DemandDaily.store_id)
+                .where(DemandDaily.day.in_(days[i:i + 500]))
+            ):
+                existing[(day, item_id, store_id)] = row_id
+
+    table = DemandDaily.__table__
+    updates = [{"row_id": existing[key], "delta": quantity} for key, quantity in totals.items() if key in existing]
+    inserts = [
+        {"day": day, "item_id": item_id, "store_id": store_id, "quantity": quantity}
+        for (day, item_id, store_id), quantity in totals.items() if (day, item_id, store_id) not in existing
+    ]
+    if updates:
+        db.execute(
+            table.update().where(table.c.id == bindparam("row_id")).values(quantity=table.c.quantity + bindparam("delta")),
+            updates,
+        )
+    for i in range(0, len(inserts), _BATCH_SIZE):
+        db.execute(table.insert(), inserts[i:i + _BATCH_SIZE])
+    return mode, watermark, int(added or 0)
+
+
+# ========== 予測 ==========
+
+def _load_matrix(db: Session, start: date, end: date) -> Tuple[List[Tuple[int, int]], np.ndarray]:
+    """（系列キー [(item_id, store_id)], 系列 × 日の行列）"""
+    rows = db.execute(
+        select(DemandDaily.item_id, DemandDaily.store_id, DemandDaily.day, DemandDaily.quantity)
+        .where(DemandDaily.day.between(start, end))
+    ).all()
+    keys = sorted({(item_id, store_id) for item_id, store_id, _, _ in rows})
+    index = {key: i for i, key in enumerate(keys)}
+    matrix = np.zeros((len(keys), (end - start).days + 1))
+    if rows:
+        matrix[
+            np.fromiter((index[(r[0], r[1])] for r in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter(((r[2] - start).days for r in rows), dtype=np.int64, count=len(rows)),
+        ] = np.fromiter((r[3] for r in rows), dtype=float, count=len(rows))
+    return keys, matrix
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, default) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.full(numerator.shape, default, dtype=float), where=denominator > 0)
+
+
+def fit(keys: List[Tuple[int, int]], matrix: np.ndarray, start: date, targets: List[date]) -> Tuple[np.ndarray, List[Optional[str]]]:
+    """系列 × 予測日の予測値と、予測日ごとの繁忙期名"""
+    n_series, n_days = matrix.shape
+    days = [start + timedelta(days=i) for i in range(n_days)]
+    weekdays = np.array([d.weekday() for d in days])
+    normal = (np.arange(n_days) >= n_days - LEVEL_DAYS) & np.array([peak_of(d) is None for d in days])
+
+    level = matrix[:, normal].mean(axis=1) if normal.any() else np.zeros(n_series)
+    factors = np.ones((n_series, 7))
+    for weekday in range(7):
+        columns = normal & (weekdays == weekday)
+        count = int(columns.sum())
+        if count:
+            total = matrix[:, columns].sum(axis=1)
+            factors[:, weekday] = _ratio(total + WEEKDAY_PRIOR * level, (count + WEEKDAY_PRIOR) * level, 1.0)
+
+    target_weekdays = np.array([d.weekday() for d in targets])
+    forecast = level[:, None] * factors[:, target_weekdays]
+    peaks = [peak_of(d) for d in targets]
+
+    # 繁忙期: 前年の同じ期間から品目ごとの倍率（直近の水準がない系列は前年の平均）
+    item_ids = np.array([item_id for item_id, _ in keys], dtype=np.int64)
+    _, item_index = np.unique(item_ids, return_inverse=True)
+    for name in {p for p in peaks if p is not None}:
+        columns = [i for i, p in enumerate(peaks) if p == name]
+        period_start, period_end = peak_periods(targets[columns[0]].year - 1)[name]
+        first = (period_start - start).days - BASELINE_DAYS
+        last = (period_end - start).days
+        if first < 0 or last >= n_days:
+            continue
+        window = matrix[:, first + BASELINE_DAYS:last + 1].mean(axis=1)
+        baseline = matrix[:, first:first + BASELINE_DAYS].mean(axis=1)
+        item_window = np.bincount(item_index, weights=window)
+        item_baseline = np.bincount(item_index, weights=baseline)
+        pooled = window.sum() / baseline.sum() if baseline.sum() > 0 else 1.0
+        lift = np.clip((item_window + PEAK_PRIOR * pooled) / (item_baseline + PEAK_PRIOR), 1.0, PEAK_LIFT_MAX)[item_index]
+        forecast[:, columns] = np.where(level[:, None] > 0, forecast[:, columns] * lift[:, None], window[:, None])
+    return forecast, peaks
+
+
+def run(db: Session, full: bool = False, today: Optional[date] = None) -> ForecastRun:
+    """系列を更新して予測を作り直し、実行記録を返す（commit は呼び出し側）"""
+    started = time.perf_counter()
+    today = today or date.today()
+    mode, watermark, added = update_series(db, full=full)
+
+    # 当日分は途中なので前日までの系列で予測する
+    end = today - timedelta(days=1)
+    start = end - timedelta(days=HISTORY_DAYS - 1)
+    keys, matrix = _load_matrix(db, start, end)
+    targets = [today + timedelta(days=i) for i in range(1, FORECAST_HORIZON_DAYS + 1)]
+    forecast, peaks = fit(keys, matrix, start, targets) if keys else (np.zeros((0, len(targets))), [])
+
+    db.execute(delete(DemandForecast))
+    series, columns = np.nonzero(forecast >= 0.01)
+    rows = [
+        {
+            "item_id": keys[s][0], "store_id": keys[s][1], "target_date": targets[c],
+            "quantity": round(float(forecast[s, c]), 2), "peak": peaks[c],
+        }
+        for s, c in zip(series.tolist(), columns.tolist())
+    ]
+    for i in range(0, len(rows), _BATCH_SIZE):
+        db.execute(DemandForecast.__table__.insert(), rows[i:i + _BATCH_SIZE])
+
+    forecast_run = ForecastRun(
+        mode=mode,
+        watermark=watermark,
+        transfers_added=added,
+        series_count=len(set(series.tolist())),
+        forecast_from=targets[0],
+        forecast_to=targets[-1],
+        duration_ms=int((time.perf_counter() - started) * 1000),
+    )
+    db.add(forecast_run)
+    db.flush()
+    return forecast_run
+
+
+def run_forecast_job() -> Dict[str, int]:
+    """定期ジョブ: 系列の増分更新と予測の作り直し"""
+    db = SessionLocal()
+    try:
+        forecast_run = run(db)
+        db.commit()
+        return {"run_id": forecast_run.id, "transfers_added": forecast_run.transfers_added,
+                "series": forecast_run.series_count, "duration_ms": forecast_run.duration_ms}
+    finally:
+        db.close()
+
+
+# ========== 発注提案 ==========
+
+def _suppliers_of(db: Session, item_ids: List[int], today: date) -> Dict[int, int]:
+    """品目ごとの仕入先（直近 90 日で入荷数の最も多い仕入先。なければ最後に入荷した仕入先）"""
+    since = today - timedelta(days=SUPPLIER_LOOKBACK_DAYS)
+    best: Dict[int, Tuple[int, int]] = {}
+    for item_id, supplier_id, quantity in db.execute(
+        select(Arrival.item_id, Arrival.supplier_id, func.sum(Arrival.quantity))
+        .where(Arrival.item_id.in_(item_ids), Arrival.supplier_id.isnot(None), Arrival.arrived_at >= since)
+        .group_by(Arrival.item_id, Arrival.supplier_id)
+    ):
+        if item_id not in best or (quantity or 0) > best[item_id][1]:
+            best[item_id] = (supplier_id, quantity or 0)
+    suppliers = {item_id: supplier_id for item_id, (supplier_id, _) in best.items()}
+    missing = [item_id for item_id in item_ids if item_id not in suppliers]
+    if missing:
+        for item_id, supplier_id in db.execute(
+            select(Arrival.item_id, Arrival.supplier_id)
+            .where(Arrival.item_id.in_(missing), Arrival.supplier_id.isnot(None))
+            .order_by(Arrival.arrived_at, Arrival.id)
+        ):
+            suppliers[item_id] = supplier_id
+    return suppliers
+
+
+def suggestions(db: Session, today: Optional[date] = None, supplier_id: Optional[int] = None) -> dict:
+    """次の市場日の仕入先別発注提案（予測がないか期間が足りなければ先にバッチを実行）"""
+    today = today or date.today()
+    market_day = next_market_day(today)
+    following = next_market_day(market_day)
+
+    latest = db.query(ForecastRun).order_by(ForecastRun.id.desc()).first()
+    if latest is None or latest.forecast_from > today + timedelta(days=1) or latest.forecast_to < following - timedelta(days=1):
+        latest = run(db, today=today)
+        db.commit()
+
+    lead: Dict[int, float] = defaultdict(float)
+    cover: Dict[int, float] = defaultdict(float)
+    by_store: Dict[int, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+    peaks: Dict[int, set] = defaultdict(set)
+    for item_id, store_id, target_date, quantity, peak in db.execute(
+        select(DemandForecast.item_id, DemandForecast.store_id, DemandForecast.target_date,
+               DemandForecast.quantity, DemandForecast.peak)
+        .where(DemandForecast.target_date > today, DemandForecast.target_date < following)
+    ):
+        if target_date < market_day:
+            lead[item_id] += quantity
+            continue
+        cover[item_id] += quantity
+        by_store[item_id][store_id] += quantity
+        if peak:
+            peaks[item_id].add(peak)
+
+    item_ids = sorted(cover)
+    stock = dict(
+        db.execute(
+            select(Inventory.item_id, func.sum(Inventory.quantity))
+            .where(Inventory.item_id.in_(item_ids))
+            .group_by(Inventory.item_id)
+        ).all()
+    ) if item_ids else {}
+    names = dict(db.execute(select(Item.id, Item.name).where(Item.id.in_(item_ids))).all()) if item_ids else {}
+    suppliers = _suppliers_of(db, item_ids, today) if item_ids else {}
+    supplier_names = dict(db.execute(select(Supplier.id, Supplier.name)).all())
+    store_names = dict(db.execute(select(Store.id, Store.name)).all())
+
+    grouped: Dict[Optional[int], List[dict]] = defaultdict(list)
+    for item_id in item_ids:
+        item_supplier = suppliers.get(item_id)
+        if supplier_id is not None and item_supplier != supplier_id:
+            continue
+        on_hand = int(stock.get(item_id) or 0)
+        projected = max(0.0, on_hand - lead[item_id])
+        grouped[item_supplier].append({
+            "item_id": item_id,
+            "item_name": names.get(item_id),
+            "stock": on_hand,
+            "lead_demand": round(lead[item_id], 1),
+            "forecast_quantity": round(cover[item_id], 1),
+            "suggested_quantity": max(0, math.ceil(cover[item_id] * (1 + FORECAST_SAFETY_RATIO) - projected)),
+            "peaks": sorted(peaks[item_id]),
+            "stores": [
+                {"store_id": store_id, "store_name": store_names.get(store_id), "quantity": round(quantity, 1)}
+                for store_id, quantity in sorted(by_store[item_id].items(), key=lambda s: -s[1])
+            ],
+        })
+
+    result = []
+    for key, items in grouped.items():
+        items.sort(key=lambda row: (-row["suggested_quantity"], row["item_id"]))
+        result.append({
+            "supplier_id": key,
+            "supplier_name": supplier_names.get(key) if key is not None else None,
+            "item_count": sum(1 for row in items if row["suggested_quantity"] > 0),
+            "total_suggested": sum(row["suggested_quantity"] for row in items),
+            "items": items,
+        })
+    result.sort(key=lambda s: -s["total_suggested"])
+    return {
+        "run_id": latest.id,
+        "generated_at": latest.started_at.isoformat() if latest.started_at else None,
+        "market_day": market_day.isoformat(),
+        "covers_until": (following - timedelta(days=1)).isoformat(),
+        "safety_ratio": FORECAST_SAFETY_RATIO,
+        "suppliers": result,
+    }
@@ -0,0 +1,275 @@
+"""
+請求書 PDF
+- reportlab で描画。日本語フォント（TrueType）をサブセット埋め込みする。INVOICE_PDF_FONT で指定、
+  未指定なら FONT_CANDIDATES（IPAex / IPA / Takao ゴシック）のうち存在するもの
+- 埋め込めるフォントがなければ描画しない（API は 503。起動時に警告）。埋め込まない CID フォントには切り替えない
+- 描画はプロセスプールで行い、API のスレッドはファイルができるのを待つだけ
+- INVOICE_PDF_DIR に「請求書ID-内容のハッシュ.pdf」で保存。記載内容（明細・金額・発行元）が変わると別のキーになり作り直す
+- 同じキーの同時リクエストは 1 回の描画を共有する
+- 発行元は設定の company_name / invoice_registration_number（任意）を使う
+"""
+
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+except ImportError:
+    canvas = None
+
+INVOICE_PDF_DIR = os.getenv("INVOICE_PDF_DIR", "./invoice_pdfs")
+INVOICE_PDF_FONT = os.getenv("INVOICE_PDF_FONT", "")
+INVOICE_PDF_WORKERS = int(os.getenv("INVOICE_PDF_WORKERS", "2"))
+INVOICE_PDF_TIMEOUT = float(os.getenv("INVOICE_PDF_TIMEOUT", "60"))
+
+# INVOICE_PDF_FONT 未指定時に探すフォント（Debian/Ubuntu のパッケージの配置）
+FONT_CANDIDATES = (
+    "/usr/share/fonts/opentype/ipaexfont-gothic/ipaexg.ttf",
+    "/usr/share/fonts/truetype/ipaexfont-gothic/ipaexg.ttf",
+    "/usr/share/fonts/opentype/ipafont-gothic/ipag.ttf",
+    "/usr/share/fonts/truetype/takao-gothic/TakaoGothic.ttf",
+)
+FONT_NAME = "InvoiceFont"
+
+TAX_LABELS = {0.10: "10%", 0.08: "8%※"}
+
+
+def _find_font() -> str:
+    if INVOICE_PDF_FONT:
+        return INVOICE_PDF_FONT
+    return next((path for path in FONT_CANDIDATES if os.path.isfile(path)), "")
+
+
+font_path = _find_font()
+
+
+def unavailable_reason() -> Optional[str]:
+    """描画できない理由（描画できるなら None）"""
+    if canvas is None:
+        return "reportlab is not installed"
+    if not font_path:
+        return "no Japanese TrueType font to embed (set INVOICE_PDF_FONT, e.g. IPAexGothic ipaexg.ttf)"
+    if not os.path.isfile(font_path):
+        return f"INVOICE_PDF_FONT not found: {font_path}"
+    return None
+
+
+def available() -> bool:
+    return unavailable_reason() is None
+
+
+# ========== 描画（子プロセス側。アプリのモジュールには依存しない） ==========
+
+def _register_font(path: str) -> str:
+    if not path:
+        raise ValueError("a TrueType font to embed is required")
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, path))  # サブセットを埋め込む
+    return FONT_NAME
+
+
+def _yen(value) -> str:
+    return f"¥{int(round(float(value or 0))):,}"
+
+
+def render(data: dict, path: str, font_file: str) -> str:
+    """請求書データ（dict）を PDF に描画して path に保存（font_file は埋め込む TTF）"""
+    font = _register_font(font_file)
+    width, height = A4
+    left, right = 18 * mm, width - 18 * mm
+    tmp = f"{path}.{os.getpid()}.tmp"
+    pdf = canvas.Canvas(tmp, pagesize=A4)
+    pdf.setTitle(f"請求書 {data['invoice_number']}")
+
+    def header() -> float:
+        pdf.setFont(font, 20)
+        pdf.drawCentredString(width / 2, height - 25 * mm, "請求書")
+        pdf.setFont(font, 10)
+        pdf.drawRightString(right, height - 35 * mm, f"請求書番号: {data['invoice_number']}")
+        pdf.drawRightString(right, height - 40 * mm, f"発行日: {data['issued_on']}")
+        pdf.setFont(font, 14)
+        pdf.drawString(left, height - 45 * mm, f"{data['store_name']} 御中")
+        pdf.setFont(font, 10)
+        pdf.drawString(left, height - 52 * mm, f"対象期間: {data['period_start']} 〜 {data['period_end']}")
+        y = height - 45 * mm
+        pdf.drawRightString(right, y - 10 * mm, data["issuer_name"])
+        if data.get("registration_number"):
+            pdf.drawRightString(right, y - 15 * mm, f"登録番号: {data['registration_number']}")
+        return height - 70 * mm
+
+    columns = [(left, "日付"), (left + 24 * mm, "品名"), (right - 62 * mm, "数量"),
+               (right - 40 * mm, "単価"), (right - 14 * mm, "金額"), (right, "税率")]
+
+    def table_header(y: float) -> float:
+        pdf.setFillColor(colors.HexColor("#EEEEEE"))
+        pdf.rect(left - 2 * mm, y - 2 * mm, right - left + 4 * mm, 7 * mm, stroke=0, fill=1)
+        pdf.setFillColor(colors.black)
+        pdf.setFont(font, 9)
+        for i, (x, label) in enumerate(columns):
+            (pdf.drawString if i < 2 else pdf.drawRightString)(x, y, label)
+        return y - 8 * mm
+
+    y = table_header(header())
+    for line in data["lines"]:
+        if y < 40 * mm:
+            pdf.showPage()
+            y = table_header(height - 20 * mm)
+        pdf.setFont(font, 9)
+        pdf.drawString(columns[0][0], y, line["transferred_at"] or "")
+        name = line["item_name"]
+        pdf.drawString(columns[1][0], y, name if len(name) <= 28 else name[:27] + "…")
+        pdf.drawRightString(columns[2][0], y, f"{line['quantity']:,}")
+        pdf.drawRightString(columns[3][0], y, _yen(line["unit_price"]))
+        pdf.drawRightString(columns[4][0], y, _yen(line["subtotal"]))
+        pdf.drawRightString(columns[5][0], y, TAX_LABELS.get(line["tax_rate"], f"{line['tax_rate']:.0%}"))
+        y -= 6 * mm
+
+    # 税率ごとの集計（インボイス記載事項）と合計
+    if y < 75 * mm:
+        pdf.showPage()
+        y = height - 30 * mm
+    y -= 4 * mm
+    pdf.line(left, y, right, y)
+    y -= 8 * mm
+    rows = [
+        ("10%対象", data["subtotal_10"], "消費税(10%)", data["tax_amount_10"]),
+        ("8%対象", data["subtotal_08"], "消費税(8%)", data["tax_amount_08"]),
+    ]
+    pdf.setFont(font, 10)
+    for label, subtotal, tax_label, tax in rows:
+        pdf.drawString(right - 90 * mm, y, label)
+        pdf.drawRightString(right - 50 * mm, y, _yen(subtotal))
+        pdf.drawString(right - 45 * mm, y, tax_label)
+        pdf.drawRightString(right, y, _yen(tax))
+        y -= 6 * mm
+    for label, value in (("前回請求額", data["prev_invoice_amount"]), ("ご入金額", data["prev_payment_amount"]),
+                         ("繰越額", data["carryover_amount"])):
+        pdf.drawString(right - 90 * mm, y, label)
+        pdf.drawRightString(right, y, _yen(value))
+        y -= 6 * mm
+    y -= 2 * mm
+    pdf.setFont(font, 14)
+    pdf.drawString(right - 90 * mm, y, "ご請求金額")
+    pdf.drawRightString(right, y, _yen(data["total_amount"]))
+    if data["subtotal_08"]:
+        pdf.setFont(font, 8)
+        pdf.drawString(left, 20 * mm, "※は軽減税率対象")
+
+    pdf.save()
+    os.replace(tmp, path)
+    return path
+
+
+# ========== キャッシュとプロセスプール（API 側） ==========
+
+def payload(invoice, store_name: str, settings_raw: Dict[str, str]) -> dict:
+    """ORM の請求書を子プロセスに渡せる dict に"""
+    issued = invoice.created_at or invoice.updated_at
+    return {
+        "invoice_number": invoice.invoice_number,
+        "issued_on": issued.strftime("%Y-%m-%d") if issued else "",
+        "store_name": store_name,
+        "issuer_name": settings_raw.get("company_name", "8718 Flower"),
+        "registration_number": settings_raw.get("invoice_registration_number") or None,
+        "period_start": invoice.period_start.isoformat(),
+        "period_end": invoice.period_end.isoformat(),
+        "lines": [
+            {
+                "transferred_at": line.transferred_at.isoformat() if line.transferred_at else None,
+                "item_name": line.item_name,
+                "quantity": line.quantity,
+                "unit_price": float(line.unit_price),
+                "subtotal": float(line.subtotal),
+                "tax_rate": round(float(line.tax_rate if line.tax_rate is not None else 0.10), 2),
+            }
+            for line in sorted(invoice.items, key=lambda line: (line.transferred_at is None, line.transferred_at, line.id))
+        ],
+        **{
+            name: float(getattr(invoice, name) or 0)
+            for name in ("subtotal_10", "tax_amount_10", "subtotal_08", "tax_amount_08",
+                         "prev_invoice_amount", "prev_payment_amount", "carryover_amount", "total_amount")
+        },
+    }
+
+
+def cache_path(invoice_id: int, data: dict) -> str:
+    """請求書 ID と記載内容のハッシュをキーにしたファイル名"""
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()[:16]
+    return os.path.join(INVOICE_PDF_DIR, f"{invoice_id}-{digest}.pdf")
+
+
+class PDFRenderer:
+    def __init__(self, workers: int = INVOICE_PDF_WORKERS):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self.rendered = 0
+        self.cache_hits = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # fork だとスレッド（イベントループ・スケジューラ）の状態ごと複製されるので spawn
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def submit(self, path: str, data: dict) -> Future:
+        """描画を依頼（同じ path の描画中なら同じ Future）"""
+        with self._lock:
+            future = self._inflight.get(path)
+            if future is not None:
+                return future
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        future = self._executor().submit(render, data, path, font_path)
+        with self._lock:
+            self._inflight[path] = future
+        future.add_done_callback(lambda f: self._done(path, f))
+        return future
+
+    def _done(self, path: str, future: Future):
+        with self._lock:
+            self._inflight.pop(path, None)
+        if future.exception() is None:
+            self.rendered += 1
+            # 古い版を削除
+            invoice_id = os.path.basename(path).split("-", 1)[0]
+            for old in glob.glob(os.path.join(os.path.dirname(path), f"{invoice_id}-*.pdf")):
+                if old != path:
+                    try:
+                        os.remove(old)
+                    except OSError:
+                        pass
+
+    def ensure(self, invoice, store_name: str, settings_raw: Dict[str, str]) -> str:
+        """キャッシュ済みならそのパス、なければ描画を待って返す"""
+        data = payload(invoice, store_name, settings_raw)
+        path = cache_path(invoice.id, data)
+        if os.path.exists(path):
+            self.cache_hits += 1
+            return path
+        return self.submit(path, data).result(INVOICE_PDF_TIMEOUT)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {"rendered": self.rendered, "cache_hits": self.cache_hits, "in_flight": len(self._inflight),
+                "font": font_path or None}
+
+
+pdf_renderer = PDFRenderer()
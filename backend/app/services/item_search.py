@@ -0,0 +1,167 @@
+"""
+花マスタ検索インデックス
+- インメモリの n-gram (1/2文字) インデックス
+- かな正規化: NFKC + カタカナ→ひらがな + 小文字化
+- items テーブルのバージョンが進んだら次回検索時に再構築
+"""
+
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.models.items import Item
+from app.services.table_versions import table_versions
+
+_KATAKANA_START = 0x30A1  # ァ
+_KATAKANA_END = 0x30F6    # ヶ
+_KANA_OFFSET = 0x60       # カタカナ - ひらがな
+
+
+def normalize(text: Optional[str]) -> str:
+    """検索用に正規化（全角/半角・カタカナ/ひらがな・大文字/小文字を同一視）"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(
+        chr(ord(ch) - _KANA_OFFSET) if _KATAKANA_START <= ord(ch) <= _KATAKANA_END else ch
+        for ch in text
+        if not ch.isspace()
+    )
+
+
+def _grams(text: str) -> Set[str]:
+    """1文字 + 2文字の n-gram"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+@dataclass(frozen=True)
+class _Entry:
+    id: int
+    code: str
+    name: str
+    variety: str
+    category: Optional[str]
+    is_active: bool
+    sort_order: int
+
+
+class ItemSearchIndex:
+    """花名・品種・4桁コードの部分一致インデックス"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[int, _Entry] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._version: Optional[int] = None
+
+    def invalidate(self):
+        """ORM を経由しない書き込み後に呼ぶ"""
+        self._version = None
+
+    def _rebuild(self, db: Session):
+        rows = db.query(
+            Item.id, Item.item_code, Item.name, Item.variety,
+            Item.category, Item.is_active, Item.sort_order,
+        ).all()
+        entries: Dict[int, _Entry] = {}
+        postings: Dict[str, Set[int]] = {}
+        for r in rows:
+            entry = _Entry(
+                id=r.id,
+                code=r.item_code or "",
+                name=normalize(r.name),
+                variety=normalize(r.variety),
+                category=r.category,
+                is_active=bool(r.is_active),
+                sort_order=r.sort_order if r.sort_order is not None else 99,
+            )
+            entries[r.id] = entry
+            for field in (entry.code, entry.name, entry.variety):
+                for gram in _grams(field):
+                    postings.setdefault(gram, set()).add(r.id)
+        self._entries = entries
+        self._postings = postings
+
+    def _ensure(self, db: Session):
+        version = table_versions.get("items")
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version != version:
+                # 読み込み前のバージョンを記録し、再構築中の書き込みは次回に反映
+                self._rebuild(db)
+                self._version = version
+
+    @staticmethod
+    def _rank(entry: _Entry, q: str) -> Optional[int]:
+        """小さいほど上位。一致しなければ None"""
+        if entry.code == q:
+            return 0
+        if entry.code.startswith(q):
+            return 1
+        if entry.name == q:
+            return 2
+        if entry.name.startswith(q):
+            return 3
+        if entry.variety.startswith(q):
+            return 4
+        if q in entry.name:
+            return 5
+        if q in entry.variety:
+            return 6
+        if q in entry.code:
+            return 7
+        return None
+
+    def search(
+        self,
+        db: Session,
+        query: str,
+        limit: Optional[int] = 20,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = True,
+    ) -> List[int]:
+        """ランク順の item_id リストを返す"""
+        self._ensure(db)
+        q = normalize(query)
+        if not q:
+            return []
+
+        entries = self._entries
+        postings = self._postings
+        # 1文字ならそのまま、2文字以上は bigram の積集合（件数の少ない順）
+        grams = {q} if len(q) == 1 else {q[i:i + 2] for i in range(len(q) - 1)}
+        grams = sorted(grams, key=lambda g: len(postings.get(g, ())))
+        candidates: Optional[Set[int]] = None
+        for gram in grams:
+            ids = postings.get(gram)
+            if not ids:
+                return []
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return []
+
+        ranked = []
+        for item_id in candidates or ():
+            entry = entries.get(item_id)
+            if entry is None:
+                continue
+            if is_active is not None and entry.is_active != is_active:
+                continue
+            if category and entry.category != category:
+                continue
+            rank = self._rank(entry, q)
+            if rank is not None:
+                ranked.append((rank, entry.sort_order, entry.id))
+        ranked.sort()
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [item_id for _, _, item_id in ranked]
+
+
+item_search_index = ItemSearchIndex()
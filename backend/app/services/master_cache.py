@@ -0,0 +1,127 @@
+"""
+マスタデータ read-through キャッシュ
+- 対象: 花 / 店舗 / 卸売業者 / 資材 / 税率（設定は settings_service）
+- エントリはテーブルバージョン付き。作成/更新/削除/並び替えの commit でバージョンが
+  進むと、そのテーブルのエントリはまとめて破棄される
+- 値はセッションから切り離したスナップショット（SimpleNamespace）
+"""
+
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.services.table_versions import TableVersions, table_versions
+
+_MISSING = object()
+
+
+def _snapshot(obj) -> SimpleNamespace:
+    return SimpleNamespace(**{
+        c.key: getattr(obj, c.key) for c in obj.__mapper__.column_attrs
+    })
+
+
+class _Bucket:
+    def __init__(self, version: int):
+        self.version = version
+        self.rows: Dict[Any, Any] = {}
+        self.all: Optional[List[SimpleNamespace]] = None
+
+
+class MasterDataCache:
+    """テーブル単位でバージョン管理するマスタキャッシュ"""
+
+    def __init__(self, versions: TableVersions):
+        self._versions = versions
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, _Bucket] = {}
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+
+    def _bucket(self, table: str, version: int) -> _Bucket:
+        bucket = self._buckets.get(table)
+        if bucket is None or bucket.version != version:
+            with self._lock:
+                bucket = self._buckets.get(table)
+                if bucket is None or bucket.version != version:
+                    bucket = _Bucket(version)
+                    self._buckets[table] = bucket
+        return bucket
+
+    def _count(self, table: str, hits: int = 0, misses: int = 0):
+        with self._lock:
+            if hits:
+                self._hits[table] = self._hits.get(table, 0) + hits
+            if misses:
+                self._misses[table] = self._misses.get(table, 0) + misses
+
+    def get_by(self, db: Session, model, field: str, value) -> Optional[SimpleNamespace]:
+        """一意なカラムでの単一行取得（見つからない結果もキャッシュする）"""
+        table = model.__tablename__
+        # 読み込み前のバージョンで格納し、読み込み中の更新は次回ミスにする
+        bucket = self._bucket(table, self._versions.get(table))
+        key = (field, value)
+        cached = bucket.rows.get(key, _MISSING)
+        if cached is not _MISSING:
+            self._count(table, hits=1)
+            return cached
+        self._count(table, misses=1)
+        obj = db.query(model).filter(getattr(model, field) == value).first()
+        row = _snapshot(obj) if obj is not None else None
+        bucket.rows[key] = row
+        return row
+
+    def get(self, db: Session, model, pk: int) -> Optional[SimpleNamespace]:
+        """主キーでの単一行取得"""
+        return self.get_by(db, model, "id", pk)
+
+    def get_many(self, db: Session, model, ids: Iterable[int]) -> Dict[int, SimpleNamespace]:
+        """主キー集合での取得（未キャッシュ分は IN 1回で読み込む）"""
+        table = model.__tablename__
+        bucket = self._bucket(table, self._versions.get(table))
+        result: Dict[int, SimpleNamespace] = {}
+        missing = []
+        for pk in set(ids):
+            cached = bucket.rows.get(("id", pk), _MISSING)
+            if cached is _MISSING:
+                missing.append(pk)
+            elif cached is not None:
+                result[pk] = cached
+        self._count(table, hits=len(result), misses=len(missing))
+        if missing:
+            found = {obj.id: _snapshot(obj) for obj in db.query(model).filter(model.id.in_(missing)).all()}
+            for pk in missing:
+                bucket.rows[("id", pk)] = found.get(pk)
+            result.update(found)
+        return result
+
+    def all(self, db: Session, model) -> List[SimpleNamespace]:
+        """全行（id 順）"""
+        table = model.__tablename__
+        bucket = self._bucket(table, self._versions.get(table))
+        if bucket.all is not None:
+            self._count(table, hits=1)
+            return bucket.all
+        self._count(table, misses=1)
+        rows = [_snapshot(obj) for obj in db.query(model).order_by(model.id.asc()).all()]
+        for row in rows:
+            bucket.rows[("id", row.id)] = row
+        bucket.all = rows
+        return rows
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        tables = sorted(set(self._hits) | set(self._misses) | set(self._buckets))
+        return {
+            table: {
+                "hits": self._hits.get(table, 0),
+                "misses": self._misses.get(table, 0),
+                "version": self._versions.get(table),
+                "entries": len(self._buckets[table].rows) if table in self._buckets else 0,
+            }
+            for table in tables
+        }
+
+
+master_cache = MasterDataCache(table_versions)
@@ -0,0 +1,414 @@
+"""
+汎用集計（OLAP）
+- 仕入（arrivals）・持ち出し（transfers）・資材持ち出し（supply_transfers）・経費（expenses）を
+  「日付・店舗・花・仕入先 + 指標」の共通の形に揃えた UNION ALL をファクトとし、花マスタで分類を引く
+- 軸: date（粒度 day/week/month/quarter/year/fiscal_year）・store・item・category・supplier
+- 1 リクエスト = 1 つの GROUP BY クエリ。指標に必要なファクトだけを UNION に含め、期間条件は各ファクト側に付ける
+- 経費は月単位（期間にかかる月の全額を、その月の 1 日付けで計上）
+- 持ち出しの仕入先は持ち出し元ロットの仕入先
+- 結果は依存テーブルのバージョン付きでキャッシュ。同じ条件で軸が多い・粒度が細かい結果があれば
+  クエリせずに集約し直す（日 → 任意の粒度、月 → 四半期・年・年度、四半期 → 年）
+"""
+
+import threading
+import time as _time
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, String, and_, case, cast, func, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models.expenses import Expense
+from app.models.inventory import Arrival
+from app.models.items import Item
+from app.models.settings import Supplier
+from app.models.stores import Store
+from app.models.supplies import SupplyTransfer
+from app.models.transfers import Transfer
+from app.services.master_cache import master_cache
+from app.services.settings_service import settings_service
+from app.services.table_versions import table_versions
+
+DIMENSIONS = ("date", "store", "item", "category", "supplier")
+GRAINS = ("day", "week", "month", "quarter", "year", "fiscal_year")
+PERIODS = ("mtd", "qtd", "ytd", "fytd")
+
+# 指標 -> ファクト
+MEASURES: Dict[str, str] = {
+    "purchase_quantity": "arrivals",
+    "purchase_amount": "arrivals",
+    "sales_quantity": "transfers",
+    "sales_amount": "transfers",
+    "sales_cost": "transfers",
+    "supply_quantity": "supply_transfers",
+    "supply_amount": "supply_transfers",
+    "expense_amount": "expenses",
+}
+# 派生指標 -> (被減数, 減数)
+DERIVED: Dict[str, Tuple[str, str]] = {
+    "margin": ("sales_amount", "sales_cost"),
+}
+
+# 集約し直せる粒度（元 -> 先）
+ROLLUP_GRAINS: Dict[str, Tuple[str, ...]] = {
+    "day": GRAINS,
+    "month": ("month", "quarter", "year", "fiscal_year"),
+    "quarter": ("quarter", "year"),
+}
+
+MAX_ROWS = 20000
+CACHE_SIZE = 256
+
+
+class Query:
+    """正規化済みの集計条件"""
+
+    def __init__(
+        self, measures: Sequence[str], dimensions: Sequence[str], grain: Optional[str],
+        start: date, end: date, fiscal_year_start: int, filters: Dict[str, tuple],
+    ):
+        self.measures = tuple(measures)  # 表示する指標（派生を含む）
+        self.base = tuple(sorted({m for name in measures for m in DERIVED.get(name, (name,))}))
+        self.dimensions = tuple(d for d in DIMENSIONS if d in dimensions and d != "date")
+        self.grain = grain  # date 軸なしは None
+        self.start = start
+        self.end = end
+        self.fiscal_year_start = fiscal_year_start
+        self.filters = filters
+
+    @property
+    def sources(self) -> Tuple[str, ...]:
+        return tuple(sorted({MEASURES[m] for m in self.base}))
+
+    @property
+    def tables(self) -> Tuple[str, ...]:
+        """結果が依存するテーブル"""
+        tables = set(self.sources)
+        if "transfers" in tables and ("supplier" in self.dimensions or "supplier_id" in self.filters):
+            tables.add("arrivals")
+        if "category" in self.dimensions or "category" in self.filters:
+            tables.add("items")
+        return tuple(sorted(tables))
+
+    def scope(self) -> tuple:
+        """集約し直しが可能な範囲（期間・絞り込み・年度開始月が同じ）"""
+        fiscal = self.fiscal_year_start if self.grain == "fiscal_year" else None
+        return (self.start, self.end, tuple(sorted(self.filters.items())), fiscal)
+
+    def key(self) -> tuple:
+        return self.scope() + (self.grain, self.dimensions, self.base)
+
+
+def resolve_period(period: str, today: date, fiscal_year_start: int) -> Tuple[date, date]:
+    """mtd/qtd/ytd/fytd を [開始日, today]"""
+    if period == "mtd":
+        start = today.replace(day=1)
+    elif period == "qtd":
+        start = date(today.year, (today.month - 1) // 3 * 3 + 1, 1)
+    elif period == "ytd":
+        start = date(today.year, 1, 1)
+    elif period == "fytd":
+        year = today.year if today.month >= fiscal_year_start else today.year - 1
+        start = date(year, fiscal_year_start, 1)
+    else:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    return start, today
+
+
+def build_query(
+    db: Session,
+    measures: Sequence[str],
+    dimensions: Sequence[str] = (),
+    grain: str = "month",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    period: Optional[str] = None,
+    store_ids: Optional[Sequence[int]] = None,
+    item_ids: Optional[Sequence[int]] = None,
+    supplier_ids: Optional[Sequence[int]] = None,
+    categories: Optional[Sequence[str]] = None,
+) -> Query:
+    """リクエストを検証して Query に（不正なら ValueError）"""
+    unknown = [m for m in measures if m not in MEASURES and m not in DERIVED]
+    if not measures or unknown:
+        raise ValueError(f"measures must be chosen from {', '.join(list(MEASURES) + list(DERIVED))}")
+    unknown = [d for d in dimensions if d not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"dimensions must be chosen from {', '.join(DIMENSIONS)}")
+    if grain not in GRAINS:
+        raise ValueError(f"grain must be one of {', '.join(GRAINS)}")
+
+    fiscal_year_start = settings_service.current(db).fiscal_year_start
+    if period:
+        start, end = resolve_period(period, end or date.today(), fiscal_year_start)
+    if start is None or end is None:
+        raise ValueError("start and end (or period) are required")
+    if start > end:
+        raise ValueError("start must be on or before end")
+
+    filters = {
+        name: tuple(sorted(set(values)))
+        for name, values in (("store_id", store_ids), ("item_id", item_ids),
+                             ("supplier_id", supplier_ids), ("category", categories))
+        if values
+    }
+    return Query(
+        measures, dimensions, grain if "date" in dimensions else None,
+        start, end, fiscal_year_start, filters,
+    )
+
+
+# ========== クエリの組み立て ==========
+
+def _facts(query: Query):
+    """必要なファクトだけの UNION ALL（列: day, store_id, item_id, supplier_id, 各指標）"""
+    start, end = query.start, query.end
+    zero = literal(0)
+
+    def fact(day, store_id, item_id, supplier_id, measures: Dict[str, object]):
+        columns = [
+            cast(day, String).label("day"),
+            cast(store_id, Integer).label("store_id"),
+            cast(item_id, Integer).label("item_id"),
+            cast(supplier_id, Integer).label("supplier_id"),
+        ]
+        columns += [measures.get(m, zero).label(m) for m in query.base]
+        return columns
+
+    branches = []
+    if "arrivals" in query.sources:
+        branches.append(
+            select(*fact(func.date(Arrival.arrived_at), null(), Arrival.item_id, Arrival.supplier_id, {
+                "purchase_quantity": Arrival.quantity,
+                "purchase_amount": Arrival.quantity * func.coalesce(Arrival.wholesale_price, 0),
+            }))
+            .where(
+                Arrival.arrived_at >= datetime.combine(start, time()),
+                Arrival.arrived_at < datetime.combine(end + timedelta(days=1), time()),
+            )
+        )
+    if "transfers" in query.sources:
+        by_supplier = "supplier" in query.dimensions or "supplier_id" in query.filters
+        stmt = select(*fact(
+            Transfer.transferred_at, Transfer.store_id, Transfer.item_id,
+            Arrival.supplier_id if by_supplier else null(), {
+                "sales_quantity": Transfer.quantity,
+                "sales_amount": Transfer.quantity * Transfer.unit_price,
+                "sales_cost": Transfer.quantity * func.coalesce(Transfer.wholesale_price, 0),
+            },
+        )).where(Transfer.transferred_at.between(start, end))
+        if by_supplier:
+            stmt = stmt.outerjoin(Arrival, Arrival.id == Transfer.arrival_id)
+        branches.append(stmt)
+    if "supply_transfers" in query.sources:
+        branches.append(
+            select(*fact(SupplyTransfer.transferred_at, SupplyTransfer.store_id, null(), null(), {
+                "supply_quantity": SupplyTransfer.quantity,
+                "supply_amount": SupplyTransfer.quantity * SupplyTransfer.unit_price,
+            }))
+            .where(SupplyTransfer.transferred_at.between(start, end))
+        )
+    if "expenses" in query.sources:
+        branches.append(
+            select(*fact(Expense.year_month + "-01", Expense.store_id, null(), null(), {
+                "expense_amount": Expense.amount,
+            }))
+            .where(Expense.year_month.between(start.strftime("%Y-%m"), end.strftime("%Y-%m")))
+        )
+    return (union_all(*branches) if len(branches) > 1 else branches[0]).subquery("facts")
+
+
+def _grain_sql(grain: str, day, fiscal_year_start: int):
+    month = cast(func.strftime("%m", day), Integer)
+    if grain == "day":
+        return day
+    if grain == "week":
+        return func.date(day, "weekday 0", "-6 days")  # 月曜始まり
+    if grain == "month":
+        return func.strftime("%Y-%m", day)
+    if grain == "quarter":
+        return func.strftime("%Y", day).concat("-Q").concat(cast((month + 2) // 3, String))
+    if grain == "year":
+        return func.strftime("%Y", day)
+    year = cast(func.strftime("%Y", day), Integer)
+    return cast(year - case((month < fiscal_year_start, 1), else_=0), String)
+
+
+def compile_query(query: Query):
+    """1 つの GROUP BY クエリに（列: [period], 軸..., 指標...）"""
+    facts = _facts(query)
+    keys = []
+    if query.grain:
+        keys.append(_grain_sql(query.grain, facts.c.day, query.fiscal_year_start).label("period"))
+    for dimension in query.dimensions:
+        if dimension == "category":
+            keys.append(Item.category.label("category"))
+        else:
+            keys.append(facts.c[f"{dimension}_id"].label(f"{dimension}_id"))
+
+    stmt = select(*keys, *[func.sum(facts.c[m]).label(m) for m in query.base]).select_from(facts)
+    if "category" in query.dimensions or "category" in query.filters:
+        stmt = stmt.outerjoin(Item, Item.id == facts.c.item_id)
+    conditions = []
+    for name, values in query.filters.items():
+        column = Item.category if name == "category" else facts.c[name]
+        conditions.append(column.in_(values))
+    if conditions:
+        stmt = stmt.where(and_(*conditions))
+    if keys:
+        stmt = stmt.group_by(*keys)
+    return stmt
+
+
+# ========== 集約し直し ==========
+
+def _bucket(grain: str, source_grain: str, value, fiscal_year_start: int):
+    if value is None or grain == source_grain:
+        return value
+    if grain == "week":
+        day = date.fromisoformat(value)
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if grain == "month":
+        return value[:7]
+    if grain == "year":
+        return value[:4]
+    if grain == "quarter":
+        return f"{value[:4]}-Q{(int(value[5:7]) + 2) // 3}"
+    year, month = int(value[:4]), int(value[5:7])
+    return str(year - 1 if month < fiscal_year_start else year)
+
+
+def _can_roll_up(source: Query, target: Query) -> bool:
+    if not set(target.dimensions) <= set(source.dimensions) or not set(target.base) <= set(source.base):
+        return False
+    if target.grain is None:
+        return True
+    if source.grain is None:
+        return False
+    return target.grain == source.grain or target.grain in ROLLUP_GRAINS.get(source.grain, ())
+
+
+def roll_up(rows: List[tuple], source: Query, target: Query) -> List[tuple]:
+    """source の結果行を target の軸・粒度・指標に集約し直す"""
+    source_keys = (["period"] if source.grain else []) + list(source.dimensions)
+    positions = [source_keys.index(d) for d in target.dimensions]
+    measure_positions = [len(source_keys) + source.base.index(m) for m in target.base]
+    totals: Dict[tuple, List[float]] = {}
+    for row in rows:
+        key = tuple(row[p] for p in positions)
+        if target.grain:
+            key = (_bucket(target.grain, source.grain, row[0], target.fiscal_year_start),) + key
+        values = totals.setdefault(key, [0.0] * len(measure_positions))
+        for i, p in enumerate(measure_positions):
+            values[i] += float(row[p] or 0)
+    # 他の指標のためだけにあった行（対象の指標がすべて 0）は除く
+    narrowed = set(target.base) != set(source.base)
+    return [key + tuple(values) for key, values in totals.items() if not narrowed or any(values)]
+
+
+# ========== キャッシュと結果 ==========
+
+class OlapCache:
+    """集計結果を依存テーブルのバージョン付きで保持（LRU）"""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, Tuple[Query, Dict[str, int], List[tuple]]]" = OrderedDict()
+        self.hits = 0
+        self.rollups = 0
+        self.misses = 0
+
+    def _valid(self, versions: Dict[str, int], query: Query) -> bool:
+        return all(versions.get(t) == v for t, v in zip(query.tables, table_versions.snapshot(query.tables)))
+
+    def lookup(self, query: Query) -> Tuple[Optional[List[tuple]], str]:
+        with self._lock:
+            entry = self._entries.get(query.key())
+            if entry is not None and self._valid(entry[1], query):
+                self._entries.move_to_end(query.key())
+                self.hits += 1
+                return entry[2], "cache"
+            scope = query.scope()
+            for source, versions, rows in reversed(self._entries.values()):
+                if source.scope() == scope and _can_roll_up(source, query) and self._valid(versions, query):
+                    self.rollups += 1
+                    return roll_up(rows, source, query), "rollup"
+            self.misses += 1
+        return None, "query"
+
+    def store(self, query: Query, versions: Dict[str, int], rows: List[tuple]):
+        with self._lock:
+            self._entries[query.key()] = (query, versions, rows)
+            self._entries.move_to_end(query.key())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "rollups": self.rollups, "misses": self.misses, "entries": len(self._entries)}
+
+
+olap_cache = OlapCache()
+
+
+def _sort_key(row: tuple):
+    return tuple((value is None, value) for value in row)
+
+
+def run(db: Session, query: Query) -> dict:
+    """集計して行と合計を返す（行数が MAX_ROWS を超えたら ValueError）"""
+    started = _time.perf_counter()
+    rows, source = olap_cache.lookup(query)
+    if rows is None:
+        versions = dict(zip(query.tables, table_versions.snapshot(query.tables)))
+        rows = [tuple(row) for row in db.execute(compile_query(query))]
+        if len(rows) > MAX_ROWS:
+            raise ValueError(f"result has {len(rows)} rows (max {MAX_ROWS}); use a coarser grain or filters")
+        olap_cache.store(query, versions, rows)
+    rows = sorted(rows, key=_sort_key)
+
+    keys = (["period"] if query.grain else []) + list(query.dimensions)
+    names = {
+        "store": master_cache.get_many(db, Store, {r[keys.index("store")] for r in rows} - {None}) if "store" in keys else {},
+        "item": master_cache.get_many(db, Item, {r[keys.index("item")] for r in rows} - {None}) if "item" in keys else {},
+        "supplier": master_cache.get_many(db, Supplier, {r[keys.index("supplier")] for r in rows} - {None}) if "supplier" in keys else {},
+    }
+    totals = {m: 0.0 for m in query.base}
+    result_rows = []
+    for row in rows:
+        out = {}
+        for i, key in enumerate(keys):
+            value = row[i]
+            if key in names:
+                out[f"{key}_id"] = value
+                entry = names[key].get(value)
+                out[f"{key}_name"] = entry.name if entry is not None else None
+            else:
+                out[key] = value
+        base = {m: float(row[len(keys) + i] or 0) for i, m in enumerate(query.base)}
+        for m, value in base.items():
+            totals[m] += value
+        for m in query.measures:
+            out[m] = round(base[m] if m in base else base[DERIVED[m][0]] - base[DERIVED[m][1]], 2)
+        result_rows.append(out)
+
+    return {
+        "start": query.start.isoformat(),
+        "end": query.end.isoformat(),
+        "grain": query.grain,
+        "dimensions": (["date"] if query.grain else []) + list(query.dimensions),
+        "measures": list(query.measures),
+        "fiscal_year_start": query.fiscal_year_start,
+        "rows": result_rows,
+        "totals": {
+            m: round(totals[m] if m in totals else totals[DERIVED[m][0]] - totals[DERIVED[m][1]], 2)
+            for m in query.measures
+        },
+        "source": source,
+        "elapsed_ms": round((_time.perf_counter() - started) * 1000, 2),
+    }
@@ -0,0 +1,236 @@
+"""
+リクエスト単位のプロファイリング
+- PROFILING_TOKEN を設定したときだけ有効（未設定なら常に無効）
+- X-Profile ヘッダーまたは ?profile= にトークンを付けたリクエストをサンプリング
+- イベントループのスレッドと、エンドポイントを実行中のワーカースレッドのスタックを採取
+- 結果は folded 形式（flamegraph.pl / speedscope でそのまま読める）で直近分をメモリに保持
+- 同じリクエストで発行された SQL（sql_instrumentation の集計）を紐付ける
+"""
+
+import hmac
+import inspect
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import Header, HTTPException, Query
+
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_HISTORY = int(os.getenv("PROFILE_HISTORY", "20"))
+PROFILE_SQL_LOG_LIMIT = 500
+
+_BASE_DIRS = sorted(
+    {os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))} | {p for p in sys.path if p},
+    key=len, reverse=True,
+)
+
+
+def profiling_enabled() -> bool:
+    return bool(PROFILING_TOKEN)
+
+
+def token_matches(token: Optional[str]) -> bool:
+    return bool(PROFILING_TOKEN) and bool(token) and hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+def require_profiling_token(
+    x_profile: Optional[str] = Header(None),
+    profile: Optional[str] = Query(None),
+):
+    """プロファイル参照 API 用の依存関数"""
+    if not profiling_enabled():
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not token_matches(x_profile or profile):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+_labels: Dict[object, str] = {}
+
+
+def _frame_label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for base in _BASE_DIRS:
+            if filename.startswith(base + os.sep):
+                filename = filename[len(base) + 1:]
+                break
+        # folded 形式の区切り文字を含めない
+        label = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+        _labels[code] = label
+    return label
+
+
+def _stack(frame) -> List:
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+    return codes
+
+
+def _idle(codes) -> bool:
+    """イベントループが次のイベント待ち（selector 内）なら採取しない"""
+    leaf = codes[-1]
+    return leaf.co_name == "select" and leaf.co_filename.endswith("selectors.py")
+
+
+class Profile:
+    """1リクエスト分のプロファイル結果"""
+
+    def __init__(self, method: str, path: str, query: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.query = query
+        self.route = path
+        self.status: Optional[int] = None
+        self.started_at = datetime.now()
+        self.duration_ms = 0.0
+        self.samples = 0
+        self.interval_ms = PROFILE_INTERVAL_MS
+        self.stacks: Dict[str, int] = {}
+        self.query_count = 0
+        self.query_ms = 0.0
+        self.sql: List[dict] = []
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 2),
+            "samples": self.samples,
+            "interval_ms": self.interval_ms,
+            "query_count": self.query_count,
+            "query_ms": round(self.query_ms, 2),
+        }
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def as_dict(self, top: int = 30) -> dict:
+        # 末端（自己時間）の多い関数
+        self_counts: Dict[str, int] = {}
+        for stack, count in self.stacks.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            self_counts[leaf] = self_counts.get(leaf, 0) + count
+        hottest = sorted(self_counts.items(), key=lambda x: -x[1])[:top]
+        return {
+            **self.summary(),
+            "query": self.query,
+            "hot_functions": [
+                {"function": name, "samples": count,
+                 "ratio": round(count / self.samples, 4) if self.samples else None}
+                for name, count in hottest
+            ],
+            "sql": self.sql,
+        }
+
+    def attach_sql(self, stats):
+        """RequestStats の内容を同一 SQL ごとにまとめて保持"""
+        if stats is None:
+            return
+        self.route = stats.route
+        self.query_count = stats.query_count
+        self.query_ms = stats.query_seconds * 1000
+        grouped: "OrderedDict[str, dict]" = OrderedDict()
+        for statement, seconds in stats.log[:PROFILE_SQL_LOG_LIMIT]:
+            entry = grouped.get(statement)
+            if entry is None:
+                entry = grouped[statement] = {"sql": " ".join(statement.split()), "count": 0, "total_ms": 0.0}
+            entry["count"] += 1
+            entry["total_ms"] += seconds * 1000
+        self.sql = [
+            {**entry, "total_ms": round(entry["total_ms"], 3)}
+            for entry in sorted(grouped.values(), key=lambda e: -e["total_ms"])
+        ]
+
+
+class Sampler:
+    """別スレッドから対象スレッドのスタックを一定間隔で採取"""
+
+    def __init__(self, profile: Profile, scope, loop_thread_id: int):
+        self.profile = profile
+        self.scope = scope
+        self.loop_thread_id = loop_thread_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{profile.id}", daemon=True)
+        self._endpoint_code = None
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _endpoint(self):
+        """ルーティング後に scope["route"] からエンドポイントのコードを取得"""
+        if self._endpoint_code is None:
+            endpoint = getattr(self.scope.get("route"), "endpoint", None)
+            if endpoint is not None:
+                self._endpoint_code = getattr(inspect.unwrap(endpoint), "__code__", None)
+        return self._endpoint_code
+
+    def _run(self):
+        interval = self.profile.interval_ms / 1000
+        deadline = time.monotonic() + PROFILE_MAX_SECONDS
+        own_id = threading.get_ident()
+        stacks = self.profile.stacks
+        while not self._stop.wait(interval) and time.monotonic() < deadline:
+            endpoint_code = self._endpoint()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                codes = _stack(frame)
+                if thread_id == self.loop_thread_id:
+                    if _idle(codes):
+                        continue
+                    root = "event-loop"
+                elif endpoint_code is not None and endpoint_code in codes:
+                    # ワーカースレッドはエンドポイント以下だけを残す
+                    codes = codes[codes.index(endpoint_code):]
+                    root = "worker"
+                else:
+                    continue
+                key = root + ";" + ";".join(_frame_label(code) for code in codes)
+                stacks[key] = stacks.get(key, 0) + 1
+                self.profile.samples += 1
+
+
+class ProfileStore:
+    """直近 PROFILE_HISTORY 件のプロファイル"""
+
+    def __init__(self, max_entries: int = PROFILE_HISTORY):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[Profile]:
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+
+profile_store = ProfileStore()
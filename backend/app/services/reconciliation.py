@@ -0,0 +1,194 @@
+"""
+在庫照合
+- 期待値は在庫台帳（stock_movements）から集計: 品目 = 台帳の合計、ロット = arrival_id ごとの合計
+- inventory.quantity / arrivals.remaining_quantity と突き合わせ、差分を報告（fix=True で修正）
+- 集計は GROUP BY でまとめて行い、差分のあった対象だけもう一度確認する（照合中の登録による誤検知を除く）
+- 増分: 前回の watermark（照合済みの台帳 ID）より後に動いた品目・ロットだけを照合
+- 全件: 全品目・全ロットに加え、台帳と元テーブル（入荷・持ち出し・廃棄・調整）の合計も突き合わせる
+"""
+
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, union_all, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.inventory import Arrival, Disposal, Inventory, InventoryAdjustment, StockMovement
+from app.models.logs import ErrorAlert, ReconciliationRun
+from app.models.transfers import Transfer
+from app.services import stock_ledger
+from app.services.events import emit
+
+RECONCILE_INTERVAL_HOURS = float(os.getenv("RECONCILE_INTERVAL_HOURS", "24"))
+RECONCILE_AUTO_FIX = os.getenv("RECONCILE_AUTO_FIX", "0") == "1"
+
+MAX_DRIFT_DETAILS = 500
+
+
+def last_watermark(db: Session) -> int:
+    return db.scalar(select(func.max(ReconciliationRun.watermark))) or 0
+
+
+def _item_drift(db: Session, item_ids: Optional[List[int]]) -> Tuple[int, List[dict]]:
+    expected = stock_ledger.quantities_at(db, None, item_ids)
+    query = select(Inventory.item_id, func.sum(Inventory.quantity)).group_by(Inventory.item_id)
+    if item_ids is not None:
+        query = query.where(Inventory.item_id.in_(item_ids))
+    stored = {item_id: int(quantity or 0) for item_id, quantity in db.execute(query)}
+
+    keys = set(item_ids) if item_ids is not None else set(expected) | set(stored)
+    drift = []
+    for item_id in sorted(keys):
+        want = expected.get(item_id, 0)
+        have = stored.get(item_id)
+        if (have or 0) != want:
+            drift.append({"kind": "item", "item_id": item_id, "stored": have, "expected": want,
+                          "diff": want - (have or 0)})
+    return len(keys), drift
+
+
+def _lot_drift(db: Session, arrival_ids: Optional[List[int]]) -> Tuple[int, List[dict]]:
+    expected_query = (
+        select(StockMovement.arrival_id, func.sum(StockMovement.quantity))
+        .where(StockMovement.arrival_id.isnot(None))
+        .group_by(StockMovement.arrival_id)
+    )
+    stored_query = select(
+        Arrival.id, Arrival.item_id, func.coalesce(Arrival.remaining_quantity, Arrival.quantity),
+    )
+    if arrival_ids is not None:
+        expected_query = expected_query.where(StockMovement.arrival_id.in_(arrival_ids))
+        stored_query = stored_query.where(Arrival.id.in_(arrival_ids))
+    # 廃棄は残数を 0 で止めるので期待値も 0 未満にしない
+    expected = {arrival_id: max(0, int(total)) for arrival_id, total in db.execute(expected_query)}
+
+    checked = 0
+    drift = []
+    for arrival_id, item_id, have in db.execute(stored_query):
+        if arrival_id not in expected:
+            continue  # 台帳にないロットは全件照合の ledger 差分で報告
+        checked += 1
+        want = expected[arrival_id]
+        if have != want:
+            drift.append({"kind": "lot", "arrival_id": arrival_id, "item_id": item_id,
+                          "stored": have, "expected": want, "diff": want - have})
+    return checked, drift
+
+
+def _ledger_drift(db: Session) -> List[dict]:
+    """元テーブルの合計と台帳の合計を品目ごとに比較"""
+    sources = union_all(
+        select(Arrival.item_id, Arrival.quantity.label("quantity")),
+        select(Transfer.item_id, (-Transfer.quantity).label("quantity")),
+        select(Disposal.item_id, (-Disposal.quantity).label("quantity")),
+        select(InventoryAdjustment.item_id, InventoryAdjustment.quantity.label("quantity")),
+    ).subquery()
+    expected = {
+        item_id: int(total) for item_id, total in db.execute(
+            select(sources.c.item_id, func.sum(sources.c.quantity)).group_by(sources.c.item_id)
+        )
+    }
+    recorded = {
+        item_id: int(total) for item_id, total in db.execute(
+            select(StockMovement.item_id, func.sum(StockMovement.quantity)).group_by(StockMovement.item_id)
+        )
+    }
+    drift = []
+    for item_id in sorted(set(expected) | set(recorded)):
+        want = expected.get(item_id, 0)
+        have = recorded.get(item_id, 0)
+        if have != want:
+            drift.append({"kind": "ledger", "item_id": item_id, "stored": have, "expected": want,
+                          "diff": want - have})
+    return drift
+
+
+def _apply(db: Session, drift: List[dict]) -> int:
+    """品目在庫・ロット残数を期待値に合わせる（照合後の登録を消さないよう差分で加算）"""
+    fixed = 0
+    for row in drift:
+        if row["kind"] == "item":
+            if row["stored"] is None:
+                db.add(Inventory(item_id=row["item_id"], quantity=row["expected"]))
+            else:
+                db.execute(
+                    update(Inventory)
+                    .where(Inventory.item_id == row["item_id"])
+                    .values(quantity=Inventory.quantity + row["diff"])
+                )
+            emit(db, "inventory", item_id=row["item_id"], quantity=row["expected"], delta=row["diff"])
+            fixed += 1
+        elif row["kind"] == "lot":
+            db.execute(
+                update(Arrival)
+                .where(Arrival.id == row["arrival_id"])
+                .values(remaining_quantity=func.coalesce(Arrival.remaining_quantity, Arrival.quantity) + row["diff"])
+            )
+            emit(db, "lot", arrival_id=row["arrival_id"], item_id=row["item_id"],
+                 remaining_quantity=row["expected"])
+            fixed += 1
+    return fixed
+
+
+def reconcile(db: Session, full: bool = False, fix: bool = False) -> ReconciliationRun:
+    """照合を実行して記録を返す（commit は呼び出し側）"""
+    started = time.perf_counter()
+    watermark = db.scalar(select(func.max(StockMovement.id))) or 0
+
+    if full:
+        item_ids = lot_ids = None
+    else:
+        moved = db.execute(
+            select(StockMovement.item_id, StockMovement.arrival_id)
+            .where(StockMovement.id > last_watermark(db), StockMovement.id <= watermark)
+            .distinct()
+        ).all()
+        item_ids = sorted({item_id for item_id, _ in moved})
+        lot_ids = sorted({arrival_id for _, arrival_id in moved if arrival_id is not None})
+
+    items_checked, item_drift = _item_drift(db, item_ids) if item_ids != [] else (0, [])
+    lots_checked, lot_drift = _lot_drift(db, lot_ids) if lot_ids != [] else (0, [])
+    # 照合中に登録された分による誤検知を除くため、差分のあった対象だけ再確認
+    if item_drift:
+        _, item_drift = _item_drift(db, [row["item_id"] for row in item_drift])
+    if lot_drift:
+        _, lot_drift = _lot_drift(db, [row["arrival_id"] for row in lot_drift])
+    drift = item_drift + lot_drift + (_ledger_drift(db) if full else [])
+
+    if fix:
+        _apply(db, drift)
+
+    run = ReconciliationRun(
+        mode="full" if full else "incremental",
+        watermark=watermark,
+        items_checked=items_checked,
+        lots_checked=lots_checked,
+        drift_count=len(drift),
+        fixed=fix and bool(drift),
+        drift=drift[:MAX_DRIFT_DETAILS],
+        duration_ms=int((time.perf_counter() - started) * 1000),
+    )
+    db.add(run)
+    db.flush()
+    unfixed = [row for row in drift if not fix or row["kind"] == "ledger"]
+    if unfixed:
+        db.add(ErrorAlert(
+            type="inventory_drift",
+            message=f"在庫の不整合 {len(unfixed)} 件（照合 #{run.id}）",
+            detail={"reconciliation_run_id": run.id, "drift": unfixed[:20]},
+            status="pending",
+        ))
+    return run
+
+
+def run_reconcile_job() -> Dict[str, int]:
+    """定期ジョブ: 増分照合（RECONCILE_AUTO_FIX=1 で自動修正）"""
+    db = SessionLocal()
+    try:
+        run = reconcile(db, fix=RECONCILE_AUTO_FIX)
+        db.commit()
+        return {"run_id": run.id, "drift": run.drift_count, "duration_ms": run.duration_ms}
+    finally:
+        db.close()
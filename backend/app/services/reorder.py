@@ -0,0 +1,45 @@
+"""
+表示順の一括更新（花・資材・店舗・卸売業者で共通）
+- ID の存在確認は 1 回の SELECT、更新は UPDATE ... SET sort_order = CASE id WHEN ... END の 1 文
+  （件数が多いときは、バインド変数が DB の上限に収まる件数ごとに分割して同じことをする）
+- 一括 UPDATE なのでテーブルバージョンは commit 時に 1 回だけ進む（マスタ・検索・集計キャッシュの無効化も 1 回）
+- 存在しない ID は更新せず、missing として返す
+"""
+
+from typing import Iterable, List
+
+from sqlalchemy import case, select, update
+from sqlalchemy.orm import Session
+
+# 読み込み済みのオブジェクトは同期しない
+_NO_SYNC = {"synchronize_session": False}
+
+
+def _chunk_size(db: Session) -> int:
+    """1 文に入れる ID の数（ID ごとに IN で 1 つ、CASE の WHEN / THEN で 2 つのバインド変数）"""
+    limit = db.get_bind().dialect.insertmanyvalues_max_parameters
+    return max((limit - 1) // 3, 1)
+
+
+def apply_sort_order(db: Session, model, items: Iterable) -> dict:
+    """items（id, sort_order を持つ）の表示順を反映（commit は呼び出し側）"""
+    orders = {item.id: item.sort_order for item in items}  # 同じ ID は後のものを採用
+    ids = list(orders)
+    size = _chunk_size(db)
+
+    updated = 0
+    missing: List[int] = []
+    for start in range(0, len(ids), size):
+        chunk = ids[start:start + size]
+        existing = set(db.scalars(select(model.id).where(model.id.in_(chunk))))
+        missing.extend(i for i in chunk if i not in existing)
+        targets = [i for i in chunk if i in existing]
+        if not targets:
+            continue
+        updated += db.execute(
+            update(model)
+            .where(model.id.in_(targets))
+            .values(sort_order=case({i: orders[i] for i in targets}, value=model.id))
+            .execution_options(**_NO_SYNC)
+        ).rowcount
+    return {"updated": updated, "missing": missing}
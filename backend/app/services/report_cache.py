@@ -0,0 +1,138 @@
+"""
+締めた期間のレポート結果キャッシュ
+- 対象期間が先月以前のレポート（店舗別・仕入先別・月間 P&L・運賃明細）は、結果を report_cache に保存して再利用
+  当月を含む期間は毎回集計する
+- 保存は別の短いセッションで行い、リクエストのセッション（トランザクション）には触れない
+- 無効化は書き込みと同じトランザクションで（data_changes から）。書き込まれた日を期間に含み、
+  依存テーブルと店舗・仕入先の絞り込みが一致するエントリだけを削除（過去日付の登録にも追従）
+- 依存テーブルのうち店舗で絞り込めるもの（P&L の経費・資材）は、その店舗への書き込みだけで無効化
+"""
+
+import json
+import threading
+from datetime import date
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.reports import ReportCache
+
+# レポート -> 依存テーブル
+REPORTS = {
+    "store-summary": ("transfers", "stores"),
+    "supplier-summary": ("arrivals", "suppliers"),
+    "monthly-pl": ("arrivals", "transfers", "expenses", "supply_transfers", "stores"),
+    "shipping-costs": ("expenses", "stores"),
+}
+# store_id 指定時にその店舗で絞り込まれるテーブル
+STORE_SCOPED = {
+    "monthly-pl": ("expenses", "supply_transfers"),
+}
+
+
+class ReportCacheStats:
+    """プロセス内の利用状況"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.live = 0  # 当月を含むため保存しなかった
+        self.invalidated = 0
+
+    def add(self, name: str, count: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + count)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "live": self.live, "invalidated": self.invalidated}
+
+
+report_cache_stats = ReportCacheStats()
+
+
+def _dependencies(report: str, params: dict) -> Dict[str, Optional[dict]]:
+    store_id = params.get("store_id")
+    scoped = STORE_SCOPED.get(report, ())
+    return {
+        table: {"store_id": store_id} if store_id and table in scoped else None
+        for table in REPORTS[report]
+    }
+
+
+def cached(
+    db: Session, report: str, params: dict, start: date, end: date, compute: Callable[[], dict],
+    today: Optional[date] = None,
+) -> dict:
+    """[start, end) が先月以前なら保存済みの結果を返す（なければ compute して保存）"""
+    today = today or date.today()
+    if end > today.replace(day=1):
+        report_cache_stats.add("live")
+        return compute()
+
+    key = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    payload = db.scalar(select(ReportCache.payload).where(ReportCache.report == report, ReportCache.params == key))
+    if payload is not None:
+        report_cache_stats.add("hits")
+        return payload
+
+    report_cache_stats.add("misses")
+    result = compute()
+    _save(report, key, start, end, params, result)
+    # JSON に保存した形（日付は文字列）に揃える
+    return json.loads(json.dumps(result, default=str))
+
+
+def _save(report: str, key: str, start: date, end: date, params: dict, result: dict):
+    """自前のセッションで保存して commit"""
+    session = SessionLocal()
+    try:
+        session.add(ReportCache(
+            report=report, params=key, period_start=start, period_end=end,
+            dependencies=_dependencies(report, params), payload=result,
+        ))
+        session.commit()
+    except IntegrityError:
+        session.rollback()  # 同時に保存された
+    finally:
+        session.close()
+
+
+def _matches(scope: Optional[dict], change) -> bool:
+    if not scope:
+        return True
+    return all(getattr(change, key) is None or getattr(change, key) == value for key, value in scope.items())
+
+
+def record_changes(connection, changes):
+    """data_changes から: 書き込みの影響を受けるエントリを同じトランザクションで削除"""
+    changes = [change for change in changes if any(change.table in tables for tables in REPORTS.values())]
+    if not changes:
+        return
+    days = {change.day for change in changes}
+    stmt = select(ReportCache.id, ReportCache.period_start, ReportCache.period_end, ReportCache.dependencies)
+    if None not in days:
+        stmt = stmt.where(or_(*(
+            (ReportCache.period_start <= day) & (ReportCache.period_end > day) for day in days
+        )))
+    stale = [
+        entry_id
+        for entry_id, start, end, dependencies in connection.execute(stmt)
+        if any(
+            change.table in dependencies
+            and (change.day is None or start <= change.day < end)
+            and _matches(dependencies[change.table], change)
+            for change in changes
+        )
+    ]
+    if stale:
+        connection.execute(delete(ReportCache).where(ReportCache.id.in_(stale)))
+        report_cache_stats.add("invalidated", len(stale))
+
+
+def clear(db: Session) -> int:
+    """全エントリを削除（commit は呼び出し側）"""
+    return db.execute(delete(ReportCache)).rowcount
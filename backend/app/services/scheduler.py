@@ -0,0 +1,93 @@
+"""
+定期ジョブ
+- lifespan で start() / stop() する。ジョブはスレッドプールで実行（同期 DB 処理のため）
+- 各ジョブは自前でセッションを開く。失敗してもログを出して次回に持ち越す
+- SCHEDULER_ENABLED=0 で無効化（テスト・複数ワーカー運用時など）
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") != "0"
+
+
+@dataclass
+class Job:
+    name: str
+    interval: float  # 秒
+    func: Callable[[], object]
+    initial_delay: float = 0
+    last_run: Optional[float] = None
+    last_duration: Optional[float] = None
+    last_result: object = None
+    last_error: Optional[str] = None
+    runs: int = 0
+    failures: int = 0
+
+
+@dataclass
+class Scheduler:
+    jobs: Dict[str, Job] = field(default_factory=dict)
+    _tasks: List[asyncio.Task] = field(default_factory=list)
+
+    def every(self, name: str, seconds: float, func: Callable[[], object], initial_delay: float = 0):
+        """seconds ごとに func を実行するジョブを登録"""
+        self.jobs[name] = Job(name, seconds, func, initial_delay)
+
+    async def run(self, name: str):
+        """ジョブを 1 回実行（手動実行にも使う）"""
+        job = self.jobs[name]
+        started = time.perf_counter()
+        try:
+            job.last_result = await run_in_threadpool(job.func)
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            print(f"[WARN] scheduled job {name} failed: {e}")
+        finally:
+            job.runs += 1
+            job.last_run = time.time()
+            job.last_duration = time.perf_counter() - started
+        return job.last_result
+
+    async def _loop(self, job: Job):
+        await asyncio.sleep(job.initial_delay)
+        while True:
+            await self.run(job.name)
+            await asyncio.sleep(job.interval)
+
+    def start(self):
+        if not SCHEDULER_ENABLED:
+            return
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._loop(job)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "name": job.name,
+                "interval_seconds": job.interval,
+                "runs": job.runs,
+                "failures": job.failures,
+                "last_run": job.last_run,
+                "last_duration_ms": round(job.last_duration * 1000, 1) if job.last_duration is not None else None,
+                "last_result": job.last_result,
+                "last_error": job.last_error,
+            }
+            for job in self.jobs.values()
+        ]
+
+
+scheduler = Scheduler()
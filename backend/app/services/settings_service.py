@@ -0,0 +1,152 @@
+"""
+設定サービス
+- settings テーブルを一度に読み込み、型変換・検証済みのスナップショットとして保持
+- settings のバージョンが進んだ時（update_setting 等）にまとめて再読み込みし、参照を差し替える
+- 丸め関数・請求書番号フォーマッタは読み込み時に用意する
+"""
+
+import math
+import threading
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.settings import Setting
+from app.services.table_versions import table_versions
+
+ROUNDING_FUNCTIONS: Dict[str, Callable[[float], int]] = {
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "round": round,
+}
+
+
+def _parse_rate(value: str) -> Decimal:
+    try:
+        rate = Decimal(value)
+    except InvalidOperation:
+        raise ValueError("税率は数値で指定してください（例: 0.10）")
+    if not Decimal(0) <= rate < Decimal(1):
+        raise ValueError("税率は 0 以上 1 未満で指定してください")
+    return rate
+
+
+def _parse_choice(*choices: str) -> Callable[[str], str]:
+    def parse(value: str) -> str:
+        if value not in choices:
+            raise ValueError(f"{'/'.join(choices)} のいずれかを指定してください")
+        return value
+    return parse
+
+
+def _parse_int(minimum: int, maximum: int) -> Callable[[str], int]:
+    def parse(value: str) -> int:
+        try:
+            number = int(value)
+        except ValueError:
+            raise ValueError("整数で指定してください")
+        if not minimum <= number <= maximum:
+            raise ValueError(f"{minimum}〜{maximum} の範囲で指定してください")
+        return number
+    return parse
+
+
+def _parse_invoice_number_format(value: str) -> str:
+    try:
+        value.format(year=2024, month=1, day=1, seq=1)
+    except (KeyError, IndexError, ValueError, AttributeError) as e:
+        raise ValueError(f"請求書番号形式が不正です: {e}")
+    return value
+
+
+# key -> (パーサ, 既定値)
+SETTING_SCHEMA: Dict[str, Tuple[Callable[[str], object], str]] = {
+    "tax_rate": (_parse_rate, "0.10"),
+    "tax_rate_reduced": (_parse_rate, "0.08"),
+    "tax_rounding": (_parse_choice(*ROUNDING_FUNCTIONS), "floor"),
+    "tax_calculation": (_parse_choice("per_item", "total"), "per_item"),
+    "inventory_alert_days": (_parse_int(1, 365), "5"),
+    "backup_retention_days": (_parse_int(1, 3650), "30"),
+    "invoice_number_format": (_parse_invoice_number_format, "{year}-{month:02d}-{day:02d}-{seq:03d}"),
+    "fiscal_year_start": (_parse_int(1, 12), "4"),
+}
+
+
+def validate_setting(key: str, value: str):
+    """値を検証（不正なら ValueError）"""
+    schema = SETTING_SCHEMA.get(key)
+    if schema:
+        schema[0](value)
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """型変換済みの設定値"""
+    version: int
+    tax_rate: Decimal
+    tax_rate_reduced: Decimal
+    tax_rounding: str
+    round_tax: Callable[[float], int]
+    tax_calculation: str
+    inventory_alert_days: int
+    backup_retention_days: int
+    invoice_number_format: str
+    fiscal_year_start: int
+    raw: Mapping[str, str]
+
+    def format_invoice_number(self, period_end: date, seq: int) -> str:
+        return self.invoice_number_format.format(
+            year=period_end.year,
+            month=period_end.month,
+            day=period_end.day,
+            seq=seq,
+        )
+
+
+def _build_snapshot(raw: Dict[str, str], version: int) -> SettingsSnapshot:
+    values = {}
+    for key, (parse, default) in SETTING_SCHEMA.items():
+        try:
+            values[key] = parse(raw.get(key, default))
+        except ValueError as e:
+            print(f"[WARN] Invalid setting {key}={raw.get(key)!r}: {e} (using default)")
+            values[key] = parse(default)
+    return SettingsSnapshot(
+        version=version,
+        round_tax=ROUNDING_FUNCTIONS[values["tax_rounding"]],
+        raw=MappingProxyType(dict(raw)),
+        **values,
+    )
+
+
+class SettingsService:
+    """設定スナップショットの保持と再読み込み"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[SettingsSnapshot] = None
+
+    def current(self, db: Session) -> SettingsSnapshot:
+        """最新のスナップショット（settings が変わっていれば再読み込み）"""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == table_versions.get("settings"):
+            return snapshot
+        return self.reload(db)
+
+    def reload(self, db: Session) -> SettingsSnapshot:
+        with self._lock:
+            version = table_versions.get("settings")
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == version:
+                return snapshot
+            raw = {s.key: s.value for s in db.query(Setting.key, Setting.value).all()}
+            snapshot = _build_snapshot(raw, version)
+            self._snapshot = snapshot
+            return snapshot
+
+
+settings_service = SettingsService()
@@ -0,0 +1,96 @@
+"""
+SQL 計測
+- エンジンの cursor 実行イベントで実行時間を計測
+- リクエスト単位でクエリ数・同一 SQL の繰り返し（N+1 の疑い）を集計
+- 閾値を超えた SQL はパラメータ付きでログ出力
+"""
+
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.services.metrics import registry
+
+logger = logging.getLogger("app.sql")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+query_duration = registry.histogram(
+    "db_query_duration_seconds", "SQL statement execution time",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+slow_queries = registry.counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ["route"])
+n_plus_one = registry.counter("db_n_plus_one_total", "Requests repeating one statement N_PLUS_ONE_THRESHOLD+ times", ["route"])
+
+
+class RequestStats:
+    """1リクエスト中の SQL 集計"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.route = path
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.statements: Dict[str, int] = {}
+        self.log: List[Tuple[str, float]] = []
+
+    def record(self, statement: str, seconds: float):
+        self.query_count += 1
+        self.query_seconds += seconds
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+        self.log.append((statement, seconds))
+
+    def repeated_statements(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        return sorted(
+            ((s, n) for s, n in self.statements.items() if n >= threshold),
+            key=lambda x: -x[1],
+        )
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def _truncate(value, limit: int = 500) -> str:
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def install(engine):
+    """エンジンに計測フックを登録"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        query_duration.observe(elapsed)
+        stats = current_request.get()
+        if stats is not None:
+            stats.record(statement, elapsed)
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            route = stats.route if stats is not None else "-"
+            slow_queries.inc(route)
+            logger.warning(
+                "slow query %.1fms route=%s sql=%s params=%s",
+                elapsed * 1000, route, " ".join(statement.split()), _truncate(parameters),
+            )
+
+
+def finish_request(stats: RequestStats):
+    """リクエスト終了時の N+1 判定"""
+    repeated = stats.repeated_statements()
+    if repeated:
+        n_plus_one.inc(stats.route)
+        statement, count = repeated[0]
+        logger.warning(
+            "possible N+1 route=%s queries=%d repeated=%dx sql=%s",
+            stats.route, stats.query_count, count, " ".join(statement.split())[:300],
+        )
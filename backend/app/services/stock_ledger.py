@@ -0,0 +1,264 @@
+"""
+在庫台帳（stock_movements）とスナップショット
+- 入荷・CSV取込・持ち出し・廃棄・調整は record() で符号付きの増減を追記する
+- 任意時点の在庫 = その時点以前で最も新しいスナップショット + それ以降の増減の合計
+- スナップショットは定期ジョブで日単位に作成（前回以降に増減のあった品目のみ）
+- 過去日付の増減を記録したときは、その時点以降のスナップショットを破棄する
+- record() は在庫評価（valuation）も合わせて更新する
+"""
+
+import os
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.inventory import (
+    Arrival, Disposal, InventoryAdjustment, InventorySnapshot, StockMovement,
+)
+from app.models.transfers import Transfer
+from app.services import valuation
+
+MOVEMENT_TYPES = ("arrival", "import", "transfer", "disposal", "adjustment")
+
+_BATCH_SIZE = 5000
+
+STOCK_SNAPSHOT_INTERVAL_HOURS = float(os.getenv("STOCK_SNAPSHOT_INTERVAL_HOURS", "6"))
+
+
+def transfer_occurred_at(transferred_at: date, recorded_at: Optional[datetime] = None) -> Optional[datetime]:
+    """持ち出し日（日付のみ）を台帳の時刻へ。過去日付はその日の終わり、当日以降は記録時刻（None はDB の現在時刻）"""
+    today = recorded_at.date() if recorded_at else date.today()
+    if transferred_at < today:
+        return datetime.combine(transferred_at, time(23, 59, 59))
+    return recorded_at
+
+
+def record(
+    db: Session,
+    item_id: int,
+    movement_type: str,
+    quantity: int,
+    occurred_at: Optional[datetime] = None,
+    arrival: Optional[Arrival] = None,
+    arrival_id: Optional[int] = None,
+    store_id: Optional[int] = None,
+    source_id: Optional[int] = None,
+    invalidate: bool = True,
+    unit_cost=None,
+    valuate: bool = True,
+) -> StockMovement:
+    """増減を台帳に追記し在庫評価に反映（commit は呼び出し側）。unit_cost は入庫の単価（省略時は arrival の入荷単価）。
+    一括登録では invalidate=False にして最後に invalidate_snapshots()、valuate=False なら評価は呼び出し側でまとめて反映"""
+    movement = StockMovement(
+        item_id=item_id,
+        movement_type=movement_type,
+        quantity=quantity,
+        arrival_id=arrival_id,
+        store_id=store_id,
+        source_id=source_id,
+        occurred_at=occurred_at,
+    )
+    if arrival is not None:
+        movement.arrival = arrival
+    db.add(movement)
+    if invalidate and occurred_at is not None:
+        invalidate_snapshots(db, [item_id], occurred_at)
+    if valuate:
+        if unit_cost is None and arrival is not None:
+            unit_cost = arrival.wholesale_price
+        valuation.apply(db, item_id, movement_type, quantity, occurred_at or db_now(db), unit_cost)
+    return movement
+
+
+def invalidate_snapshots(db: Session, item_ids: Iterable[int], since: datetime):
+    """過去日付の増減で古くなったスナップショットを破棄"""
+    ids = list(set(item_ids))
+    if ids:
+        db.execute(
+            delete(InventorySnapshot).where(
+                InventorySnapshot.item_id.in_(ids),
+                InventorySnapshot.as_of >= since,
+            )
+        )
+
+
+def db_now(db: Session) -> datetime:
+    """DB の現在時刻（server_default と同じ時計）"""
+    return db.scalar(select(func.now()))
+
+
+def quantities_at(
+    db: Session, at: Optional[datetime] = None, item_ids: Optional[Iterable[int]] = None,
+) -> Dict[int, int]:
+    """時点 at（None は現在）の品目別在庫"""
+    ids = list(item_ids) if item_ids is not None else None
+
+    latest = select(
+        InventorySnapshot.item_id, func.max(InventorySnapshot.as_of).label("as_of"),
+    ).group_by(InventorySnapshot.item_id)
+    if at is not None:
+        latest = latest.where(InventorySnapshot.as_of <= at)
+    if ids is not None:
+        latest = latest.where(InventorySnapshot.item_id.in_(ids))
+    latest = latest.subquery()
+
+    result: Dict[int, int] = {}
+    for item_id, quantity in db.execute(
+        select(InventorySnapshot.item_id, InventorySnapshot.quantity).join(
+            latest,
+            and_(InventorySnapshot.item_id == latest.c.item_id, InventorySnapshot.as_of == latest.c.as_of),
+        )
+    ):
+        result[item_id] = quantity
+
+    replay = (
+        select(StockMovement.item_id, func.sum(StockMovement.quantity))
+        .outerjoin(latest, StockMovement.item_id == latest.c.item_id)
+        .where(or_(latest.c.as_of.is_(None), StockMovement.occurred_at > latest.c.as_of))
+        .group_by(StockMovement.item_id)
+    )
+    if at is not None:
+        replay = replay.where(StockMovement.occurred_at <= at)
+    if ids is not None:
+        replay = replay.where(StockMovement.item_id.in_(ids))
+    for item_id, delta in db.execute(replay):
+        result[item_id] = result.get(item_id, 0) + int(delta or 0)
+    return result
+
+
+def stock_at(db: Session, item_id: int, at: Optional[datetime] = None) -> int:
+    """品目 1 件の時点在庫"""
+    return quantities_at(db, at, [item_id]).get(item_id, 0)
+
+
+def take_snapshots(db: Session, as_of: Optional[datetime] = None) -> int:
+    """as_of（省略時は DB の当日 0 時）時点のスナップショットを作成。作成件数を返す"""
+    if as_of is None:
+        as_of = datetime.combine(db_now(db).date(), time())
+
+    latest = (
+        select(InventorySnapshot.item_id, func.max(InventorySnapshot.as_of).label("as_of"))
+        .where(InventorySnapshot.as_of <= as_of)
+        .group_by(InventorySnapshot.item_id)
+        .subquery()
+    )
+    # 前回スナップショット以降に増減のあった品目だけ作り直す
+    changed = [
+        item_id for (item_id,) in db.execute(
+            select(StockMovement.item_id)
+            .outerjoin(latest, StockMovement.item_id == latest.c.item_id)
+            .where(
+                StockMovement.occurred_at <= as_of,
+                or_(latest.c.as_of.is_(None), StockMovement.occurred_at > latest.c.as_of),
+            )
+            .distinct()
+        )
+    ]
+    if not changed:
+        return 0
+
+    quantities = quantities_at(db, as_of, changed)
+    db.execute(
+        delete(InventorySnapshot).where(
+            InventorySnapshot.as_of == as_of, InventorySnapshot.item_id.in_(changed),
+        )
+    )
+    db.execute(insert(InventorySnapshot), [
+        {"item_id": item_id, "as_of": as_of, "quantity": quantities.get(item_id, 0)}
+        for item_id in changed
+    ])
+    return len(changed)
+
+
+def run_snapshot_job() -> int:
+    """定期ジョブ: 当日 0 時のスナップショットを作成"""
+    db = SessionLocal()
+    try:
+        created = take_snapshots(db)
+        db.commit()
+        return created
+    finally:
+        db.close()
+
+
+def _source_movements(db: Session):
+    """既存の入荷・持ち出し・廃棄・調整から台帳行を作る（backfill 用）"""
+    for arrival_id, item_id, quantity, arrived_at, source_type in db.execute(
+        select(Arrival.id, Arrival.item_id, Arrival.quantity, Arrival.arrived_at, Arrival.source_type)
+    ).all():
+        yield {
+            "item_id": item_id, "quantity": quantity, "arrival_id": arrival_id, "occurred_at": arrived_at,
+            "movement_type": "import" if source_type == "csv_import" else "arrival",
+        }
+    for transfer_id, item_id, quantity, arrival_id, store_id, transferred_at, created_at in db.execute(
+        select(Transfer.id, Transfer.item_id, Transfer.quantity, Transfer.arrival_id,
+               Transfer.store_id, Transfer.transferred_at, Transfer.created_at)
+    ).all():
+        yield {
+            "item_id": item_id, "movement_type": "transfer", "quantity": -quantity,
+            "arrival_id": arrival_id, "store_id": store_id, "source_id": transfer_id,
+            "occurred_at": transfer_occurred_at(transferred_at, created_at),
+        }
+    for disposal_id, item_id, quantity, arrival_id, disposed_at in db.execute(
+        select(Disposal.id, Disposal.item_id, Disposal.quantity, Disposal.arrival_id, Disposal.disposed_at)
+    ).all():
+        yield {
+            "item_id": item_id, "movement_type": "disposal", "quantity": -quantity,
+            "arrival_id": arrival_id, "source_id": disposal_id, "occurred_at": disposed_at,
+        }
+    for adjustment_id, item_id, quantity, adjusted_at in db.execute(
+        select(InventoryAdjustment.id, InventoryAdjustment.item_id,
+               InventoryAdjustment.quantity, InventoryAdjustment.adjusted_at)
+    ).all():
+        yield {
+            "item_id": item_id, "movement_type": "adjustment", "quantity": quantity,
+            "source_id": adjustment_id, "occurred_at": adjusted_at,
+        }
+
+
+def _next_month(moment: datetime) -> datetime:
+    return datetime.combine((moment.date().replace(day=1) + timedelta(days=32)).replace(day=1), time())
+
+
+def backfill(db: Session) -> int:
+    """台帳が空なら既存データから作成し、月初ごとのスナップショットも作る。追記件数を返す"""
+    if db.scalar(select(StockMovement.id).limit(1)) is not None:
+        return 0
+
+    now = db_now(db)
+    rows = [
+        {"arrival_id": None, "store_id": None, "source_id": None, **row, "occurred_at": row["occurred_at"] or now}
+        for row in _source_movements(db)
+    ]
+    if not rows:
+        return 0
+    for i in range(0, len(rows), _BATCH_SIZE):
+        db.execute(StockMovement.__table__.insert(), rows[i:i + _BATCH_SIZE])
+
+    # 月初スナップショット: 時刻順に合計しながら、その月に増減のあった品目だけ記録
+    rows.sort(key=lambda row: row["occurred_at"])
+    totals: Dict[int, int] = defaultdict(int)
+    changed = set()
+    snapshots: List[dict] = []
+    boundary = _next_month(rows[0]["occurred_at"])
+
+    def close_month():
+        snapshots.extend({"item_id": item_id, "as_of": boundary, "quantity": totals[item_id]} for item_id in changed)
+        changed.clear()
+
+    for row in rows:
+        while row["occurred_at"] > boundary and boundary <= now:
+            close_month()
+            boundary = _next_month(boundary)
+        totals[row["item_id"]] += row["quantity"]
+        changed.add(row["item_id"])
+    while boundary <= now:
+        close_month()
+        boundary = _next_month(boundary)
+    for i in range(0, len(snapshots), _BATCH_SIZE):
+        db.execute(InventorySnapshot.__table__.insert(), snapshots[i:i + _BATCH_SIZE])
+    return len(rows)
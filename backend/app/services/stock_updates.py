@@ -0,0 +1,73 @@
+"""
+在庫数の原子的な増減
+- 読んでから Python で判定して書き戻すと、同時に登録された分を上書き・二重引き当てしてしまう
+- 条件付き UPDATE（UPDATE ... SET q = q - :n WHERE q >= :n RETURNING q）で判定と更新を 1 文で行う
+- 条件を満たさず更新できなかったときは None を返す（呼び出し側で 404 / 409 を返す）
+- SQLite 3.35+ / PostgreSQL の RETURNING を使用。DB のロック方式には依存しない
+"""
+
+from typing import Optional
+
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import Session
+
+from app.models.inventory import Arrival, Inventory
+from app.models.supplies import Supply
+
+# 読み込み済みのオブジェクトは同期しない（RETURNING の値を使う）
+_NO_SYNC = {"synchronize_session": False}
+
+
+def change_inventory(db: Session, item_id: int, delta: int, require_stock: bool = False) -> Optional[int]:
+    """品目在庫を delta だけ増減して新しい数量を返す。require_stock なら不足時は更新しない"""
+    stmt = (
+        update(Inventory)
+        .where(Inventory.item_id == item_id)
+        .values(quantity=Inventory.quantity + delta)
+        .returning(Inventory.quantity)
+        .execution_options(**_NO_SYNC)
+    )
+    if require_stock and delta < 0:
+        stmt = stmt.where(Inventory.quantity >= -delta)
+    return db.execute(stmt).scalar()
+
+
+def add_to_inventory(db: Session, item_id: int, delta: int, unit_price=None) -> int:
+    """品目在庫に加算（在庫行がなければ作成）して新しい数量を返す"""
+    quantity = change_inventory(db, item_id, delta)
+    if quantity is None:
+        db.add(Inventory(item_id=item_id, quantity=delta, unit_price=unit_price))
+        db.flush()  # 同じセッション内の次の加算が UPDATE で当たるように
+        quantity = delta
+    return quantity
+
+
+def take_from_lot(db: Session, arrival_id: int, quantity: int, clamp: bool = False) -> Optional[int]:
+    """ロット残数を減らして新しい残数を返す。clamp なら 0 で止め、そうでなければ不足時は更新しない"""
+    remaining = func.coalesce(Arrival.remaining_quantity, Arrival.quantity)
+    stmt = (
+        update(Arrival)
+        .where(Arrival.id == arrival_id)
+        .returning(Arrival.remaining_quantity)
+        .execution_options(**_NO_SYNC)
+    )
+    if clamp:
+        stmt = stmt.values(remaining_quantity=case((remaining > quantity, remaining - quantity), else_=0))
+    else:
+        stmt = stmt.where(remaining >= quantity).values(remaining_quantity=remaining - quantity)
+    return db.execute(stmt).scalar()
+
+
+def change_supply_stock(db: Session, supply_id: int, delta: int, require_stock: bool = False) -> Optional[int]:
+    """資材在庫を delta だけ増減して新しい数量を返す。require_stock なら不足時は更新しない"""
+    stock = func.coalesce(Supply.stock_quantity, 0)
+    stmt = (
+        update(Supply)
+        .where(Supply.id == supply_id)
+        .values(stock_quantity=stock + delta)
+        .returning(Supply.stock_quantity)
+        .execution_options(**_NO_SYNC)
+    )
+    if require_stock and delta < 0:
+        stmt = stmt.where(stock >= -delta)
+    return db.execute(stmt).scalar()
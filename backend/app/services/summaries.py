@@ -0,0 +1,343 @@
+"""
+店舗別の月次・週次集計（推移・前年比）
+- store_period_summaries に店舗 × 月（週）の持ち出し件数・数量・納品金額・仕入金額・資材金額・経費を持つ
+- 持ち出し・資材持ち出し・経費の追加・変更・削除は、同じトランザクションで summary_dirty_periods に期間を記録
+  （変更の検出は data_changes。一括 UPDATE / DELETE は期間が分からないので全期間）
+- 記録のある期間だけ明細から作り直す（refresh）。書き込むのは定期ジョブだけ（自前のセッション・プロセス内で 1 つずつ）
+- 推移は読み出しのみ。集計行を読み（期間数 × 店舗数）、まだ作り直していない期間だけ明細からその場で集計する
+- 週は月曜始まり。経費は月単位のため週次には含めない
+"""
+
+import os
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.expenses import Expense
+from app.models.stores import Store, StorePeriodSummary, SummaryDirtyPeriod
+from app.models.supplies import SupplyTransfer
+from app.models.transfers import Transfer
+from app.services import analytics_engine
+from app.services.data_changes import as_date
+
+GRAINS = ("month", "week")
+# 集計行の列（margin = revenue − cost は読み出し時に計算）
+COLUMNS = ("transfer_count", "quantity", "revenue", "cost", "supply_cost", "expense")
+MEASURES = ("revenue", "cost", "margin", "supply_cost", "expense", "quantity", "transfer_count")
+
+# 集計のもとになるテーブル -> 対象の粒度
+_SOURCE_GRAINS = {
+    "transfers": GRAINS,
+    "supply_transfers": GRAINS,
+    "expenses": ("month",),
+}
+
+_BATCH_SIZE = 5000
+
+SUMMARY_REFRESH_INTERVAL_MINUTES = float(os.getenv("SUMMARY_REFRESH_INTERVAL_MINUTES", "5"))
+
+_refresh_lock = threading.Lock()
+
+
+# ========== 期間 ==========
+
+def period_start(grain: str, day: date) -> date:
+    """day を含む期間の初日（月初 / 月曜日）"""
+    if grain == "month":
+        return day.replace(day=1)
+    return day - timedelta(days=day.weekday())
+
+
+def next_period(grain: str, period: date) -> date:
+    if grain == "month":
+        return analytics_engine.month_range(period.year, period.month)[1]
+    return period + timedelta(days=7)
+
+
+def previous_year(grain: str, period: date) -> date:
+    """前年の同じ期間（週は 52 週前で曜日を揃える）"""
+    if grain == "month":
+        return period.replace(year=period.year - 1)
+    return period - timedelta(weeks=52)
+
+
+def periods_between(grain: str, start: date, end: date) -> List[date]:
+    """[start, end) にかかる期間の初日"""
+    periods = []
+    period = period_start(grain, start)
+    while period < end:
+        periods.append(period)
+        period = next_period(grain, period)
+    return periods
+
+
+def _bucket(grain: str, days: np.ndarray) -> np.ndarray:
+    """日付の配列を期間の初日に（1970-01-01 は木曜日）"""
+    if grain == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    weekday = (days.astype(np.int64) + 3) % 7
+    return days - weekday.astype("timedelta64[D]")
+
+
+# ========== 変更の記録 ==========
+
+def record_changes(connection, changes):
+    """data_changes から: 変更された期間を同じトランザクションで記録"""
+    rows = set()
+    for change in changes:
+        grains = _SOURCE_GRAINS.get(change.table)
+        if grains is None:
+            continue
+        if change.day is None:
+            rows.add(("all", None))
+        else:
+            rows.update((grain, period_start(grain, change.day)) for grain in grains)
+    if rows:
+        connection.execute(SummaryDirtyPeriod.__table__.insert(), [{"grain": g, "period": p} for g, p in rows])
+
+
+# ========== 作り直し ==========
+
+def _merge(grain: str, periods: Sequence[date]) -> List[Tuple[date, date]]:
+    """期間を連続する範囲 [開始, 終了) にまとめる"""
+    ranges: List[List[date]] = []
+    for period in sorted(periods):
+        end = next_period(grain, period)
+        if ranges and ranges[-1][1] >= period:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([period, end])
+    return [(start, end) for start, end in ranges]
+
+
+def _accumulate(totals: Dict[tuple, list], grain: str, days: np.ndarray, store_ids: np.ndarray, columns: Dict[int, np.ndarray]):
+    """日 × 店舗の値を（期間, 店舗）ごとに totals へ加算"""
+    if not len(days):
+        return
+    keys = np.stack([_bucket(grain, days).astype(np.int64), store_ids.astype(np.int64)], axis=1)
+    unique, index = np.unique(keys, axis=0, return_inverse=True)
+    index = index.ravel()
+    sums = {position: np.bincount(index, weights=values, minlength=len(unique)) for position, values in columns.items()}
+    periods = unique[:, 0].astype("datetime64[D]").astype(object)
+    for i, store_id in enumerate(unique[:, 1].tolist()):
+        row = totals[(periods[i], store_id)]
+        for position, values in sums.items():
+            row[position] += float(values[i])
+
+
+def _compute(db: Session, grain: str, ranges: Iterable[Tuple[date, date]]) -> Dict[tuple, list]:
+    totals: Dict[tuple, list] = defaultdict(lambda: [0.0] * len(COLUMNS))
+    for start, end in ranges:
+        transfers = analytics_engine.transfers_by_day(db, start, end)
+        _accumulate(totals, grain, transfers["day"], transfers["store_id"], {
+            0: transfers["count"], 1: transfers["quantity"], 2: transfers["amount"], 3: transfers["cost"],
+        })
+        supplies = analytics_engine.supply_by_day(db, start, end)
+        _accumulate(totals, grain, supplies["day"], supplies["store_id"], {4: supplies["amount"]})
+        if grain == "month":
+            for year_month, store_id, amount in db.execute(
+                select(Expense.year_month, Expense.store_id, func.sum(Expense.amount))
+                .where(Expense.year_month >= start.strftime("%Y-%m"), Expense.year_month < end.strftime("%Y-%m"))
+                .group_by(Expense.year_month, Expense.store_id)
+            ):
+                period = as_date(year_month)
+                if period is not None:
+                    totals[(period, store_id)][5] += float(amount or 0)
+    return totals
+
+
+def _store(db: Session, grain: str, totals: Dict[tuple, list]):
+    rows = [
+        {"grain": grain, "period": period, "store_id": store_id, **dict(zip(COLUMNS, values))}
+        for (period, store_id), values in totals.items()
+    ]
+    for i in range(0, len(rows), _BATCH_SIZE):
+        db.execute(StorePeriodSummary.__table__.insert(), rows[i:i + _BATCH_SIZE])
+
+
+def rebuild_periods(db: Session, grain: str, periods: Sequence[date]) -> int:
+    """指定の期間だけ作り直す（commit は呼び出し側）"""
+    periods = sorted(set(periods))
+    db.execute(delete(StorePeriodSummary).where(
+        StorePeriodSummary.grain == grain, StorePeriodSummary.period.in_(periods),
+    ))
+    _store(db, grain, _compute(db, grain, _merge(grain, periods)))
+    return len(periods)
+
+
+def rebuild(db: Session) -> int:
+    """全期間を作り直す（commit は呼び出し側）。作り直した期間数を返す"""
+    db.execute(delete(StorePeriodSummary))
+    first, last = [], []
+    for column in (Transfer.transferred_at, SupplyTransfer.transferred_at):
+        low, high = db.execute(select(func.min(column), func.max(column))).one()
+        if low is not None:
+            first.append(as_date(low))
+            last.append(as_date(high))
+    low, high = db.execute(select(func.min(Expense.year_month), func.max(Expense.year_month))).one()
+    if low is not None:
+        first.append(as_date(low))
+        last.append(as_date(high))
+    first = [d for d in first if d is not None]
+    last = [d for d in last if d is not None]
+    if not first:
+        return 0
+
+    count = 0
+    for grain in GRAINS:
+        start = period_start(grain, min(first))
+        end = next_period(grain, period_start(grain, max(last)))
+        _store(db, grain, _compute(db, grain, [(start, end)]))
+        count += len(periods_between(grain, start, end))
+    return count
+
+
+def refresh(db: Session) -> int:
+    """記録のある期間を作り直す（commit は呼び出し側）。作り直した期間数を返す"""
+    dirty = db.execute(select(SummaryDirtyPeriod.id, SummaryDirtyPeriod.grain, SummaryDirtyPeriod.period)).all()
+    if not dirty:
+        return 0
+    if any(row.grain == "all" for row in dirty):
+        count = rebuild(db)
+    else:
+        count = sum(
+            rebuild_periods(db, grain, periods)
+            for grain in GRAINS
+            if (periods := [row.period for row in dirty if row.grain == grain])
+        )
+    # 作り直し中に記録された期間は次回に回す
+    db.execute(delete(SummaryDirtyPeriod).where(SummaryDirtyPeriod.id <= max(row.id for row in dirty)))
+    return count
+
+
+def run_refresh_job() -> int:
+    """定期ジョブ: 自前のセッションで作り直して commit（実行中なら何もしない）"""
+    if not _refresh_lock.acquire(blocking=False):
+        return 0
+    db = SessionLocal()
+    try:
+        count = refresh(db)
+        db.commit()
+        return count
+    finally:
+        db.close()
+        _refresh_lock.release()
+
+
+def backfill(db: Session) -> int:
+    """集計が空なら全期間を作成（commit は呼び出し側）"""
+    if db.scalar(select(StorePeriodSummary.id).limit(1)) is not None:
+        return 0
+    db.execute(delete(SummaryDirtyPeriod))
+    return rebuild(db)
+
+
+# ========== 推移 ==========
+
+def _series(values: np.ndarray, grain: str) -> Dict[str, list]:
+    """（期間 × 列）の配列を指標ごとの系列に"""
+    column = {name: values[:, i] for i, name in enumerate(COLUMNS)}
+    money = lambda a: np.round(a, 2).tolist()
+    series = {
+        "revenue": money(column["revenue"]),
+        "cost": money(column["cost"]),
+        "margin": money(column["revenue"] - column["cost"]),
+        "supply_cost": money(column["supply_cost"]),
+        "quantity": column["quantity"].astype(np.int64).tolist(),
+        "transfer_count": column["transfer_count"].astype(np.int64).tolist(),
+    }
+    if grain == "month":
+        series["expense"] = money(column["expense"])
+    return series
+
+
+def _growth(current: Dict[str, list], previous: Dict[str, list]) -> Dict[str, list]:
+    """前年比（(今年 − 前年) / 前年。前年が 0 なら None）"""
+    return {
+        name: [round((c - p) / abs(p), 4) if p else None for c, p in zip(current[name], previous[name])]
+        for name in current
+    }
+
+
+def trend(
+    db: Session, grain: str, start: date, end: date, store_id: Optional[int] = None, compare: bool = True,
+) -> dict:
+    """[start, end) の店舗別・全体の月次（週次）推移。compare なら前年同期と前年比も（読み出しのみ）"""
+    if grain not in GRAINS:
+        raise ValueError(f"grain must be one of: {', '.join(GRAINS)}")
+    periods = periods_between(grain, start, end)
+    previous = [previous_year(grain, p) for p in periods] if compare else []
+    positions = {period: i for i, period in enumerate(periods)}
+    previous_positions = {period: i for i, period in enumerate(previous)}
+
+    wanted = set(periods) | set(previous)
+    dirty = db.execute(select(SummaryDirtyPeriod.grain, SummaryDirtyPeriod.period)).all()
+    if any(row.grain == "all" for row in dirty):
+        live = wanted
+    else:
+        live = {row.period for row in dirty if row.grain == grain} & wanted
+
+    stmt = (
+        select(StorePeriodSummary)
+        .where(
+            StorePeriodSummary.grain == grain,
+            StorePeriodSummary.period >= (previous or periods or [start])[0],
+            StorePeriodSummary.period < end,
+        )
+    )
+    if store_id is not None:
+        stmt = stmt.where(StorePeriodSummary.store_id == store_id)
+    rows = [
+        (row.period, row.store_id, [float(getattr(row, name) or 0) for name in COLUMNS])
+        for row in db.execute(stmt).scalars()
+        if row.period not in live
+    ]
+    # 未反映の期間は明細から集計（書き込まない）
+    if live:
+        rows.extend(
+            (period, row_store_id, values)
+            for (period, row_store_id), values in _compute(db, grain, _merge(grain, live)).items()
+            if store_id is None or row_store_id == store_id
+        )
+
+    stores = db.execute(select(Store.id, Store.name, Store.is_active).order_by(Store.sort_order, Store.id)).all()
+    with_data = {row_store_id for _, row_store_id, _ in rows}
+    stores = [
+        s for s in stores
+        if (s.id == store_id if store_id is not None else s.is_active or s.id in with_data)
+    ]
+    store_index = {s.id: i for i, s in enumerate(stores)}
+
+    current_values = np.zeros((len(stores), len(periods), len(COLUMNS)))
+    previous_values = np.zeros((len(stores), len(previous), len(COLUMNS)))
+    for period, row_store_id, values in rows:
+        i = store_index.get(row_store_id)
+        if i is None:
+            continue
+        if period in positions:
+            current_values[i, positions[period]] = values
+        if period in previous_positions:
+            previous_values[i, previous_positions[period]] = values
+
+    total = _series(current_values.sum(axis=0), grain)
+    result = {
+        "grain": grain,
+        "periods": [p.strftime("%Y-%m") if grain == "month" else p.isoformat() for p in periods],
+        "measures": [m for m in MEASURES if grain == "month" or m != "expense"],
+        "stores": [
+            {"store_id": store.id, "store_name": store.name, **_series(current_values[i], grain)}
+            for i, store in enumerate(stores)
+        ],
+        "total": total,
+    }
+    if compare:
+        previous_total = _series(previous_values.sum(axis=0), grain)
+        result["previous_year"] = previous_total
+        result["yoy"] = _growth(total, previous_total)
+    return result
@@ -0,0 +1,87 @@
+"""
+テーブル変更カウンタ
+- ORM の flush / 一括 UPDATE・DELETE で変更されたテーブルをセッションに記録
+- commit 成功時にテーブルごとのバージョンを進める（rollback 時は破棄）
+- キャッシュ類はこのバージョンと比較して無効化を判断する
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import object_mapper
+
+_SESSION_KEY = "changed_tables"
+
+
+class TableVersions:
+    """プロセス内のテーブル別バージョン（単調増加）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._modified_at: Dict[str, float] = {}
+        self._listeners: List[Callable[[Set[str]], None]] = []
+        self.started_at = time.time()
+
+    def get(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    def snapshot(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._versions.get(t, 0) for t in tables)
+
+    def modified_at(self, tables: Iterable[str]) -> float:
+        """指定テーブルの最終更新時刻（未更新なら起動時刻）"""
+        return max([self._modified_at.get(t, self.started_at) for t in tables] or [self.started_at])
+
+    def bump(self, *tables: str):
+        """バージョンを進める（生SQLで書き込んだ場合は明示的に呼ぶ）"""
+        if not tables:
+            return
+        now = time.time()
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                self._modified_at[table] = now
+        for listener in list(self._listeners):
+            listener(set(tables))
+
+    def add_listener(self, listener: Callable[[Set[str]], None]):
+        """commit 後に変更テーブル集合を受け取るコールバックを登録"""
+        self._listeners.append(listener)
+
+    def install(self, session_factory):
+        """sessionmaker にイベントフックを登録"""
+
+        @event.listens_for(session_factory, "after_flush")
+        def _after_flush(session, flush_context):
+            changed = session.info.setdefault(_SESSION_KEY, set())
+            for obj in session.new | session.deleted:
+                changed.add(object_mapper(obj).persist_selectable.name)
+            for obj in session.dirty:
+                if session.is_modified(obj, include_collections=False):
+                    changed.add(object_mapper(obj).persist_selectable.name)
+
+        @event.listens_for(session_factory, "do_orm_execute")
+        def _do_orm_execute(orm_execute_state):
+            if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+                return
+            mapper = orm_execute_state.bind_mapper
+            if mapper is not None:
+                orm_execute_state.session.info.setdefault(_SESSION_KEY, set()).add(
+                    mapper.persist_selectable.name
+                )
+
+        @event.listens_for(session_factory, "after_commit")
+        def _after_commit(session):
+            changed = session.info.pop(_SESSION_KEY, None)
+            if changed:
+                self.bump(*sorted(changed))
+
+        @event.listens_for(session_factory, "after_rollback")
+        def _after_rollback(session):
+            session.info.pop(_SESSION_KEY, None)
+
+
+table_versions = TableVersions()
@@ -0,0 +1,245 @@
+"""
+在庫評価と売上原価
+- 移動平均法: item_costs に品目ごとの数量・平均単価・評価額を持ち、stock_ledger.record() から増減のたびに 1 文の UPDATE で更新
+- 入庫（入荷・CSV取込）は入荷単価で受け入れて平均単価を更新。単価のない入庫・調整の増加はその時点の平均単価で受け入れる
+- 出庫（持ち出し・廃棄・調整の減少）は平均単価で払い出す（持ち出し分が売上原価）
+- item_cost_periods に品目 × 発生月 × 増減種別の数量・金額を加算しておく
+  - 月末の評価額 = その月までの増減額の合計（= 現在の評価額 − その月より後の増減額。月数の少ない側を集計）
+  - 期間の売上原価 = その期間の持ち出し分の合計
+  いずれも月次行の集計（品目数 × 月数）で、台帳の再走査はしない
+- 先入先出（FIFO）の評価額は残数のあるロット（入荷単価 × 残数）から
+- 過去日付の増減も記録した順に平均単価へ反映し、金額は発生月に計上する
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Float, and_, case, cast, func, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.models.inventory import OPEN_LOT, Arrival, ItemCost, ItemCostPeriod, StockMovement
+from app.models.items import Item
+
+INCOMING_TYPES = ("arrival", "import")
+
+_BATCH_SIZE = 5000
+
+# 読み込み済みのオブジェクトは同期しない（RETURNING の値を使う）
+_NO_SYNC = {"synchronize_session": False}
+
+
+def period_of(moment: datetime) -> str:
+    return moment.strftime("%Y-%m")
+
+
+def _months(start: str, end: str) -> int:
+    """YYYY-MM 間の月数"""
+    return (int(end[:4]) - int(start[:4])) * 12 + int(end[5:7]) - int(start[5:7])
+
+
+def apply(
+    db: Session, item_id: int, movement_type: str, quantity: int, occurred_at: datetime, unit_cost=None,
+) -> float:
+    """増減 1 件を評価額と月次集計に反映し、計上額（符号付き）を返す（commit は呼び出し側）"""
+    cost = float(unit_cost) if quantity > 0 and unit_cost is not None else None
+    rate = literal(cost, Float) if cost is not None else ItemCost.avg_cost
+    new_quantity = ItemCost.quantity + quantity
+    new_value = ItemCost.value + quantity * rate
+    values = {"quantity": new_quantity, "value": new_value}
+    if cost is not None:
+        values["avg_cost"] = case(
+            (and_(new_quantity > 0, new_value > 0), cast(new_value, Float) / new_quantity),
+            else_=rate,
+        )
+    avg = db.execute(
+        update(ItemCost)
+        .where(ItemCost.item_id == item_id)
+        .values(**values)
+        .returning(ItemCost.avg_cost)
+        .execution_options(**_NO_SYNC)
+    ).scalar()
+    if avg is None:
+        avg = cost or 0
+        db.add(ItemCost(item_id=item_id, quantity=quantity, avg_cost=avg, value=quantity * avg))
+        db.flush()  # 同じセッション内の次の増減が UPDATE で当たるように
+
+    amount = quantity * (cost if cost is not None else float(avg))
+    period = period_of(occurred_at)
+    updated = db.execute(
+        update(ItemCostPeriod)
+        .where(
+            ItemCostPeriod.item_id == item_id,
+            ItemCostPeriod.period == period,
+            ItemCostPeriod.movement_type == movement_type,
+        )
+        .values(quantity=ItemCostPeriod.quantity + quantity, amount=ItemCostPeriod.amount + amount)
+        .execution_options(**_NO_SYNC)
+    ).rowcount
+    if not updated:
+        db.add(ItemCostPeriod(
+            item_id=item_id, period=period, movement_type=movement_type, quantity=quantity, amount=amount,
+        ))
+        db.flush()
+    return amount
+
+
+def fifo_values(db: Session) -> Dict[int, Tuple[int, float]]:
+    """先入先出の評価: 品目ごとの（ロット残数合計, 入荷単価 × 残数の合計）"""
+    rows = db.execute(
+        select(
+            Arrival.item_id,
+            func.sum(Arrival.remaining_quantity),
+            func.sum(Arrival.remaining_quantity * func.coalesce(Arrival.wholesale_price, 0)),
+        )
+        .where(OPEN_LOT)
+        .group_by(Arrival.item_id)
+    )
+    return {item_id: (int(quantity or 0), float(value or 0)) for item_id, quantity, value in rows}
+
+
+def valuation(db: Session, period: Optional[str] = None) -> dict:
+    """品目別の評価額（period=YYYY-MM ならその月末時点。省略時は現在。現在のみ FIFO も返す）"""
+    current = {
+        item_id: [int(quantity or 0), float(value or 0), float(avg or 0)]
+        for item_id, quantity, value, avg in db.execute(
+            select(ItemCost.item_id, ItemCost.quantity, ItemCost.value, ItemCost.avg_cost)
+        )
+    }
+    if period is not None:
+        first, last = db.execute(select(func.min(ItemCostPeriod.period), func.max(ItemCostPeriod.period))).one()
+        forward = first is not None and _months(first, period) < _months(period, last)
+        totals = select(ItemCostPeriod.item_id, func.sum(ItemCostPeriod.quantity), func.sum(ItemCostPeriod.amount))
+        if forward:
+            totals = totals.where(ItemCostPeriod.period <= period)
+            current = {item_id: [0, 0.0, avg] for item_id, (_, _, avg) in current.items()}
+        else:
+            totals = totals.where(ItemCostPeriod.period > period)
+        sign = 1 if forward else -1
+        for item_id, quantity, amount in db.execute(totals.group_by(ItemCostPeriod.item_id)):
+            row = current.setdefault(item_id, [0, 0.0, 0.0])
+            row[0] += sign * int(quantity or 0)
+            row[1] += sign * float(amount or 0)
+    fifo = fifo_values(db) if period is None else {}
+    names = dict(db.execute(select(Item.id, Item.name).where(Item.id.in_(list(current)))).all()) if current else {}
+
+    items = []
+    for item_id in sorted(current):
+        quantity, value, avg = current[item_id]
+        if quantity == 0 and abs(value) < 0.5 and item_id not in fifo:
+            continue
+        row = {
+            "item_id": item_id,
+            "item_name": names.get(item_id),
+            "quantity": quantity,
+            # 月末時点の平均単価は評価額 / 数量（現在はその時点の平均単価）
+            "avg_cost": round(avg if period is None else (value / quantity if quantity else 0), 4),
+            "value": round(value, 2),
+        }
+        if period is None:
+            lot_quantity, lot_value = fifo.get(item_id, (0, 0.0))
+            row["fifo_quantity"] = lot_quantity
+            row["fifo_value"] = round(lot_value, 2)
+        items.append(row)
+
+    result = {
+        "period": period,
+        "method": "moving_average",
+        "total_quantity": sum(row["quantity"] for row in items),
+        "total_value": round(sum(row["value"] for row in items), 2),
+        "items": items,
+    }
+    if period is None:
+        result["total_fifo_value"] = round(sum(row["fifo_value"] for row in items), 2)
+    return result
+
+
+def cost_of_goods(db: Session, period_from: str, period_to: str) -> dict:
+    """期間（YYYY-MM〜YYYY-MM）の受入額・売上原価・廃棄原価・調整額（品目別と合計）"""
+    by_item: Dict[int, Dict[str, list]] = defaultdict(dict)
+    for item_id, movement_type, quantity, amount in db.execute(
+        select(
+            ItemCostPeriod.item_id, ItemCostPeriod.movement_type,
+            func.sum(ItemCostPeriod.quantity), func.sum(ItemCostPeriod.amount),
+        )
+        .where(ItemCostPeriod.period.between(period_from, period_to))
+        .group_by(ItemCostPeriod.item_id, ItemCostPeriod.movement_type)
+    ):
+        by_item[item_id][movement_type] = [int(quantity or 0), float(amount or 0)]
+    names = dict(db.execute(select(Item.id, Item.name).where(Item.id.in_(list(by_item)))).all()) if by_item else {}
+
+    def pick(types: Dict[str, list], *kinds: str) -> Tuple[int, float]:
+        rows = [types[kind] for kind in kinds if kind in types]
+        return sum(r[0] for r in rows), sum(r[1] for r in rows)
+
+    items = []
+    for item_id in sorted(by_item):
+        types = by_item[item_id]
+        received_quantity, received = pick(types, *INCOMING_TYPES)
+        sold_quantity, cogs = pick(types, "transfer")
+        disposed_quantity, disposal_cost = pick(types, "disposal")
+        _, adjustment = pick(types, "adjustment")
+        items.append({
+            "item_id": item_id,
+            "item_name": names.get(item_id),
+            "received_quantity": received_quantity,
+            "received_amount": round(received, 2),
+            "sold_quantity": -sold_quantity,
+            "cogs": round(-cogs, 2),
+            "disposed_quantity": -disposed_quantity,
+            "disposal_cost": round(-disposal_cost, 2),
+            "adjustment_amount": round(adjustment, 2),
+        })
+
+    return {
+        "period_from": period_from,
+        "period_to": period_to,
+        "method": "moving_average",
+        "total_received": round(sum(row["received_amount"] for row in items), 2),
+        "total_cogs": round(sum(row["cogs"] for row in items), 2),
+        "total_disposal_cost": round(sum(row["disposal_cost"] for row in items), 2),
+        "total_adjustment": round(sum(row["adjustment_amount"] for row in items), 2),
+        "items": items,
+    }
+
+
+def backfill(db: Session) -> int:
+    """評価が空なら台帳を発生順に再生して作成（apply() と同じ規則）。対象品目数を返す"""
+    if db.scalar(select(ItemCost.id).limit(1)) is not None:
+        return 0
+    movements = db.execute(
+        select(
+            StockMovement.item_id, StockMovement.movement_type, StockMovement.quantity,
+            StockMovement.occurred_at, Arrival.wholesale_price,
+        )
+        .outerjoin(Arrival, StockMovement.arrival_id == Arrival.id)
+        .order_by(StockMovement.occurred_at, StockMovement.id)
+    ).all()
+    if not movements:
+        return 0
+
+    state: Dict[int, list] = {}  # item_id -> [数量, 評価額, 平均単価]
+    periods: Dict[Tuple[int, str, str], list] = defaultdict(lambda: [0, 0.0])
+    for item_id, movement_type, quantity, occurred_at, price in movements:
+        row = state.setdefault(item_id, [0, 0.0, 0.0])
+        cost = float(price) if quantity > 0 and movement_type in INCOMING_TYPES and price is not None else None
+        rate = cost if cost is not None else row[2]
+        row[0] += quantity
+        row[1] += quantity * rate
+        if cost is not None:
+            row[2] = row[1] / row[0] if row[0] > 0 and row[1] > 0 else cost
+        total = periods[(item_id, period_of(occurred_at), movement_type)]
+        total[0] += quantity
+        total[1] += quantity * rate
+
+    db.execute(ItemCost.__table__.insert(), [
+        {"item_id": item_id, "quantity": quantity, "value": value, "avg_cost": avg}
+        for item_id, (quantity, value, avg) in state.items()
+    ])
+    rows = [
+        {"item_id": item_id, "period": period, "movement_type": movement_type, "quantity": quantity, "amount": amount}
+        for (item_id, period, movement_type), (quantity, amount) in periods.items()
+    ]
+    for i in range(0, len(rows), _BATCH_SIZE):
+        db.execute(ItemCostPeriod.__table__.insert(), rows[i:i + _BATCH_SIZE])
+    return len(state)
@@ -0,0 +1,350 @@
+"""
+ホットパスのベンチマークと回帰ゲート
+CSV 取込・入荷登録・請求書生成・月間 P&L・店舗別集計・仕入納品比較（12 か月）・推移（24 か月）・最新単価・入金確認票・CSV エクスポート・
+ダッシュボード集計（キャッシュなし）・init_db コールドスタートを、データ規模ごとに計測して JSON に保存する。
+
+- 規模ごとに perf.synthetic でデータを作り（perf/data/ に保持して再利用）、
+  計測用コピーに対して別プロセスで実行する（DATABASE_URL はインポート時に固定されるため）
+- 各ケースは warmup 1 回 + --repeat 回。中央値で比較する
+- 入荷登録は、当日の入荷で締めた月の保存済みレポートが無効化されないことも確かめる（されれば error）
+- --save-baseline で perf/baselines/<名前>.json に保存、--check で比較し
+  中央値が --threshold を超えて悪化したケースがあれば終了コード 1
+- ベースラインは計測したマシンに依存する。比較は同じマシン上で行うこと
+
+Usage (backend/ で実行):
+    python -m perf.bench --sizes small,medium --save-baseline
+    python -m perf.bench --sizes small,medium --check --threshold 0.2
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+PERF_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(PERF_DIR)
+DATA_DIR = os.path.join(PERF_DIR, "data")
+RESULTS_DIR = os.path.join(PERF_DIR, "results")
+BASELINES_DIR = os.path.join(PERF_DIR, "baselines")
+RESULT_PREFIX = "BENCH_RESULT "
+
+# 規模: perf.synthetic の引数
+SIZES: Dict[str, List[str]] = {
+    "small": ["--years", "0.25", "--stores", "4", "--items", "60", "--arrivals-per-day", "15", "--transfers-per-store-day", "6"],
+    "medium": ["--years", "1", "--stores", "11", "--items", "200", "--arrivals-per-day", "30", "--transfers-per-store-day", "10"],
+    "large": ["--years", "5", "--stores", "11", "--items", "300"],
+}
+# データの基準日（規模間・実行間で同じデータになるよう固定）
+DATA_END = date(2026, 3, 31)
+CSV_IMPORT_ROWS = 200
+
+
+# --- 計測プロセス側 ---
+
+def _time(func: Callable[[], object], repeat: int) -> dict:
+    func()  # warmup
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "mean_ms": round(statistics.mean(samples), 3),
+        "repeat": repeat,
+    }
+
+
+def _build_cases(db) -> Dict[str, Callable[[], object]]:
+    from fastapi import BackgroundTasks, UploadFile
+    from app.models import Invoice, InvoiceItem, Item, ReportCache
+    from app.routers.analytics import get_monthly_pl, get_purchase_delivery_comparison, get_store_summary, get_trend
+    from app.routers.backup import export_csv
+    from app.routers.csv_import import execute_csv_import
+    from app.routers.inventory import create_arrival
+    from app.routers.invoices import generate_invoice
+    from app.routers.payments import get_payment_confirmation
+    from app.routers.transfers import get_latest_prices
+    from app.schemas.inventory import ArrivalCreate
+    from app.schemas.invoices import InvoiceGenerateRequest
+    from app.services.dashboard import dashboard_cache
+
+    # 最終月の前月（請求書・入金が揃っている月）
+    last_month = DATA_END.replace(day=1) - timedelta(days=1)
+    year, month = last_month.year, last_month.month
+
+    names = [name for (name,) in db.query(Item.name).order_by(Item.id).limit(CSV_IMPORT_ROWS).all()]
+    lines = ["品名,数量,単価"]
+    for i in range(CSV_IMPORT_ROWS):
+        name = names[i % len(names)] if i % 4 else f"新規品目{i}"
+        lines.append(f"{name},{(i % 5 + 1) * 10},{100 + i % 7 * 50}")
+    csv_bytes = "\n".join(lines).encode("shift_jis")
+
+    def csv_import():
+        upload = UploadFile(file=io.BytesIO(csv_bytes), filename="bench.csv")
+        return asyncio.run(execute_csv_import(
+            file=upload, supplier_id=1, encoding="shift_jis", skip_header=1, delimiter=",",
+            item_name_col=0, variety_col=-1, quantity_col=1, unit_price_col=2,
+            arrived_date=str(DATA_END), db=db,
+        ))
+
+    def invoice():
+        # 請求書のない月を対象にし、計測ごとに消して番号・件数を揃える
+        request = InvoiceGenerateRequest(
+            store_id=1, period_start=DATA_END.replace(day=1), period_end=DATA_END,
+        )
+        result = generate_invoice(request, BackgroundTasks(), db)  # PDF の事前作成は実行しない
+        db.query(InvoiceItem).filter(InvoiceItem.invoice_id == result.id).delete()
+        db.query(Invoice).filter(Invoice.id == result.id).delete()
+        db.commit()
+        return result
+
+    def arrival():
+        # 日付なし（server_default で当日）の入荷で、締めた月の保存済みレポートが消えないこと
+        get_monthly_pl(year=year, month=month, store_id=None, db=db)
+        saved = db.query(ReportCache.id).count()
+        result = create_arrival(ArrivalCreate(item_id=1, supplier_id=1, quantity=10, wholesale_price=100), db)
+        if db.query(ReportCache.id).count() != saved:
+            raise AssertionError("a same-day arrival invalidated closed-month reports")
+        return result
+
+    def export():
+        response = asyncio.run(export_csv(db))
+        return response.body_iterator
+
+    def dashboard():
+        dashboard_cache.clear()  # 毎回全セクションを集計（キャッシュが効かないときの上限）
+        return dashboard_cache.get(db, DATA_END)
+
+    return {
+        "execute_csv_import": csv_import,
+        "create_arrival": arrival,
+        "generate_invoice": invoice,
+        "get_monthly_pl": lambda: get_monthly_pl(year=year, month=month, store_id=None, db=db),
+        "get_store_summary": lambda: get_store_summary(year=year, month=month, db=db),
+        # 12 か月分（複数月の集計経路）
+        "get_purchase_delivery_comparison": lambda: get_purchase_delivery_comparison(
+            year=year - 1, month=month, months=12, db=db,
+        ),
+        # 24 か月の店舗別推移と前年比（集計テーブル経由）
+        "get_trend": lambda: get_trend(
+            year=year - 1, month=month, months=24, grain="month", store_id=None, compare=True, db=db,
+        ),
+        "get_latest_prices": lambda: get_latest_prices(db=db),
+        "get_payment_confirmation": lambda: get_payment_confirmation(year=year, month=month, db=db),
+        "export_csv": export,
+        "get_dashboard": dashboard,
+    }
+
+
+def worker(repeat: int, only: Optional[List[str]]):
+    from app.database import SessionLocal, init_db
+
+    init_db()  # 以前に作ったデータでも追加テーブル・バックフィルを揃えてから計測
+    db = SessionLocal()
+    results = {}
+    try:
+        for name, func in _build_cases(db).items():
+            if only and name not in only:
+                continue
+            try:
+                results[name] = _time(func, repeat)
+            except Exception as e:
+                db.rollback()
+                results[name] = {"error": f"{type(e).__name__}: {e}"[:300]}
+    finally:
+        db.close()
+    print(RESULT_PREFIX + json.dumps(results))
+
+
+COLD_START = """
+import json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from app.database import init_db
+init_db()
+done = time.perf_counter()
+print({prefix!r} + json.dumps({{"import_ms": (imported - start) * 1000, "init_db_ms": (done - imported) * 1000}}))
+"""
+
+
+# --- 制御側 ---
+
+def _env(database_url: str) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = database_url
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def _parse(stdout: str) -> dict:
+    for line in reversed(stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError("no result in output:\n" + stdout[-2000:])
+
+
+def _ensure_data(size: str, seed: int) -> str:
+    path = os.path.join(DATA_DIR, f"{size}-{seed}.db")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"[{size}] generating data...", flush=True)
+        subprocess.run(
+            [sys.executable, "-m", "perf.synthetic", "--database-url", f"sqlite:///{path}",
+             "--reset", "--seed", str(seed), "--end", str(DATA_END), *SIZES[size]],
+            cwd=BACKEND_DIR, env=_env(f"sqlite:///{path}"), check=True, stdout=subprocess.DEVNULL,
+        )
+    return path
+
+
+def _cold_start(database_url: str, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", COLD_START.format(prefix=RESULT_PREFIX)],
+            cwd=BACKEND_DIR, env=_env(database_url), capture_output=True, text=True, check=True,
+        )
+        samples.append(_parse(proc.stdout))
+    total = [s["import_ms"] + s["init_db_ms"] for s in samples]
+    return {
+        "median_ms": round(statistics.median(total), 3),
+        "min_ms": round(min(total), 3),
+        "mean_ms": round(statistics.mean(total), 3),
+        "repeat": repeat,
+        "import_median_ms": round(statistics.median(s["import_ms"] for s in samples), 3),
+        "init_db_median_ms": round(statistics.median(s["init_db_ms"] for s in samples), 3),
+    }
+
+
+def run_size(size: str, repeat: int, seed: int, only: Optional[List[str]]) -> dict:
+    source = _ensure_data(size, seed)
+    scratch = os.path.join(DATA_DIR, f"{size}-{seed}.scratch.db")
+    shutil.copyfile(source, scratch)
+    database_url = f"sqlite:///{scratch}"
+    try:
+        print(f"[{size}] running cases...", flush=True)
+        proc = subprocess.run(
+            [sys.executable, "-m", "perf.bench", "--worker", "--repeat", str(repeat)]
+            + (["--cases", ",".join(only)] if only else []),
+            cwd=BACKEND_DIR, env=_env(database_url), capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr[-2000:])
+        results = _parse(proc.stdout)
+        if not only or "init_db_cold" in only:
+            results["init_db_cold"] = _cold_start(database_url, repeat)
+        return results
+    finally:
+        os.remove(scratch)
+
+
+def check(current: dict, baseline: dict, threshold: float, min_delta_ms: float) -> List[str]:
+    failures = []
+    print(f"\n{'size/case':40s} {'base ms':>10s} {'now ms':>10s} {'delta':>8s}")
+    for size, cases in current["results"].items():
+        for case, stats in cases.items():
+            base = baseline.get("results", {}).get(size, {}).get(case)
+            label = f"{size}/{case}"
+            if base is None:
+                print(f"{label:40s} {'-':>10s} {stats.get('median_ms', '-'):>10} (new)")
+                continue
+            if "error" in stats:
+                print(f"{label:40s} ERROR {stats['error'][:60]}")
+                if "error" not in base:
+                    failures.append(f"{label}: now fails ({stats['error'][:80]})")
+                continue
+            if "error" in base:
+                print(f"{label:40s} {'error':>10s} {stats['median_ms']:10.2f} (fixed)")
+                continue
+            delta = stats["median_ms"] - base["median_ms"]
+            ratio = delta / base["median_ms"] if base["median_ms"] else 0.0
+            flag = ""
+            if ratio > threshold and delta > min_delta_ms:
+                flag = "  REGRESSION"
+                failures.append(f"{label}: {base['median_ms']:.2f} -> {stats['median_ms']:.2f} ms ({ratio:+.0%})")
+            print(f"{label:40s} {base['median_ms']:10.2f} {stats['median_ms']:10.2f} {ratio:+7.1%}{flag}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="small,medium", help=f"カンマ区切り ({', '.join(SIZES)})")
+    parser.add_argument("--cases", help="カンマ区切りで対象ケースを限定")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=8718)
+    parser.add_argument("--baseline", default="default", help="perf/baselines/<名前>.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="ベースラインと比較し悪化があれば失敗")
+    parser.add_argument("--threshold", type=float, default=0.2, help="許容する悪化率（0.2 = 20%%）")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="これ未満の差はノイズとして無視")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    only = args.cases.split(",") if args.cases else None
+
+    if args.worker:
+        worker(args.repeat, only)
+        return
+
+    sizes = args.sizes.split(",")
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown size: {', '.join(unknown)}")
+
+    result = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "data_end": str(DATA_END),
+        },
+        "results": {size: run_size(size, args.repeat, args.seed, only) for size in sizes},
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    for size, cases in result["results"].items():
+        print(f"\n[{size}]")
+        for case, stats in cases.items():
+            if "error" in stats:
+                print(f"  {case:28s} ERROR {stats['error'][:80]}")
+            else:
+                print(f"  {case:28s} median {stats['median_ms']:9.2f} ms  min {stats['min_ms']:9.2f} ms")
+    print(f"\nsaved: {output}")
+
+    baseline_path = os.path.join(BASELINES_DIR, f"{args.baseline}.json")
+    if args.check:
+        if not os.path.exists(baseline_path):
+            sys.exit(f"baseline not found: {baseline_path}")
+        with open(baseline_path, encoding="utf-8") as f:
+            failures = check(result, json.load(f), args.threshold, args.min_delta_ms)
+        if failures:
+            print("\nregressions:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print("\nno regressions")
+    if args.save_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"baseline saved: {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+高速 JSON パスのベンチマーク
+持ち出し一覧 N 行を、従来パス（ORM + Pydantic）と RowSerializer パスで比較する
+
+Usage (backend/ で実行):
+    python -m perf.bench_fast_json --rows 10000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from app.database import Base
+    from app.models import Item, Store, Transfer
+    from app.routers.transfers import TRANSFER_ROWS
+    from app.schemas.transfers import TransferResponse
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+        db.execute(insert(Store), [
+            {"id": i, "name": f"店舗{i}", "operation_type": "franchise", "store_type": "store"} for i in range(1, 12)
+        ])
+        db.execute(insert(Item), [
+            {"id": i, "item_code": str(1000 + i), "name": f"花{i}"} for i in range(1, 201)
+        ])
+        today = date.today()
+        db.execute(insert(Transfer), [
+            {
+                "store_id": random.randint(1, 11),
+                "item_id": random.randint(1, 200),
+                "quantity": random.randint(1, 30),
+                "unit_price": random.randint(100, 800),
+                "wholesale_price": random.randint(50, 400) + 0.5,
+                "margin": random.randint(0, 5000),
+                "transferred_at": today - timedelta(days=random.randint(0, 365)),
+            }
+            for _ in range(args.rows)
+        ])
+        db.commit()
+
+        adapter = TypeAdapter(List[TransferResponse])
+
+        def legacy():
+            rows = db.query(Transfer).order_by(Transfer.transferred_at.desc()).limit(args.rows).all()
+            body = json.dumps(adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json"))
+            db.expunge_all()
+            return body
+
+        def fast():
+            rows = db.query(*TRANSFER_ROWS.columns).order_by(Transfer.transferred_at.desc()).limit(args.rows).all()
+            return TRANSFER_ROWS.serialize(rows)
+
+        assert json.loads(legacy()) == json.loads(fast()), "outputs differ"
+        legacy_s = _best_of(legacy, args.repeat)
+        fast_s = _best_of(fast, args.repeat)
+        db.close()
+        engine.dispose()
+
+    print(f"rows={args.rows}")
+    print(f"legacy (ORM + Pydantic): {legacy_s * 1000:8.1f} ms")
+    print(f"fast   (tuples + bulk) : {fast_s * 1000:8.1f} ms")
+    print(f"speedup                : {legacy_s / fast_s:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
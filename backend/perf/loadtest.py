@@ -0,0 +1,307 @@
+"""
+負荷試験ドライバー
+朝の入荷登録と日中の持ち出し入力を模したトラフィックを流し、
+エンドポイントごとの p50/p95/p99 レイテンシとスループットを JSON に保存する。
+
+- 既定はプロセス内（TestClient）で実行。--base-url を付けると起動中のサーバーに HTTP で送る
+- フェーズ: morning（入荷登録・品目検索が中心）→ day（持ち出し入力・一覧参照が中心）
+- 結果は perf/results/ に保存。--compare で過去の結果と比較
+
+Usage (backend/ で実行):
+    python -m perf.synthetic --database-url sqlite:///./perf_5y.db --years 5 --reset
+    python -m perf.loadtest --database-url sqlite:///./perf_5y.db --users 8 --duration 30
+    python -m perf.loadtest --base-url http://127.0.0.1:8000 --compare perf/results/loadtest-xxx.json
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+SEARCH_TERMS = ["ば", "バラ", "かー", "カーネ", "ゆり", "ガーベラ", "きく", "1", "10", "とるこ", "スプレー", "ひま"]
+
+
+class HTTPTransport:
+    """起動中のサーバーに urllib で送る"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method: str, path: str, body: Optional[dict] = None) -> Tuple[int, object]:
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={"Content-Type": "application/json", "Accept-Encoding": "gzip"} if data else {"Accept-Encoding": "gzip"},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                raw = response.read()
+                if response.headers.get("Content-Encoding") == "gzip":
+                    import gzip
+                    raw = gzip.decompress(raw)
+                return response.status, json.loads(raw) if raw else None
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+
+class InProcessTransport:
+    """TestClient でアプリを直接呼ぶ（サーバー不要）"""
+
+    def __init__(self):
+        from fastapi.testclient import TestClient
+        from app.main import app
+        self.client = TestClient(app)
+        self.client.__enter__()
+
+    def request(self, method: str, path: str, body: Optional[dict] = None) -> Tuple[int, object]:
+        response = self.client.request(method, path, json=body)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+    def close(self):
+        self.client.__exit__(None, None, None)
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, label: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies[label].append(seconds)
+            if not ok:
+                self.errors[label] += 1
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """nearest-rank"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], errors: int, wall_seconds: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "rps": round(len(values) / wall_seconds, 2) if wall_seconds else None,
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else None,
+        "p50_ms": round(_percentile(values, 50) * 1000, 2),
+        "p95_ms": round(_percentile(values, 95) * 1000, 2),
+        "p99_ms": round(_percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else None,
+    }
+
+
+class Workload:
+    """マスタ・ロット情報を持ち、シナリオごとのリクエスト列を組み立てる"""
+
+    def __init__(self, transport, recorder: Recorder, rng: random.Random):
+        self.transport = transport
+        self.recorder = recorder
+        self.rng = rng
+        self._lock = threading.Lock()
+
+    def call(self, label: str, method: str, path: str, body: Optional[dict] = None):
+        start = time.perf_counter()
+        try:
+            status, payload = self.transport.request(method, path, body)
+        except Exception:
+            status, payload = 599, None
+        self.recorder.record(label, time.perf_counter() - start, 200 <= status < 400)
+        return status, payload
+
+    def prepare(self):
+        _, stores = self.transport.request("GET", "/api/stores/")
+        _, items = self.transport.request("GET", "/api/items/?limit=1000")
+        _, suppliers = self.transport.request("GET", "/api/settings/suppliers")
+        self.store_ids = [s["id"] for s in stores or []]
+        self.items = items or []
+        self.supplier_ids = [s["id"] for s in suppliers or []] or [None]
+        if not self.store_ids or not self.items:
+            raise SystemExit("no stores/items; run perf.synthetic first")
+        # item_id -> [(arrival_id, remaining, wholesale_price)]
+        self.lots: Dict[int, List[list]] = defaultdict(list)
+        _, arrivals = self.transport.request("GET", "/api/inventory/arrivals?limit=2000")
+        for arrival in arrivals or []:
+            if (arrival.get("remaining_quantity") or 0) > 0:
+                self.lots[arrival["item_id"]].append(
+                    [arrival["id"], arrival["remaining_quantity"], arrival.get("wholesale_price")])
+
+    def _take_lot(self, quantity: int):
+        with self._lock:
+            candidates = [item_id for item_id, lots in self.lots.items() if lots]
+            if not candidates:
+                return None
+            item_id = self.rng.choice(candidates)
+            lot = self.lots[item_id][0]
+            quantity = min(quantity, lot[1])
+            lot[1] -= quantity
+            if lot[1] <= 0:
+                self.lots[item_id].pop(0)
+            return item_id, lot[0], quantity, lot[2]
+
+    # --- シナリオ ---
+
+    def morning_arrival(self):
+        """品目検索 → 入荷登録 → 当日入荷一覧"""
+        self.call("GET /api/items/search", "GET", f"/api/items/search?q={urllib.request.quote(self.rng.choice(SEARCH_TERMS))}")
+        item = self.rng.choice(self.items)
+        quantity = self.rng.choice([10, 20, 20, 30, 50])
+        wholesale = round(float(item.get("default_unit_price") or 300) * self.rng.uniform(0.35, 0.7))
+        status, arrival = self.call("POST /api/inventory/arrivals", "POST", "/api/inventory/arrivals", {
+            "item_id": item["id"], "supplier_id": self.rng.choice(self.supplier_ids), "quantity": quantity,
+            "wholesale_price": wholesale, "color": self.rng.choice(["赤", "白", "ピンク", "黄"]),
+            "grade": self.rng.choice(["秀", "優"]), "grade_class": self.rng.choice(["L", "M"]),
+            "stem_length": self.rng.choice([50, 60, 70]), "source_type": "manual",
+        })
+        if status == 200 and arrival:
+            with self._lock:
+                self.lots[item["id"]].append([arrival["id"], quantity, wholesale])
+        self.call("GET /api/inventory/arrivals", "GET", f"/api/inventory/arrivals?date_from={date.today()}")
+
+    def transfer_entry(self):
+        """店舗選択 → ロット選択 → 持ち出し登録 → 店舗の持ち出し一覧"""
+        store_id = self.rng.choice(self.store_ids)
+        self.call("GET /api/stores/", "GET", "/api/stores/")
+        taken = self._take_lot(self.rng.randint(1, 10))
+        if taken is None:
+            return
+        item_id, arrival_id, quantity, wholesale = taken
+        self.call("GET /api/inventory/arrivals?item_id", "GET", f"/api/inventory/arrivals?item_id={item_id}&limit=20")
+        item = next((i for i in self.items if i["id"] == item_id), None)
+        self.call("POST /api/transfers/", "POST", "/api/transfers/", {
+            "store_id": store_id, "item_id": item_id, "arrival_id": arrival_id, "quantity": quantity,
+            "unit_price": float((item or {}).get("default_unit_price") or 300),
+            "wholesale_price": float(wholesale) if wholesale is not None else None,
+            "transferred_at": str(date.today()),
+        })
+        self.call("GET /api/transfers/?store_id", "GET", f"/api/transfers/?store_id={store_id}&limit=50")
+
+    def browse(self):
+        """在庫・請求書の参照"""
+        if self.rng.random() < 0.5:
+            self.call("GET /api/inventory/", "GET", "/api/inventory/?limit=500")
+        else:
+            self.call("GET /api/invoices/?store_id", "GET", f"/api/invoices/?store_id={self.rng.choice(self.store_ids)}")
+
+
+PHASES: List[Tuple[str, List[Tuple[str, float]]]] = [
+    ("morning", [("morning_arrival", 0.7), ("transfer_entry", 0.1), ("browse", 0.2)]),
+    ("day", [("morning_arrival", 0.05), ("transfer_entry", 0.75), ("browse", 0.2)]),
+]
+
+
+def run_phase(workload: Workload, weights: List[Tuple[str, float]], users: int, duration: float, seed: int) -> float:
+    deadline = time.perf_counter() + duration
+    names = [name for name, _ in weights]
+    probabilities = [w for _, w in weights]
+
+    def user(index: int):
+        rng = random.Random(seed + index)
+        while time.perf_counter() < deadline:
+            scenario: Callable[[], None] = getattr(workload, rng.choices(names, probabilities)[0])
+            scenario()
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def compare(current: dict, baseline: dict):
+    print(f"\n{'endpoint':40s} {'p95 base':>10s} {'p95 now':>10s} {'delta':>8s} {'rps base':>9s} {'rps now':>9s}")
+    for phase, endpoints in current["phases"].items():
+        base_endpoints = baseline.get("phases", {}).get(phase, {})
+        for label, stats in endpoints.items():
+            base = base_endpoints.get(label)
+            if not base or not base.get("p95_ms"):
+                continue
+            delta = (stats["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100
+            print(f"{phase + ' ' + label:40s} {base['p95_ms']:10.1f} {stats['p95_ms']:10.1f} {delta:+7.1f}% "
+                  f"{base['rps'] or 0:9.1f} {stats['rps'] or 0:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="起動中のサーバー（未指定ならプロセス内で実行）")
+    parser.add_argument("--database-url", help="プロセス内実行時の DATABASE_URL")
+    parser.add_argument("--users", type=int, default=8, help="同時ユーザー数（スレッド）")
+    parser.add_argument("--duration", type=float, default=20, help="フェーズごとの秒数")
+    parser.add_argument("--seed", type=int, default=8718)
+    parser.add_argument("--output", help=f"結果 JSON（既定: {RESULTS_DIR}/loadtest-<日時>.json）")
+    parser.add_argument("--compare", help="比較する過去の結果 JSON")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    transport = HTTPTransport(args.base_url) if args.base_url else InProcessTransport()
+
+    try:
+        workload = Workload(transport, Recorder(), random.Random(args.seed))
+        workload.prepare()
+        result = {
+            "meta": {
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "target": args.base_url or "in-process",
+                "database_url": None if args.base_url else os.getenv("DATABASE_URL"),
+                "users": args.users,
+                "duration_per_phase": args.duration,
+                "seed": args.seed,
+            },
+            "phases": {},
+            "totals": {},
+        }
+        for phase, weights in PHASES:
+            workload.recorder = Recorder()
+            wall = run_phase(workload, weights, args.users, args.duration, args.seed)
+            recorder = workload.recorder
+            result["phases"][phase] = {
+                label: summarize(values, recorder.errors.get(label, 0), wall)
+                for label, values in sorted(recorder.latencies.items())
+            }
+            every = [v for values in recorder.latencies.values() for v in values]
+            result["totals"][phase] = summarize(every, sum(recorder.errors.values()), wall)
+    finally:
+        if isinstance(transport, InProcessTransport):
+            transport.close()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    for phase, endpoints in result["phases"].items():
+        total = result["totals"][phase]
+        print(f"\n[{phase}] {total['count']} requests, {total['rps']} req/s, errors={total['errors']}")
+        print(f"{'endpoint':40s} {'count':>7s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'rps':>8s} {'err':>5s}")
+        for label, stats in endpoints.items():
+            print(f"{label:40s} {stats['count']:7d} {stats['p50_ms']:8.1f} {stats['p95_ms']:8.1f} "
+                  f"{stats['p99_ms']:8.1f} {stats['rps'] or 0:8.1f} {stats['errors']:5d}")
+    print(f"\nsaved: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
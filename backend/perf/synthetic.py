@@ -0,0 +1,429 @@
+"""
+合成データ生成
+実モデル（花マスタ・入荷ロット・持ち出し・単価変更・廃棄・備品持ち出し・経費・請求書・入金）に
+規模を指定して投入する。乱数は --seed で固定でき、同じ引数なら同じデータになる。
+
+- 入荷は市場休み（日曜）を除く毎日、季節変動つき。ロット属性（色・等級・階級・長さ・輪数）も付与
+- 持ち出しは古いロットから順に引き当て、ロット残数・倉庫在庫と整合させる
+- 月末に店舗ごとの請求書（花/備品）を作り、翌月 25 日に入金（一部は一部入金・未入金）
+- 在庫台帳（stock_movements）と月初スナップショットは投入後に既存行からまとめて作る
+- 大量行は insert() の executemany でまとめて投入
+
+Usage (backend/ で実行):
+    python -m perf.synthetic --database-url sqlite:///./perf_5y.db --years 5 --stores 11 --reset
+"""
+
+import argparse
+import math
+import os
+import random
+import time
+from collections import defaultdict, deque
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+FLOWER_NAMES = [
+    ("バラ", ["サムライ", "アバランチェ", "イブピアッチェ", "カルピディエム", "ローテローゼ"]),
+    ("カーネーション", ["ムーンライト", "ネルソン", "ライトピンクバーバラ", "マスター"]),
+    ("スプレーマム", ["セイエルザ", "ロリポップ", "フェリーチェ"]),
+    ("ガーベラ", ["キムシー", "パスタ", "ミニオン"]),
+    ("トルコキキョウ", ["ボヤージュ", "セレブリッチ", "ロジーナ"]),
+    ("ユリ", ["カサブランカ", "シベリア", "ソルボンヌ"]),
+    ("ガーベラ(スパイダー)", ["ピンク", "オレンジ"]),
+    ("スイートピー", ["ステラ", "ファーストレディ"]),
+    ("チューリップ", ["白雲", "ピンクダイヤモンド", "レッドプリンセス"]),
+    ("アルストロメリア", ["エバレスト", "レベッカ"]),
+    ("かすみ草", ["アルタイル", "エクセレンス"]),
+    ("ヒマワリ", ["ビンセント", "東北八重"]),
+    ("菊", ["精興の誠", "神馬"]),
+    ("ドラセナ", ["ゴッドセフィアナ"]),
+    ("ユーカリ", ["グニー", "ポポラス"]),
+    ("胡蝶蘭", ["大輪白", "ミディ"]),
+    ("シクラメン", ["ガーデン", "大鉢"]),
+]
+CATEGORIES = [("切花", 0.8), ("枝物", 0.1), ("鉢花", 0.1)]
+COLORS = ["赤", "白", "ピンク", "黄", "オレンジ", "紫", "グリーン", "ミックス"]
+GRADES = ["秀", "優", "良"]
+GRADE_CLASSES = ["2L", "L", "M", "S"]
+EXPENSE_CATEGORIES = [
+    ("jftd", 8000, 30000), ("yupack", 3000, 15000), ("eneos", 5000, 25000),
+    ("ntt", 6000, 9000), ("freight", 10000, 60000), ("electric", 15000, 40000),
+    ("water", 2000, 6000), ("gas", 3000, 9000), ("common_fee", 20000, 20000),
+]
+BATCH_SIZE = 5000
+
+
+def _month_end(day: date) -> date:
+    first_next = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return first_next - timedelta(days=1)
+
+
+def _season(day: date) -> float:
+    """物日（彼岸・母の日・お盆・年末）に山が来る季節係数"""
+    peaks = [(3, 20, 0.5), (5, 10, 0.8), (8, 13, 0.6), (9, 22, 0.3), (12, 28, 0.7)]
+    factor = 1.0
+    for month, dom, height in peaks:
+        peak = date(day.year, month, dom)
+        distance = abs((day - peak).days)
+        if distance < 10:
+            factor += height * (1 - distance / 10)
+    return factor
+
+
+class Generator:
+    def __init__(self, db, rng: random.Random, years: float, stores: int, items: int,
+                 arrivals_per_day: int, transfers_per_store_day: int, end: date):
+        self.db = db
+        self.rng = rng
+        self.end = end
+        self.start = end - timedelta(days=int(years * 365))
+        self.n_stores = stores
+        self.n_items = items
+        self.arrivals_per_day = arrivals_per_day
+        self.transfers_per_store_day = transfers_per_store_day
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.pending: Dict[object, List[dict]] = defaultdict(list)
+        # item_id -> deque([arrival_id, remaining, wholesale_price, arrived_on, item_id])
+        self.open_lots: Dict[int, deque] = defaultdict(deque)
+        self.remaining: Dict[int, int] = {}
+        self.lot_items: Dict[int, int] = {}
+        self.month_transfers: Dict[int, List[dict]] = defaultdict(list)
+        self.month_supply_transfers: Dict[int, List[dict]] = defaultdict(list)
+        self.unpaid: List[dict] = []
+
+    # --- 投入 ---
+
+    def add(self, model, row: dict):
+        rows = self.pending[model]
+        rows.append(row)
+        if len(rows) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self, model=None):
+        """外部キーの参照先から順に投入"""
+        from sqlalchemy import insert
+        from app.database import Base
+        order = {table.name: i for i, table in enumerate(Base.metadata.sorted_tables)}
+        targets = [model] if model is not None else sorted(self.pending, key=lambda m: order[m.__tablename__])
+        for target in targets:
+            rows = self.pending.get(target)
+            if rows:
+                self.db.execute(insert(target), rows)
+                self.counts[target.__tablename__] += len(rows)
+                rows.clear()
+
+    def _next_id(self, model) -> int:
+        from sqlalchemy import func
+        return (self.db.query(func.max(model.id)).scalar() or 0) + 1
+
+    # --- マスタ ---
+
+    def setup_masters(self):
+        from app.models import Item, Store, Supplier, Supply
+        self.flush()
+        existing = self.db.query(Store).filter(Store.is_active == True).order_by(Store.sort_order).all()
+        store_ids = [s.id for s in existing][: self.n_stores]
+        next_store = self._next_id(Store)
+        while len(store_ids) < self.n_stores:
+            self.add(Store, {
+                "id": next_store, "name": f"店舗{next_store}", "operation_type": "franchise",
+                "store_type": "store", "sort_order": next_store, "is_active": True,
+            })
+            store_ids.append(next_store)
+            next_store += 1
+        self.store_ids = store_ids
+
+        used_codes = {code for (code,) in self.db.query(Item.item_code).all()}
+        item_id = self._next_id(Item)
+        self.items = []
+        variants = [(name, variety) for name, varieties in FLOWER_NAMES for variety in varieties]
+        code = 1000
+        for i in range(self.n_items):
+            name, variety = variants[i % len(variants)]
+            while str(code) in used_codes:
+                code += 1
+            price = self.rng.choice([150, 200, 250, 300, 350, 400, 500, 600, 800, 1200])
+            category = self.rng.choices([c for c, _ in CATEGORIES], [w for _, w in CATEGORIES])[0]
+            row = {
+                "id": item_id, "item_code": str(code),
+                "name": name if i < len(variants) else f"{name}{i // len(variants) + 1}",
+                "variety": variety, "category": category, "default_unit_price": price,
+                "tax_rate": 0.10, "sort_order": i + 1, "is_active": True,
+            }
+            self.add(Item, row)
+            self.items.append(row)
+            item_id += 1
+            code += 1
+        # 人気の偏り（Zipf 風）
+        self.item_weights = [1 / math.sqrt(rank + 1) for rank in range(len(self.items))]
+        self.rng.shuffle(self.item_weights)
+        self.flush()
+
+        self.supplier_ids = [s.id for s in self.db.query(Supplier).filter(Supplier.is_active == True).all()] or [None]
+        self.supplies = [
+            {"id": s.id, "unit_price": float(s.unit_price or 0)}
+            for s in self.db.query(Supply).filter(Supply.is_active == True).all()
+        ]
+
+    # --- 日次 ---
+
+    def arrivals(self, day: date):
+        from app.models import Arrival
+        if day.weekday() == 6:
+            return
+        factor = _season(day) * (0.6 if day.weekday() == 2 else 1.0)
+        count = max(1, int(self.rng.gauss(self.arrivals_per_day * factor, self.arrivals_per_day * 0.15)))
+        picked = self.rng.choices(self.items, self.item_weights, k=count)
+        prefix = day.strftime("%y%m%d")
+        for seq, item in enumerate(picked, start=1):
+            quantity = self.rng.choice([10, 20, 20, 30, 50])
+            wholesale = round(float(item["default_unit_price"]) * self.rng.uniform(0.35, 0.7) * factor, 0)
+            arrived_at = datetime.combine(day, datetime.min.time()) + timedelta(
+                hours=self.rng.randint(6, 9), minutes=self.rng.randint(0, 59))
+            arrival_id = self.next_arrival_id
+            self.next_arrival_id += 1
+            self.add(Arrival, {
+                "id": arrival_id, "display_id": f"{prefix}-{seq:03d}", "item_id": item["id"],
+                "supplier_id": self.rng.choice(self.supplier_ids), "quantity": quantity,
+                "remaining_quantity": quantity, "wholesale_price": wholesale,
+                "color": self.rng.choice(COLORS), "grade": self.rng.choice(GRADES),
+                "grade_class": self.rng.choice(GRADE_CLASSES), "stem_length": self.rng.choice([40, 50, 60, 70, 80]),
+                "bloom_count": self.rng.choice([None, 1, 2, 3, 5]),
+                "source_type": "csv" if self.rng.random() < 0.7 else "manual",
+                "arrived_at": arrived_at, "created_at": arrived_at,
+            })
+            self.open_lots[item["id"]].append([arrival_id, quantity, wholesale, day, item["id"]])
+            self.remaining[arrival_id] = quantity
+            self.lot_items[arrival_id] = item["id"]
+
+    def transfers(self, day: date):
+        from app.models import Transfer
+        if day.weekday() == 6:
+            return
+        factor = _season(day)
+        for store_id in self.store_ids:
+            count = max(0, int(self.rng.gauss(self.transfers_per_store_day * factor, 1.5)))
+            for item in self.rng.choices(self.items, self.item_weights, k=count):
+                lots = self.open_lots.get(item["id"])
+                if not lots:
+                    continue
+                lot = lots[0]  # 古いロットから
+                quantity = min(lot[1], self.rng.randint(1, 10))
+                lot[1] -= quantity
+                self.remaining[lot[0]] = lot[1]
+                if lot[1] == 0:
+                    lots.popleft()
+                unit_price = float(item["default_unit_price"])
+                row = {
+                    "store_id": store_id, "item_id": item["id"], "arrival_id": lot[0],
+                    "quantity": quantity, "unit_price": unit_price, "wholesale_price": lot[2],
+                    "margin": (unit_price - lot[2]) * quantity, "transferred_at": day,
+                    "created_at": datetime.combine(day, datetime.min.time()) + timedelta(hours=10),
+                }
+                self.add(Transfer, row)
+                self.month_transfers[store_id].append(row)
+
+    def disposals(self, day: date):
+        """入荷から 10 日を過ぎたロットの一部を廃棄"""
+        from app.models import Disposal
+        for lots in self.open_lots.values():
+            while lots and (day - lots[0][3]).days > 10 and self.rng.random() < 0.3:
+                lot = lots.popleft()
+                self.add(Disposal, {
+                    "item_id": lot[4], "arrival_id": lot[0], "quantity": lot[1],
+                    "reason": self.rng.choice(["expired", "damage", "expired", "other"]),
+                    "disposed_at": datetime.combine(day, datetime.min.time()) + timedelta(hours=18),
+                })
+                self.remaining[lot[0]] = 0
+
+    def supply_transfers(self, day: date):
+        from app.models import SupplyTransfer
+        if not self.supplies or day.weekday() != 0:
+            return
+        for store_id in self.store_ids:
+            for supply in self.rng.sample(self.supplies, k=min(2, len(self.supplies))):
+                row = {
+                    "store_id": store_id, "supply_id": supply["id"], "quantity": self.rng.randint(1, 3),
+                    "unit_price": supply["unit_price"], "transferred_at": day,
+                }
+                self.add(SupplyTransfer, row)
+                self.month_supply_transfers[store_id].append(row)
+
+    # --- 月次 ---
+
+    def price_changes(self, day: date):
+        from app.models import PriceChange
+        for item in self.rng.sample(self.items, k=max(1, len(self.items) // 50)):
+            old = float(item["default_unit_price"])
+            new = max(50.0, round(old * self.rng.uniform(0.9, 1.15) / 10) * 10)
+            item["default_unit_price"] = new
+            self.add(PriceChange, {
+                "item_id": item["id"], "old_price": old, "new_price": new, "reason": "相場変動",
+                "changed_at": datetime.combine(day, datetime.min.time()) + timedelta(hours=8),
+            })
+
+    def expenses(self, month_end: date):
+        from app.models import Expense
+        year_month = month_end.strftime("%Y-%m")
+        for store_id in self.store_ids:
+            for category, low, high in EXPENSE_CATEGORIES:
+                if self.rng.random() < 0.15:
+                    continue
+                self.add(Expense, {
+                    "store_id": store_id, "category": category, "year_month": year_month,
+                    "amount": round(self.rng.uniform(low, high)), "billing_method": self.rng.choice(["invoice", "transfer"]),
+                })
+
+    def invoices(self, month_end: date, snapshot):
+        from app.models import Invoice, InvoiceItem
+        period_start = month_end.replace(day=1)
+        created_at = datetime.combine(month_end, datetime.min.time()) + timedelta(hours=20)
+        # 番号は一意制約があるため期間内で店舗をまたいで連番にする
+        seq = 0
+        for store_id in self.store_ids:
+            for invoice_type, lines in (
+                ("flower", self.month_transfers.pop(store_id, [])),
+                ("supply", self.month_supply_transfers.pop(store_id, [])),
+            ):
+                if not lines:
+                    continue
+                seq += 1
+                invoice_id = self.next_invoice_id
+                self.next_invoice_id += 1
+                subtotal = sum(float(line["unit_price"]) * line["quantity"] for line in lines)
+                tax = snapshot.round_tax(subtotal * 0.10)
+                row = {
+                    "id": invoice_id, "store_id": store_id,
+                    "invoice_number": snapshot.format_invoice_number(month_end, seq),
+                    "invoice_type": invoice_type, "period_start": period_start, "period_end": month_end,
+                    "subtotal_10": subtotal, "tax_amount_10": tax, "subtotal_08": 0, "tax_amount_08": 0,
+                    "total_amount": subtotal + tax, "status": "sent", "sent_at": created_at,
+                    "created_at": created_at, "updated_at": created_at,
+                }
+                self.add(Invoice, row)
+                for line in lines:
+                    item = self.items_by_id.get(line.get("item_id"))
+                    self.add(InvoiceItem, {
+                        "invoice_id": invoice_id, "item_id": line.get("item_id"),
+                        "item_name": item["name"] if item else "備品", "quantity": line["quantity"],
+                        "unit_price": line["unit_price"], "subtotal": float(line["unit_price"]) * line["quantity"],
+                        "tax_rate": 0.10, "transferred_at": line["transferred_at"],
+                    })
+                self.unpaid.append(row)
+
+    def payments(self, day: date):
+        """前月分の請求に対する入金（25 日）"""
+        from app.models.payments import Payment
+        due = [i for i in self.unpaid if i["period_end"] < day]
+        self.unpaid = [i for i in self.unpaid if i["period_end"] >= day]
+        for invoice in due:
+            roll = self.rng.random()
+            if roll < 0.03:
+                continue  # 未入金
+            amount = invoice["total_amount"] if roll > 0.08 else round(invoice["total_amount"] * 0.5)
+            self.add(Payment, {
+                "invoice_id": invoice["id"], "amount": amount, "payment_date": day,
+                "payment_method": "transfer", "bank_name": "北洋銀行",
+            })
+            if amount == invoice["total_amount"]:
+                self.paid_invoice_ids.append(invoice["id"])
+
+    # --- 全体 ---
+
+    def run(self) -> Dict[str, int]:
+        from sqlalchemy import update
+        from app.models import Arrival, Inventory, Invoice
+        from app.services import stock_ledger, valuation
+        from app.services.settings_service import settings_service
+
+        snapshot = settings_service.current(self.db)
+        self.setup_masters()
+        self.items_by_id = {item["id"]: item for item in self.items}
+        self.next_arrival_id = self._next_id(Arrival)
+        self.next_invoice_id = self._next_id(Invoice)
+        self.paid_invoice_ids: List[int] = []
+
+        day = self.start
+        while day <= self.end:
+            self.arrivals(day)
+            self.flush(Arrival)  # 持ち出しの arrival_id が参照するので先に投入
+            self.transfers(day)
+            self.disposals(day)
+            self.supply_transfers(day)
+            if day.day == 1:
+                self.price_changes(day)
+            if day.day == 25:
+                self.payments(day)
+            if day == _month_end(day) and day < self.end:
+                self.expenses(day)
+                self.invoices(day, snapshot)
+            day += timedelta(days=1)
+        self.flush()
+
+        # ロット残数・倉庫在庫・入金済みステータスを最終状態に揃える
+        changed = [{"id": aid, "remaining_quantity": qty} for aid, qty in self.remaining.items()]
+        for i in range(0, len(changed), BATCH_SIZE):
+            self.db.execute(update(Arrival), changed[i:i + BATCH_SIZE])
+        on_hand: Dict[int, int] = defaultdict(int)
+        for arrival_id, qty in self.remaining.items():
+            on_hand[self.lot_items[arrival_id]] += qty
+        existing = {inv.item_id for inv in self.db.query(Inventory.item_id).all()}
+        for item in self.items:
+            if item["id"] not in existing:
+                self.add(Inventory, {
+                    "item_id": item["id"], "quantity": on_hand.get(item["id"], 0),
+                    "unit_price": item["default_unit_price"],
+                })
+        self.flush()
+        paid = [{"id": invoice_id, "status": "paid"} for invoice_id in self.paid_invoice_ids]
+        for i in range(0, len(paid), BATCH_SIZE):
+            self.db.execute(update(Invoice), paid[i:i + BATCH_SIZE])
+        self.counts["stock_movements"] += stock_ledger.backfill(self.db)
+        self.counts["item_costs"] += valuation.backfill(self.db)
+        self.db.commit()
+        return dict(self.counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="未指定なら DATABASE_URL 環境変数（アプリと同じ既定値）")
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--stores", type=int, default=11)
+    parser.add_argument("--items", type=int, default=300)
+    parser.add_argument("--arrivals-per-day", type=int, default=40)
+    parser.add_argument("--transfers-per-store-day", type=int, default=12)
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today(), help="最終日 (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, default=8718)
+    parser.add_argument("--reset", action="store_true", help="既存テーブルを削除して作り直す")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from app.database import Base, SessionLocal, engine, init_db
+    from app.models import Transfer
+
+    if args.reset:
+        import app.models  # noqa: F401  全テーブルをメタデータに登録
+        Base.metadata.drop_all(bind=engine)
+    init_db()
+
+    db = SessionLocal()
+    try:
+        if db.query(Transfer.id).first() is not None:
+            raise SystemExit("transfers already has rows; use --reset to regenerate")
+        started = time.perf_counter()
+        counts = Generator(
+            db, random.Random(args.seed), args.years, args.stores, args.items,
+            args.arrivals_per_day, args.transfers_per_store_day, args.end,
+        ).run()
+    finally:
+        db.close()
+
+    print(f"generated in {time.perf_counter() - started:.1f}s")
+    for table, count in sorted(counts.items()):
+        print(f"  {table:24s} {count:>10,d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -52,7 +52,7 @@ export const storesApi = {
   delete: (id: number) =>
     apiRequest<{ status: string }>(`/api/stores/${id}`, { method: "DELETE" }),
   reorder: (items: { id: number; sort_order: number }[]) =>
-    apiRequest<{ status: string; updated: number }>("/api/stores/reorder", { method: "POST", body: { items } }),
+    apiRequest<{ status: string; updated: number; missing: number[] }>("/api/stores/reorder", { method: "POST", body: { items } }),
 };
 
 // ========== Items ==========
@@ -94,7 +94,7 @@ export const itemsApi = {
   delete: (id: number) =>
     apiRequest<{ status: string }>(`/api/items/${id}`, { method: "DELETE" }),
   reorder: (items: { id: number; sort_order: number }[]) =>
-    apiRequest<{ status: string; updated: number }>("/api/items/reorder", { method: "POST", body: { items } }),
+    apiRequest<{ status: string; updated: number; missing: number[] }>("/api/items/reorder", { method: "POST", body: { items } }),
 };
 
 // ========== Inventory ==========
@@ -210,7 +210,7 @@ export const inventoryApi = {
   // Long-term stock alerts
   getLongTermAlerts: (days?: number) =>
     apiRequest<
-      Array<{ item_id: number; item_name: string; item_code: string; arrived_at: string; quantity: number; days_in_stock: number }>
+      Array<{ item_id: number; item_name: string; item_code: string; arrival_id: number; display_id: string | null; arrived_at: string; quantity: number; days_in_stock: number }>
     >(`/api/inventory/long-term-alerts?days=${days || 7}`),
 };
 
@@ -334,7 +334,7 @@ export const suppliesApi = {
     input_by?: number;
   }) => apiRequest<SupplyTransfer>("/api/supplies/transfers", { method: "POST", body: data }),
   reorder: (items: { id: number; sort_order: number }[]) =>
-    apiRequest<{ status: string; updated: number }>("/api/supplies/reorder", { method: "POST", body: { items } }),
+    apiRequest<{ status: string; updated: number; missing: number[] }>("/api/supplies/reorder", { method: "POST", body: { items } }),
 };
 
 // ========== Settings / Suppliers ==========
@@ -380,7 +380,7 @@ export const settingsApi = {
   deleteSupplier: (id: number) =>
     apiRequest<{ status: string }>(`/api/settings/suppliers/${id}`, { method: "DELETE" }),
   reorderSuppliers: (items: { id: number; sort_order: number }[]) =>
-    apiRequest<{ status: string; updated: number }>("/api/settings/suppliers/reorder", { method: "POST", body: { items } }),
+    apiRequest<{ status: string; updated: number; missing: number[] }>("/api/settings/suppliers/reorder", { method: "POST", body: { items } }),
 };
 
 // ========== Expenses ==========
@@ -497,6 +497,13 @@ export const invoicesApi = {
   }) => apiRequest<InvoiceDetail>("/api/invoices/generate", { method: "POST", body: data }),
   updateStatus: (id: number, status: string) =>
     apiRequest<Invoice>(`/api/invoices/${id}/status?status=${status}`, { method: "PATCH" }),
+  // 月末締め: 全店舗分を一括生成（PDF はバックグラウンドで作成）
+  generateMonth: (data: { year: number; month: number; invoice_type?: string; created_by?: number }) =>
+    apiRequest<{ generated: Invoice[]; skipped_store_ids: number[] }>("/api/invoices/generate-month", {
+      method: "POST",
+      body: data,
+    }),
+  pdfUrl: (id: number) => `${API_BASE_URL}/api/invoices/${id}/pdf`,
 };
 
 // ========== Analytics ==========
@@ -528,28 +535,140 @@ export interface DailyComparison {
   difference: number;
 }
 
+export interface DashboardData {
+  date: string;
+  purchases: {
+    today_count: number; today_amount: number; week_count: number; month_count: number; month_amount: number;
+    recent: { arrival_id: number; display_id?: string; item_id: number; item_name: string; quantity: number; arrived_at: string }[];
+  };
+  transfers: {
+    today_count: number; today_amount: number; month_count: number; month_quantity: number; month_amount: number;
+    store_ranking: {
+      store_id: number; store_name: string; operation_type: string;
+      transfer_count: number; quantity: number; amount: number;
+    }[];
+  };
+  inventory: {
+    item_count: number; total_quantity: number; valuation: number; out_of_stock_count: number; low_stock_count: number;
+    categories: { category: string; item_count: number; quantity: number; valuation: number }[];
+  };
+  alerts: {
+    pending_count: number; long_term_count: number; long_term_quantity: number;
+    long_term: { arrival_id: number; display_id?: string; item_id: number; item_name: string; quantity: number; days_in_stock: number }[];
+  };
+  costs: { month_expense_count: number; month_expense_total: number; month_supply_total: number };
+  invoices: {
+    unpaid_count: number; unpaid_total: number;
+    recent: {
+      id: number; invoice_number: string; store_id: number; invoice_type: string;
+      period_start: string; period_end: string; total_amount: number; status: string;
+    }[];
+  };
+  recomputed: string[];
+  elapsed_ms: number;
+}
+
+export interface ForecastSuggestion {
+  run_id: number;
+  generated_at: string | null;
+  market_day: string;
+  covers_until: string;
+  safety_ratio: number;
+  suppliers: {
+    supplier_id: number | null; supplier_name: string | null; item_count: number; total_suggested: number;
+    items: {
+      item_id: number; item_name: string; stock: number; lead_demand: number;
+      forecast_quantity: number; suggested_quantity: number; peaks: string[];
+      stores: { store_id: number; store_name: string; quantity: number }[];
+    }[];
+  }[];
+}
+
+export interface AnalyticsQuery {
+  measures: string[];  // purchase_quantity/purchase_amount/sales_quantity/sales_amount/sales_cost/margin/supply_quantity/supply_amount/expense_amount
+  dimensions?: ("date" | "store" | "item" | "category" | "supplier")[];
+  grain?: "day" | "week" | "month" | "quarter" | "year" | "fiscal_year";
+  start?: string;
+  end?: string;
+  period?: "mtd" | "qtd" | "ytd" | "fytd";
+  store_ids?: number[];
+  item_ids?: number[];
+  supplier_ids?: number[];
+  categories?: string[];
+}
+
+export interface AnalyticsQueryResult {
+  start: string;
+  end: string;
+  grain: string | null;
+  dimensions: string[];
+  measures: string[];
+  fiscal_year_start: number;
+  rows: Record<string, string | number | null>[];
+  totals: Record<string, number>;
+  source: "query" | "cache" | "rollup";
+  elapsed_ms: number;
+}
+
+export interface TrendSeries {
+  revenue: number[];
+  cost: number[];
+  margin: number[];
+  supply_cost: number[];
+  expense?: number[];  // 月次のみ
+  quantity: number[];
+  transfer_count: number[];
+}
+
+export interface TrendData {
+  year: number;
+  month: number;
+  months: number;
+  grain: "month" | "week";
+  periods: string[];  // YYYY-MM / 週の月曜日
+  measures: string[];
+  stores: ({ store_id: number; store_name: string } & TrendSeries)[];
+  total: TrendSeries;
+  previous_year?: TrendSeries;
+  yoy?: Record<keyof TrendSeries, (number | null)[]>;
+}
+
 export const analyticsApi = {
-  getSupplierSummary: (year: number, month: number) =>
-    apiRequest<{ year: number; month: number; suppliers: SupplierSummary[]; grand_total: number }>(
-      `/api/analytics/supplier-summary?year=${year}&month=${month}`
+  // 任意の期間・軸・指標の集計
+  query: (query: AnalyticsQuery) =>
+    apiRequest<AnalyticsQueryResult>("/api/analytics/query", { method: "POST", body: query }),
+  // ダッシュボード用の集計を 1 リクエストで
+  getDashboard: () => apiRequest<DashboardData>("/api/analytics/dashboard"),
+  // 次の市場日の仕入先別発注提案
+  getForecast: (supplierId?: number) =>
+    apiRequest<ForecastSuggestion>(`/api/analytics/forecast${supplierId ? `?supplier_id=${supplierId}` : ""}`),
+  // 店舗別の月次（週次）推移と前年比
+  getTrend: (year: number, month: number, months = 12, grain: "month" | "week" = "month", storeId?: number) =>
+    apiRequest<TrendData>(
+      `/api/analytics/trend?year=${year}&month=${month}&months=${months}&grain=${grain}${storeId ? `&store_id=${storeId}` : ""}`
+    ),
+  // months: year/month から何か月分をまとめるか（既定 1）
+  getSupplierSummary: (year: number, month: number, months = 1) =>
+    apiRequest<{ year: number; month: number; months: number; suppliers: SupplierSummary[]; grand_total: number }>(
+      `/api/analytics/supplier-summary?year=${year}&month=${month}&months=${months}`
     ),
-  getStoreSummary: (year: number, month: number) =>
-    apiRequest<{ year: number; month: number; stores: StoreSummary[]; total_delivery: number; total_purchase: number; total_margin: number }>(
-      `/api/analytics/store-summary?year=${year}&month=${month}`
+  getStoreSummary: (year: number, month: number, months = 1) =>
+    apiRequest<{ year: number; month: number; months: number; stores: StoreSummary[]; total_delivery: number; total_purchase: number; total_margin: number }>(
+      `/api/analytics/store-summary?year=${year}&month=${month}&months=${months}`
     ),
-  getPurchaseDeliveryComparison: (year: number, month: number) =>
+  getPurchaseDeliveryComparison: (year: number, month: number, months = 1) =>
     apiRequest<{
-      year: number; month: number; daily: DailyComparison[];
+      year: number; month: number; months: number; daily: DailyComparison[];
       period_totals: Record<string, { purchase: number; delivery: number }>;
       total_purchase: number; total_delivery: number; total_difference: number;
-    }>(`/api/analytics/purchase-delivery-comparison?year=${year}&month=${month}`),
+    }>(`/api/analytics/purchase-delivery-comparison?year=${year}&month=${month}&months=${months}`),
   getMonthlyPL: (year: number, month: number, storeId?: number) => {
     const params = storeId ? `&store_id=${storeId}` : "";
     return apiRequest<{
       year: number; month: number; store_id: number | null;
       summary: {
         total_purchase: number; total_revenue: number; total_cost: number;
-        gross_profit: number; gross_margin: number; total_expenses: number;
+        gross_profit: number; gross_margin: number; total_expenses: number; total_freight: number;
         total_supply_cost: number; operating_profit: number; total_quantity: number;
       };
       expenses_by_category: Record<string, number>;
@@ -667,6 +786,36 @@ export const csvImportApi = {
   },
 };
 
+// ========== Events (SSE) ==========
+export type InventoryEvent =
+  | { type: "inventory"; item_id: number; quantity: number; delta: number }
+  | { type: "lot"; arrival_id: number; item_id: number; remaining_quantity: number }
+  | { type: "arrival"; arrival_id: number; item_id: number; quantity: number; remaining_quantity: number }
+  | { type: "transfer"; store_id: number; item_id: number; delta: number; count: number; transferred_at: string };
+
+export const eventsApi = {
+  /**
+   * 在庫・ロット・持ち出しの変更を購読（ポーリングの代わり）
+   * onResync は取りこぼしを再送できなかったときに呼ばれるので REST で取り直す
+   * 戻り値を呼ぶと購読を終了
+   */
+  subscribe: (
+    onChanges: (events: InventoryEvent[]) => void,
+    options: { stores?: number[]; items?: number[]; onResync?: () => void } = {}
+  ): (() => void) => {
+    const params = new URLSearchParams();
+    if (options.stores?.length) params.set("stores", options.stores.join(","));
+    if (options.items?.length) params.set("items", options.items.join(","));
+    const query = params.toString();
+    const source = new EventSource(`${API_BASE_URL}/api/events/stream${query ? `?${query}` : ""}`);
+    source.addEventListener("changes", (e) => {
+      onChanges(JSON.parse((e as MessageEvent).data).events);
+    });
+    source.addEventListener("resync", () => options.onResync?.());
+    return () => source.close();
+  },
+};
+
 const api = {
   stores: storesApi,
   items: itemsApi,
@@ -680,6 +829,7 @@ const api = {
   analytics: analyticsApi,
   payments: paymentsApi,
   csvImport: csvImportApi,
+  events: eventsApi,
 };
 
 export default api;